@@ -0,0 +1,100 @@
+"""
+Benchmark: analytical queries on SQLite vs DuckDB over Parquet.
+
+Builds a synthetic file (region, category, amount, qty) as a typed SQLite
+table and as Parquet, then times a group-by and a percentile query on both.
+With --eav the same data is also loaded into row_kv and the group-by is timed
+there (the pre-typed-table path; loading it is slow).
+
+Usage:
+	python -m benchmarks.bench_columnar --rows 1000000 [--eav]
+"""
+from pathlib import Path
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.config.settings import get_settings
+
+
+def _frame(rows: int) -> pd.DataFrame:
+	rng = np.random.default_rng(0)
+	return pd.DataFrame(
+		{
+			"region": rng.choice(["north", "south", "east", "west", "center"], rows),
+			"category": rng.choice([f"cat{i}" for i in range(40)], rows),
+			"amount": rng.gamma(2.0, 50.0, rows).round(2).astype(str),
+			"qty": rng.integers(1, 100, rows).astype(str),
+		}
+	)
+
+
+def _timed(label: str, fn) -> None:
+	start = time.perf_counter()
+	out = fn()
+	print(f"{label:<34} {1000 * (time.perf_counter() - start):9.1f} ms  ({len(out)} rows)")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rows", type=int, default=1_000_000)
+	parser.add_argument("--eav", action="store_true")
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		os.environ["SQLITE_DB_PATH"] = str(Path(tmp) / "bench.db")
+		os.environ["COLUMNAR_ENABLED"] = "true"
+		os.environ["COLUMNAR_DIR"] = str(Path(tmp) / "columnar")
+		get_settings.cache_clear()
+
+		from src.ingestion import columnar
+		from src.ingestion.sql_store import _get_conn, bulk_load_chunks
+		from src.ingestion.csv_ingestor import frame_to_chunks
+		from src.ingestion.typed_tables import materialize_frame
+
+		df = _frame(args.rows)
+		start = time.perf_counter()
+		table = materialize_frame("bench", "sales.csv", df)
+		print(f"typed table load: {time.perf_counter() - start:.2f}s")
+		start = time.perf_counter()
+		columnar.write_parquet_part("bench", "sales.csv", df)
+		print(f"parquet write:    {time.perf_counter() - start:.2f}s")
+
+		group_by = f'SELECT "region", "category", COUNT(*), SUM("qty"), AVG("amount") FROM {table} GROUP BY 1, 2'
+		conn = _get_conn("bench")
+		try:
+			_timed("sqlite typed: group-by", lambda: conn.execute(group_by).fetchall())
+			# SQLite has no percentile aggregate: rank within each region and pick the middle row
+			median = (
+				'SELECT "region", "amount" FROM (SELECT "region", "amount", '
+				'ROW_NUMBER() OVER (PARTITION BY "region" ORDER BY "amount") AS rn, COUNT(*) OVER (PARTITION BY "region") AS n '
+				f'FROM {table} WHERE "amount" IS NOT NULL) WHERE rn = n / 2 + 1'
+			)
+			_timed("sqlite typed: median per region", lambda: conn.execute(median).fetchall())
+			if args.eav:
+				bulk_load_chunks("bench", frame_to_chunks(df, "sales.csv"))
+				eav = (
+					"SELECT r.value_text, c.value_text, COUNT(1), SUM(CAST(q.value_text AS REAL)) FROM row_kv r "
+					"JOIN row_kv c ON c.session_id = r.session_id AND c.file_id = r.file_id AND c.row_index = r.row_index AND c.col_name = 'category' "
+					"JOIN row_kv q ON q.session_id = r.session_id AND q.file_id = r.file_id AND q.row_index = r.row_index AND q.col_name = 'qty' "
+					"WHERE r.session_id = 'bench' AND r.col_name = 'region' GROUP BY 1, 2"
+				)
+				_timed("sqlite row_kv: group-by", lambda: conn.execute(eav).fetchall())
+		finally:
+			conn.close()
+
+		duck = columnar.connect("bench")
+		try:
+			_timed("duckdb parquet: group-by", lambda: duck.execute(group_by).fetchall())
+			p50 = f'SELECT "region", median("amount"), quantile_cont("amount", 0.9) FROM {table} GROUP BY 1'
+			_timed("duckdb parquet: p50/p90 per region", lambda: duck.execute(p50).fetchall())
+		finally:
+			duck.close()
+
+
+if __name__ == "__main__":
+	main()
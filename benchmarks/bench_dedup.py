@@ -0,0 +1,63 @@
+"""
+Benchmark: first upload vs re-upload of a byte-identical file.
+
+Writes the Korean sample CSV scaled to --rows rows, ingests it into one
+session, then ingests the same bytes into a second session, where the
+content-hash registry turns the upload into SQL copies. Vector indexing is
+skipped in both runs, so the first-upload time excludes embedding, which
+dedup avoids as well.
+
+Usage:
+	python -m benchmarks.bench_dedup --rows 1000000
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import os
+import tempfile
+
+import pandas as pd
+
+from src.config.settings import get_settings
+from src.ingestion.csv_ingestor import read_csv_frame
+from src.ingestion.pipeline import ingest_files
+
+
+SAMPLE_CSV = Path(__file__).resolve().parent.parent / "tests" / "블록우선순위_v0.03.csv"
+
+
+class NoopRAG:
+	async def build_index(self, session_id, chunks):
+		return None
+
+
+def _run(path: Path, session_id: str) -> float:
+	result = asyncio.run(ingest_files(session_id, [path], NoopRAG()))
+	report = result["files"][0]
+	mode = "deduplicated" if report.get("deduplicated") else ("streamed" if report.get("streamed") else "parsed")
+	print(f"{session_id:<10} {result['seconds']:.2f}s ({mode}, {result['doc_count']} chunks)")
+	return result["seconds"]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rows", type=int, default=1_000_000)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		folder = Path(tmp)
+		base = read_csv_frame(SAMPLE_CSV)
+		reps = -(-args.rows // len(base))
+		path = folder / "monthly.csv"
+		pd.concat([base] * reps, ignore_index=True).iloc[: args.rows].to_csv(path, index=False, encoding="utf-8")
+		os.environ["SQLITE_DB_PATH"] = str(folder / "app.db")
+		os.environ["COLUMNAR_DIR"] = str(folder / "columnar")
+		get_settings.cache_clear()
+		print(f"{args.rows} rows, {path.stat().st_size / 1024 / 1024:.1f} MB")
+		first = _run(path, "first")
+		again = _run(path, "reupload")
+		print(f"speedup: {first / again:.1f}x")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: vector indexing, one embed-then-upsert call vs the batched pipeline.
+
+Indexes --docs synthetic row chunks into a fresh Chroma collection, first the
+way LocalRAG.build_index worked before (every document embedded, then one
+upsert) and then through embed_and_upsert with EMBED_BATCH_SIZE=--batch and
+each of the --workers thread counts, reporting docs/sec and how the time
+splits between embedding and upserts. The embedding model is a stand-in: a
+NumPy random projection that, like the ONNX model, releases the GIL; --work
+scales its cost per document. Embedding seconds are summed over the threads.
+
+Usage:
+	python -m benchmarks.bench_embedding --docs 20000 --batch 256 --workers 1 2 4
+"""
+from pathlib import Path
+from typing import Any, List
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.config.settings import get_settings
+from src.rag import vector_store
+from src.rag.embedding import embed_and_upsert
+
+
+def _model(dim: int, work: int):
+	rng = np.random.default_rng(0)
+	projection = rng.standard_normal((256, dim)).astype(np.float32)
+	mix = rng.standard_normal((dim, dim)).astype(np.float32) / np.sqrt(dim)
+
+	def _embed(texts: List[str]) -> Any:
+		counts = np.zeros((len(texts), 256), dtype=np.float32)
+		for row, text in enumerate(texts):
+			counts[row] = np.bincount(np.frombuffer(text.encode("utf-8"), dtype=np.uint8), minlength=256)[:256]
+		vectors = counts @ projection
+		for _ in range(work):
+			vectors = np.tanh(vectors @ mix)
+		return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+	return _embed
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--docs", type=int, default=20000)
+	parser.add_argument("--batch", type=int, default=256)
+	parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+	parser.add_argument("--dim", type=int, default=384)
+	parser.add_argument("--work", type=int, default=20)
+	args = parser.parse_args()
+
+	embed = _model(args.dim, args.work)
+	docs = [(f"c{i}", f"file=a.csv row={i} | name: item {i} | qty: {i % 97} | note: {'x' * (i % 50)}", {"file": "a.csv", "row_index": i}) for i in range(args.docs)]
+	with tempfile.TemporaryDirectory() as tmp:
+		os.environ["CHROMA_DB_DIR"] = str(Path(tmp) / "chroma")
+		os.environ["EMBED_BATCH_SIZE"] = str(args.batch)
+		get_settings.cache_clear()
+		max_batch = vector_store.get_client().get_max_batch_size()
+		print(f"{args.docs} docs, batch {args.batch}, dim {args.dim}")
+		print(f"{'mode':<18} {'seconds':>9} {'docs/sec':>10} {'embed s':>9} {'upsert s':>9}")
+
+		collection = vector_store.get_collection("bench-single")
+		started = time.perf_counter()
+		vectors = embed([text for _, text, _ in docs])
+		embedded = time.perf_counter() - started
+		# one upsert, split only where Chroma's own batch limit forces it
+		for start in range(0, len(docs), max_batch):
+			part = docs[start : start + max_batch]
+			collection.upsert(
+				ids=[d[0] for d in part], embeddings=vectors[start : start + max_batch], documents=[d[1] for d in part], metadatas=[d[2] for d in part]
+			)
+		seconds = time.perf_counter() - started
+		print(f"{'single upsert':<18} {seconds:>9.2f} {args.docs / seconds:>10.0f} {embedded:>9.2f} {seconds - embedded:>9.2f}")
+
+		for workers in args.workers:
+			os.environ["EMBED_WORKERS"] = str(workers)
+			get_settings.cache_clear()
+			stats = embed_and_upsert(vector_store.get_collection(f"bench-workers-{workers}"), iter(docs), embed, min(args.batch, max_batch))
+			label = f"pipeline x{workers}"
+			print(f"{label:<18} {stats['seconds']:>9.2f} {stats['docs_per_sec']:>10.0f} {stats['embed_seconds']:>9.2f} {stats['upsert_seconds']:>9.2f}")
+
+
+if __name__ == "__main__":
+	main()
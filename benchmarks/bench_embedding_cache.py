@@ -0,0 +1,73 @@
+"""
+Benchmark: re-ingesting similar data with and without the embedding cache.
+
+Indexes --docs synthetic row chunks into one session and then a copy of them,
+with --changed percent of the rows edited, into a new session, the way a
+re-uploaded file is: through LocalRAG.build_index with EMBED_CACHE_ENABLED
+off and on. Reports the seconds and texts embedded for the second session
+and the cache's hit rate. The embedding model is the NumPy stand-in of
+bench_embedding; --work scales its cost per document.
+
+Usage:
+	python -m benchmarks.bench_embedding_cache --docs 20000 --changed 10
+"""
+from pathlib import Path
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_embedding import _model
+from src.config.settings import get_settings
+from src.rag.local import LocalRAG
+
+
+def _chunks(rows: List[str]) -> List[Dict[str, Any]]:
+	return [{"text": text, "metadata": {"file": "a.csv", "row_index": i}} for i, text in enumerate(rows)]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--docs", type=int, default=20000)
+	parser.add_argument("--changed", type=float, default=10.0)
+	parser.add_argument("--dim", type=int, default=384)
+	parser.add_argument("--work", type=int, default=20)
+	args = parser.parse_args()
+
+	model = _model(args.dim, args.work)
+	rows = [f"name: item {i}, qty: {i % 97}, note: {'x' * (i % 50)}" for i in range(args.docs)]
+	edited = list(rows)
+	for i in random.Random(0).sample(range(args.docs), int(args.docs * args.changed / 100)):
+		edited[i] = rows[i] + ", status: edited"
+
+	print(f"{args.docs} docs, {args.changed:g}% changed on re-ingest")
+	print(f"{'mode':<10} {'first s':>9} {'second s':>9} {'embedded':>9}")
+	for cached in (False, True):
+		with tempfile.TemporaryDirectory() as tmp:
+			os.environ["CHROMA_DB_DIR"] = str(Path(tmp) / "chroma")
+			os.environ["SQLITE_DB_PATH"] = str(Path(tmp) / "app.db")
+			os.environ["EMBED_CACHE_ENABLED"] = str(cached).lower()
+			get_settings.cache_clear()
+			embedded = [0]
+
+			def _embed(texts: List[str]) -> Any:
+				embedded[0] += len(texts)
+				return model(texts)
+
+			rag = LocalRAG(embedding_function=_embed, embedding_model="bench")
+			started = time.perf_counter()
+			asyncio.run(rag.build_index("bench-first", _chunks(rows)))
+			first = time.perf_counter() - started
+			embedded[0] = 0
+			started = time.perf_counter()
+			asyncio.run(rag.build_index("bench-second", _chunks(edited)))
+			second = time.perf_counter() - started
+			label = "cache" if cached else "no cache"
+			print(f"{label:<10} {first:>9.2f} {second:>9.2f} {embedded[0]:>9}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: keyword search latency, LIKE scan vs full-text indexes.
+
+Loads the Korean sample CSV scaled to --rows chunks (each row tagged with a
+unique equipment code, so there are rare terms as well as common ones) and
+times, per query, the `text LIKE '%q%'` scan that search_fts used to fall
+back to for Korean queries against search_fts, which now routes the query
+to the trigram or word index. LIKE stops at the first k matching rows, so
+it is quick for terms most rows contain; search_fts ranks all matches.
+
+Usage:
+	python -m benchmarks.bench_fts_search --rows 200000
+"""
+from typing import List, Dict, Any
+from pathlib import Path
+import argparse
+import os
+import tempfile
+import time
+
+from src.config.settings import get_settings
+from src.ingestion.csv_ingestor import read_csv_frame, frame_to_chunks
+from src.ingestion.sql_store import _get_conn, bulk_load_chunks, search_fts
+
+
+SAMPLE_CSV = Path(__file__).resolve().parent.parent / "tests" / "블록우선순위_v0.03.csv"
+SESSION = "bench"
+
+
+def _chunks(rows: int) -> List[Dict[str, Any]]:
+	base = frame_to_chunks(read_csv_frame(SAMPLE_CSV), "blocks.csv")
+	chunks: List[Dict[str, Any]] = []
+	for i in range(rows):
+		src = base[i % len(base)]
+		chunks.append({"text": f"설비코드: 설비{i:07d}, {src['text']}", "metadata": {"file": "blocks.csv", "row_index": i, "part": 0}})
+	return chunks
+
+
+def _like(query: str, k: int) -> int:
+	conn = _get_conn(SESSION)
+	try:
+		cur = conn.execute("SELECT id FROM rows WHERE session_id = ? AND text LIKE ? LIMIT ?", (SESSION, f"%{query}%", k))
+		return len(cur.fetchall())
+	finally:
+		conn.close()
+
+
+def _index_mb(conn, table: str) -> float:
+	return conn.execute(f"SELECT COALESCE(SUM(length(block)), 0) FROM {table}_data").fetchone()[0] / 1024 / 1024
+
+
+def _best_ms(fn, repeat: int) -> float:
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		fn()
+		best = min(best, time.perf_counter() - start)
+	return best * 1000
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rows", type=int, default=200_000)
+	parser.add_argument("--k", type=int, default=5)
+	parser.add_argument("--repeat", type=int, default=5)
+	args = parser.parse_args()
+
+	queries = {
+		"rare code": f"설비{args.rows // 2:07d}",
+		"absent term": "존재하지않는용어",
+		"korean word": "미분값을",
+		"short word": "입력",
+		"english word": "saturation",
+	}
+	with tempfile.TemporaryDirectory() as tmp:
+		os.environ["SQLITE_DB_PATH"] = str(Path(tmp) / "app.db")
+		get_settings.cache_clear()
+		bulk_load_chunks(SESSION, _chunks(args.rows))
+		conn = _get_conn(SESSION)
+		try:
+			text_mb = conn.execute("SELECT SUM(length(CAST(text AS BLOB))) FROM rows").fetchone()[0] / 1024 / 1024
+			print(f"{args.rows} chunks, text {text_mb:.1f} MB, word index {_index_mb(conn, 'fts_rows'):.1f} MB, trigram index {_index_mb(conn, 'fts_rows_tri'):.1f} MB")
+		finally:
+			conn.close()
+		print(f"k={args.k}, best of {args.repeat}")
+		print(f"{'query':<14} {'LIKE scan':>12} {'search_fts':>12}")
+		for name, query in queries.items():
+			like_ms = _best_ms(lambda: _like(query, args.k), args.repeat)
+			fts_ms = _best_ms(lambda: search_fts(SESSION, query, k=args.k), args.repeat)
+			print(f"{name:<14} {like_ms:>10.1f}ms {fts_ms:>10.1f}ms")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: multi-file upload ingest, in-process vs process-pool parsing.
+
+Writes --files copies of the Korean sample CSV scaled to --rows rows each and
+runs ingest_files with INGEST_WORKERS=1 and with --workers (default: CPU
+count). Vector indexing is skipped so the numbers cover parsing and the
+SQLite writer only. Also reports what sending one parsed file back from a
+worker costs (pickle size, dumps + loads) with the row key-values in the
+chunks and as sent now, without them (the parent then reads them from the
+frame; that time is included).
+
+Usage:
+	python -m benchmarks.bench_parallel_ingest --files 50 --rows 20000
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import os
+import pickle
+import tempfile
+import time
+
+import pandas as pd
+
+from src.config.settings import get_settings
+from src.ingestion.csv_ingestor import frame_key_values, read_csv_frame
+from src.ingestion.pipeline import ingest_files, parse_file
+
+
+SAMPLE_CSV = Path(__file__).resolve().parent.parent / "tests" / "블록우선순위_v0.03.csv"
+
+
+class NoopRAG:
+	async def build_index(self, session_id, chunks):
+		return None
+
+
+def _write_files(folder: Path, files: int, rows: int) -> list:
+	base = read_csv_frame(SAMPLE_CSV)
+	reps = -(-rows // len(base))
+	df = pd.concat([base] * reps, ignore_index=True).iloc[:rows]
+	paths = []
+	for i in range(files):
+		path = folder / f"file{i:03d}.csv"
+		df.to_csv(path, index=False, encoding="utf-8")
+		paths.append(path)
+	return paths
+
+
+def _run(folder: Path, paths: list, workers: int, label: str) -> float:
+	os.environ["SQLITE_DB_PATH"] = str(folder / f"{label}.db")
+	os.environ["SQLITE_SESSION_DIR"] = str(folder / f"{label}-sessions")
+	os.environ["INGEST_WORKERS"] = str(workers)
+	os.environ["INGEST_PARALLEL_MIN_MB"] = "0"
+	get_settings.cache_clear()
+	result = asyncio.run(ingest_files(label, paths, NoopRAG()))
+	parse = sum(f.get("parse_seconds") or 0 for f in result["files"])
+	store = sum(f.get("store_seconds") or 0 for f in result["files"])
+	print(f"{label:<10} workers={workers:<3} {result['seconds']:.2f}s wall (sum parse {parse:.2f}s, sum store {store:.2f}s, {result['doc_count']} chunks)")
+	return result["seconds"]
+
+
+def _transfer(path: Path, structured: bool) -> str:
+	item = parse_file(path, structured=structured)
+	started = time.perf_counter()
+	data = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+	got = pickle.loads(data)
+	if not structured:
+		keys, rows = frame_key_values(got["frame"])
+		sum(1 for _ in rows)
+	return f"{len(data) / 1e6:.1f}MB, {time.perf_counter() - started:.3f}s"
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--files", type=int, default=50)
+	parser.add_argument("--rows", type=int, default=20_000)
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		folder = Path(tmp)
+		paths = _write_files(folder, args.files, args.rows)
+		print(f"{args.files} files x {args.rows} rows, {os.cpu_count()} CPUs")
+		print(f"transfer per file: with row key-values {_transfer(paths[0], True)}; as sent {_transfer(paths[0], False)}")
+		serial = _run(folder, paths, 1, "serial")
+		parallel = _run(folder, paths, args.workers, "parallel")
+		print(f"speedup: {serial / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+	main()
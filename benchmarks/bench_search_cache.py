@@ -0,0 +1,81 @@
+"""
+Benchmark: hybrid search latency with the search-result cache off vs on.
+
+Indexes --docs synthetic row chunks into one session (SQLite FTS and Chroma)
+and then serves --queries searches drawn from --distinct questions, skewed so
+that a few are asked often, as when the UI re-asks or many users share a
+session: once with SEARCH_CACHE_SIZE=0 and once with the cache. The embedding
+model is the NumPy stand-in of bench_embedding, so query embedding time is
+small here; the real model makes cache misses slower still.
+
+Usage:
+	python -m benchmarks.bench_search_cache --docs 20000 --queries 2000 --distinct 200
+"""
+from pathlib import Path
+from typing import List
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_embedding import _model
+from src.config.settings import get_settings
+from src.rag import search_cache
+from src.rag.hybrid import HybridRAG
+from src.rag.local import LocalRAG
+
+
+def _report(label: str, latencies: List[float]) -> None:
+	ms = sorted(x * 1000 for x in latencies)
+	p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+	print(f"{label:<10} {statistics.median(ms):>9.3f}ms {p99:>9.3f}ms {sum(ms) / 1000:>8.2f}s")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--docs", type=int, default=20000)
+	parser.add_argument("--queries", type=int, default=2000)
+	parser.add_argument("--distinct", type=int, default=200)
+	parser.add_argument("--dim", type=int, default=384)
+	args = parser.parse_args()
+
+	rng = random.Random(0)
+	words = ["alpha", "bravo", "delta", "echo", "golf", "hotel", "india", "kilo", "lima", "oscar"]
+	questions = [f"{rng.choice(words)} {rng.choice(words)} {i}" for i in range(args.distinct)]
+	# a few questions asked often, most of them rarely
+	asked = rng.choices(questions, weights=[1 / (i + 1) for i in range(args.distinct)], k=args.queries)
+	with tempfile.TemporaryDirectory() as tmp:
+		os.environ["CHROMA_DB_DIR"] = str(Path(tmp) / "chroma")
+		os.environ["SQLITE_DB_PATH"] = str(Path(tmp) / "app.db")
+		get_settings.cache_clear()
+		rag = HybridRAG()
+		rag._vec = LocalRAG(embedding_function=_model(args.dim, 2), embedding_model="bench")
+		chunks = [
+			{"text": f"name: {rng.choice(words)} {i}, kind: {rng.choice(words)}, qty: {i % 97}", "metadata": {"file": "a.csv", "row_index": i}}
+			for i in range(args.docs)
+		]
+		asyncio.run(rag.build_index("bench-session", chunks))
+
+		async def _serve() -> List[float]:
+			latencies: List[float] = []
+			for query in asked:
+				started = time.perf_counter()
+				await rag.search("bench-session", query, k=5)
+				latencies.append(time.perf_counter() - started)
+			return latencies
+
+		print(f"{args.queries} searches of {args.distinct} distinct questions over {args.docs} docs")
+		print(f"{'mode':<10} {'p50':>11} {'p99':>11} {'total':>9}")
+		for size in (0, 1024):
+			os.environ["SEARCH_CACHE_SIZE"] = str(size)
+			get_settings.cache_clear()
+			_report("cache" if size else "no cache", asyncio.run(_serve()))
+		stats = search_cache.search_cache_stats()
+		print(f"result cache hit rate {stats['hit_rate']}, query embedding hit rate {stats['embed_hit_rate']}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: one shared database vs one database file per session.
+
+Loads --sessions sessions of --rows chunks each, then times a keyword search
+and a row count in one session and dropping a session, with every session
+in the one SQLITE_DB_PATH (SQLITE_SHARD_SESSIONS=false) and with a file per
+session (true), where the drop is a file unlink instead of DELETEs.
+
+Usage:
+	python -m benchmarks.bench_session_shards --sessions 8 --rows 50000
+"""
+from pathlib import Path
+import argparse
+import os
+import tempfile
+import time
+
+from src.config.settings import get_settings
+from src.ingestion.sql_store import _get_conn, bulk_load_chunks, drop_session, search_fts
+from benchmarks.bench_fts_search import _chunks
+
+
+def _best_ms(fn, repeat: int) -> float:
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		fn()
+		best = min(best, time.perf_counter() - start)
+	return best * 1000
+
+
+def _count_rows(session_id: str) -> int:
+	conn = _get_conn(session_id)
+	try:
+		return conn.execute("SELECT COUNT(1) FROM rows WHERE session_id = ?", (session_id,)).fetchone()[0]
+	finally:
+		conn.close()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--sessions", type=int, default=8)
+	parser.add_argument("--rows", type=int, default=50_000)
+	parser.add_argument("--repeat", type=int, default=5)
+	args = parser.parse_args()
+
+	chunks = _chunks(args.rows)
+	query = f"설비{args.rows // 2:07d}"
+	print(f"{args.sessions} sessions x {args.rows} chunks, best of {args.repeat}")
+	print(f"{'layout':<10} {'load':>9} {'search':>10} {'count':>10} {'drop':>10}")
+	for shard in (False, True):
+		with tempfile.TemporaryDirectory() as tmp:
+			os.environ["SQLITE_DB_PATH"] = str(Path(tmp) / "app.db")
+			os.environ["SQLITE_SHARD_SESSIONS"] = "true" if shard else "false"
+			get_settings.cache_clear()
+			started = time.perf_counter()
+			for i in range(args.sessions):
+				bulk_load_chunks(f"s{i}", chunks)
+			load_s = time.perf_counter() - started
+			search_ms = _best_ms(lambda: search_fts("s0", query, k=5), args.repeat)
+			count_ms = _best_ms(lambda: _count_rows("s0"), args.repeat)
+			started = time.perf_counter()
+			drop_session("s0")
+			drop_ms = (time.perf_counter() - started) * 1000
+			label = "sharded" if shard else "shared"
+			print(f"{label:<10} {load_s:>8.1f}s {search_ms:>8.1f}ms {count_ms:>8.1f}ms {drop_ms:>8.1f}ms")
+
+
+if __name__ == "__main__":
+	main()
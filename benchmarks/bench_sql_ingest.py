@@ -0,0 +1,72 @@
+"""
+Benchmark: SQLite ingest throughput with and without deferred indexes.
+
+Loads the same synthetic chunks into a fresh database twice: once with the
+rows/row_kv indexes maintained on every insert, once inside deferred_indexes()
+(load first, build indexes and run the FTS5 optimize merge afterwards).
+
+Usage:
+	python -m benchmarks.bench_sql_ingest --rows 100000 --cols 30
+"""
+from typing import List, Dict, Any
+from pathlib import Path
+import argparse
+import os
+import tempfile
+import time
+
+from src.config.settings import get_settings
+from src.ingestion.sql_store import bulk_load_chunks, deferred_indexes
+
+
+def _chunks(rows: int, cols: int) -> List[Dict[str, Any]]:
+	chunks: List[Dict[str, Any]] = []
+	for i in range(rows):
+		structured = {f"col{c}": f"v{(i * 7 + c) % 1000}" for c in range(cols)}
+		chunks.append(
+			{
+				"text": ", ".join(f"{k}: {v}" for k, v in structured.items()),
+				"metadata": {"file": "bench.csv", "row_index": i, "part": 0},
+				"structured": structured,
+			}
+		)
+	return chunks
+
+
+def _use_fresh_db(folder: Path, name: str) -> None:
+	os.environ["SQLITE_DB_PATH"] = str(folder / f"{name}.db")
+	os.environ["SQLITE_SESSION_DIR"] = str(folder / f"{name}-sessions")
+	get_settings.cache_clear()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rows", type=int, default=100_000)
+	parser.add_argument("--cols", type=int, default=30)
+	args = parser.parse_args()
+
+	chunks = _chunks(args.rows, args.cols)
+	print(f"chunks: {args.rows} rows x {args.cols} columns")
+	with tempfile.TemporaryDirectory() as tmp:
+		folder = Path(tmp)
+
+		_use_fresh_db(folder, "inline")
+		start = time.perf_counter()
+		bulk_load_chunks("bench", chunks)
+		inline_s = time.perf_counter() - start
+		print(f"inline indexes:   {inline_s:.2f}s ({args.rows / inline_s:,.0f} rows/s)")
+
+		_use_fresh_db(folder, "deferred")
+		start = time.perf_counter()
+		with deferred_indexes("bench") as stats:
+			load = bulk_load_chunks("bench", chunks)
+		deferred_s = time.perf_counter() - start
+		print(
+			f"deferred indexes: {deferred_s:.2f}s ({args.rows / deferred_s:,.0f} rows/s)"
+			f" = load {load['seconds']:.2f}s + index {stats['index_seconds']:.2f}s + optimize {stats['optimize_seconds']:.2f}s"
+		)
+		print(f"speedup: {inline_s / deferred_s:.2f}x")
+
+
+if __name__ == "__main__":
+	main()
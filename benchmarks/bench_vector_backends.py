@@ -0,0 +1,129 @@
+"""
+Benchmark: Chroma (HNSW) vs the NumPy brute-force store, per session size.
+
+For each of --sizes, stores that many random unit vectors of --dim dimensions
+in a Chroma collection, a float32 NumPy store and an int8 NumPy store, then
+times --queries nearest-neighbour queries (k=--k) against each. Reported per
+backend: build seconds, first query on a freshly opened handle (open and
+warm-up included), p50/p99 of the following queries, size on disk, and
+recall@k against the exact float32 answer. Vectors are passed in, so no
+embedding model is needed.
+
+Usage:
+	python -m benchmarks.bench_vector_backends --sizes 1000 10000 100000 --queries 200
+"""
+from pathlib import Path
+from typing import Any, Callable, List, Set
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+
+from src.config.settings import get_settings
+from src.rag import numpy_store
+from src.rag.numpy_store import NumpyCollection
+
+
+def _tree_bytes(path: str) -> int:
+	return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def _timed_queries(query: Callable[[np.ndarray], List[str]], queries: np.ndarray) -> List[float]:
+	latencies: List[float] = []
+	for q in queries:
+		started = time.perf_counter()
+		query(q)
+		latencies.append(time.perf_counter() - started)
+	return latencies
+
+
+def _recall(query: Callable[[np.ndarray], List[str]], queries: np.ndarray, truth: List[Set[str]]) -> float:
+	found = [len(set(query(q)) & expected) / len(expected) for q, expected in zip(queries, truth)]
+	return sum(found) / len(found)
+
+
+def _report(label: str, build: float, first: float, latencies: List[float], size: int, recall: float) -> None:
+	ms = sorted(x * 1000 for x in latencies)
+	p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+	print(f"{label:<14} {build:>8.2f}s {first * 1000:>9.2f}ms {statistics.median(ms):>8.2f}ms {p99:>8.2f}ms {size / 1e6:>8.1f}MB {recall:>7.3f}")
+
+
+def _bench_size(tmp: str, count: int, dim: int, queries: int, k: int) -> None:
+	rng = np.random.default_rng(count)
+	vectors = rng.standard_normal((count, dim)).astype(np.float32)
+	vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+	ids = [f"c{i}" for i in range(count)]
+	docs = [f"row {i}" for i in range(count)]
+	metas: List[Any] = [{"row_index": i} for i in range(count)]
+	# queries near stored vectors, as real questions are near their rows
+	probe = vectors[rng.integers(0, count, queries)] + rng.standard_normal((queries, dim)).astype(np.float32) * 0.05
+	truth = [set(f"c{i}" for i in np.argsort(-(vectors @ q))[:k]) for q in probe]
+
+	print(f"\n{count} vectors, dim {dim}, k={k}")
+	print(f"{'backend':<14} {'build':>9} {'first q':>11} {'p50':>10} {'p99':>10} {'disk':>10} {'recall':>7}")
+
+	chroma_path = os.path.join(tmp, f"chroma-{count}")
+	client = chromadb.PersistentClient(path=chroma_path, settings=ChromaSettings(anonymized_telemetry=False))
+	collection = client.get_or_create_collection(name=f"bench-{count}")
+	page = client.get_max_batch_size()
+	started = time.perf_counter()
+	for start in range(0, count, page):
+		stop = start + page
+		collection.upsert(ids=ids[start:stop], embeddings=vectors[start:stop], documents=docs[start:stop], metadatas=metas[start:stop])
+	build = time.perf_counter() - started
+	# a fresh client and handle, as a request for a session not yet open would get
+	chromadb.api.client.SharedSystemClient.clear_system_cache()
+	started = time.perf_counter()
+	collection = chromadb.PersistentClient(path=chroma_path, settings=ChromaSettings(anonymized_telemetry=False)).get_collection(name=f"bench-{count}")
+	collection.query(query_embeddings=[probe[0]], n_results=k)
+	first = time.perf_counter() - started
+
+	def _chroma(q: np.ndarray) -> List[str]:
+		return collection.query(query_embeddings=[q], n_results=k, include=["distances"])["ids"][0]
+
+	_report("chroma", build, first, _timed_queries(_chroma, probe), _tree_bytes(chroma_path), _recall(_chroma, probe, truth))
+
+	for quantize in (False, True):
+		os.environ["NUMPY_VECTOR_QUANTIZE"] = str(quantize).lower()
+		get_settings.cache_clear()
+		session = f"bench-{count}-{'i8' if quantize else 'f32'}"
+		store = numpy_store.open_store(session)
+		started = time.perf_counter()
+		for start in range(0, count, page):
+			stop = start + page
+			store.upsert(ids=ids[start:stop], embeddings=vectors[start:stop], documents=docs[start:stop], metadatas=metas[start:stop])
+		build = time.perf_counter() - started
+		started = time.perf_counter()
+		store = NumpyCollection(numpy_store.store_path(session))
+		store.query(query_embeddings=[probe[0]], n_results=k)
+		first = time.perf_counter() - started
+
+		def _numpy(q: np.ndarray, store: NumpyCollection = store) -> List[str]:
+			return store.query(query_embeddings=[q], n_results=k)["ids"][0]
+
+		label = "numpy int8" if quantize else "numpy float32"
+		_report(label, build, first, _timed_queries(_numpy, probe), store.nbytes(), _recall(_numpy, probe, truth))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+	parser.add_argument("--dim", type=int, default=384)
+	parser.add_argument("--queries", type=int, default=200)
+	parser.add_argument("--k", type=int, default=10)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		os.environ["NUMPY_VECTOR_DIR"] = str(Path(tmp) / "vectors")
+		get_settings.cache_clear()
+		for count in args.sizes:
+			_bench_size(tmp, count, args.dim, args.queries, args.k)
+
+
+if __name__ == "__main__":
+	main()
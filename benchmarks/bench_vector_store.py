@@ -0,0 +1,79 @@
+"""
+Benchmark: per-request Chroma setup, new client per adapter vs shared client.
+
+Creates --sessions collections of --vectors random embeddings each and then
+serves --queries vector queries against random sessions, timing the whole
+request: the way LocalRAG worked before (a PersistentClient and a
+get_or_create_collection per request) and through the shared vector store
+(one client, cached collection handles). Queries pass embeddings, so the
+embedding model is not part of the timing (nor needed).
+
+Usage:
+	python -m benchmarks.bench_vector_store --sessions 50 --queries 500
+"""
+from pathlib import Path
+from typing import Callable, List
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+
+from src.config.settings import get_settings
+from src.rag import vector_store
+
+
+def _report(label: str, latencies: List[float]) -> None:
+	ms = sorted(x * 1000 for x in latencies)
+	p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+	print(f"{label:<22} {statistics.median(ms):>9.2f}ms {p99:>9.2f}ms {ms[-1]:>9.2f}ms")
+
+
+def _run(open_collection: Callable[[str], object], names: List[str], queries: int, dim: int) -> List[float]:
+	latencies: List[float] = []
+	for _ in range(queries):
+		name = random.choice(names)
+		embedding = [[random.random() for _ in range(dim)]]
+		started = time.perf_counter()
+		open_collection(name).query(query_embeddings=embedding, n_results=5)
+		latencies.append(time.perf_counter() - started)
+	return latencies
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--sessions", type=int, default=50)
+	parser.add_argument("--vectors", type=int, default=1000)
+	parser.add_argument("--queries", type=int, default=500)
+	parser.add_argument("--dim", type=int, default=384)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		path = str(Path(tmp) / "chroma")
+		os.environ["CHROMA_DB_DIR"] = path
+		get_settings.cache_clear()
+		names = [f"bench-{i:04d}" for i in range(args.sessions)]
+		for name in names:
+			vector_store.get_collection(name).add(
+				ids=[str(i) for i in range(args.vectors)],
+				embeddings=[[random.random() for _ in range(args.dim)] for _ in range(args.vectors)],
+			)
+
+		def _per_request(name: str):
+			client = chromadb.PersistentClient(path=path, settings=ChromaSettings(anonymized_telemetry=False))
+			return client.get_or_create_collection(name=name)
+
+		print(f"{args.queries} queries over {args.sessions} collections of {args.vectors} vectors")
+		print(f"{'mode':<22} {'p50':>11} {'p99':>11} {'max':>11}")
+		_report("client per request", _run(_per_request, names, args.queries, args.dim))
+		_report("shared vector store", _run(vector_store.get_collection, names, args.queries, args.dim))
+		stats = vector_store.vector_store_stats()
+		print(f"collection cache: {stats['warm']} warm, {stats['cold']} cold, hit rate {stats['hit_rate']}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: chat write latency while an ingest is running.
+
+Appends chat messages one at a time (as process_chat does) and reports
+p50/p99/max latency, first alone and then while another thread bulk-loads
+--rows chunks into a different session. Runs with the single-writer queue
+(SQLITE_SINGLE_WRITER=true) and with every caller writing on its own
+connection (false), where a chat write competes with the ingest for the
+database lock.
+
+Usage:
+	python -m benchmarks.bench_write_contention --rows 100000 --messages 200
+"""
+from typing import List
+from pathlib import Path
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from src.config.settings import get_settings
+from src.history.store import append_message, create_chat
+from src.ingestion.sql_store import bulk_load_chunks
+from benchmarks.bench_fts_search import _chunks
+
+
+def _appends(chat_id: str, messages: int, pause: float, stop: threading.Event = None) -> List[float]:
+	latencies: List[float] = []
+	for i in range(messages):
+		if stop is not None and stop.is_set():
+			break
+		started = time.perf_counter()
+		append_message(chat_id, "user", f"message {i}")
+		latencies.append(time.perf_counter() - started)
+		# random gaps, so writes do not fall into step with the ingest's commits
+		time.sleep(random.uniform(0, 2 * pause))
+	return latencies
+
+
+def _report(label: str, latencies: List[float]) -> None:
+	ms = sorted(x * 1000 for x in latencies)
+	p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+	print(f"{label:<24} {len(ms):>6} {statistics.median(ms):>9.2f}ms {p99:>9.2f}ms {ms[-1]:>9.2f}ms")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rows", type=int, default=100_000)
+	parser.add_argument("--messages", type=int, default=200)
+	parser.add_argument("--pause", type=float, default=0.05, help="mean seconds between chat writes")
+	args = parser.parse_args()
+
+	chunks = _chunks(args.rows)
+	print(f"{'mode':<24} {'writes':>6} {'p50':>11} {'p99':>11} {'max':>11}")
+	for single in (True, False):
+		with tempfile.TemporaryDirectory() as tmp:
+			os.environ["SQLITE_DB_PATH"] = str(Path(tmp) / "app.db")
+			os.environ["SQLITE_SINGLE_WRITER"] = "true" if single else "false"
+			get_settings.cache_clear()
+			mode = "single writer" if single else "per-caller writes"
+			chat_id = create_chat(title="bench")["chat_id"]
+			_report(f"{mode}, idle", _appends(chat_id, args.messages, args.pause))
+
+			done = threading.Event()
+			ingest_seconds: List[float] = []
+
+			def _ingest() -> None:
+				started = time.perf_counter()
+				bulk_load_chunks("ingest", chunks)
+				ingest_seconds.append(time.perf_counter() - started)
+				done.set()
+
+			worker = threading.Thread(target=_ingest)
+			worker.start()
+			latencies = _appends(chat_id, args.messages, args.pause, stop=done)
+			worker.join()
+			_report(f"{mode}, ingesting", latencies)
+			print(f"{'':<24} ingest of {args.rows} chunks took {ingest_seconds[0]:.1f}s")
+
+
+if __name__ == "__main__":
+	main()
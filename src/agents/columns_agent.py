@@ -1,21 +1,20 @@
 from typing import Any, Dict, List
 import sqlite3
 
-from src.config.settings import get_settings
+from src.storage.sqlite import get_conn, session_db_exists, session_db_path
 
 
-def _get_conn() -> sqlite3.Connection:
-	settings = get_settings()
-	conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-	conn.row_factory = sqlite3.Row
-	return conn
+def _get_conn(session_id: str) -> sqlite3.Connection:
+	return get_conn(session_db_path(session_id))
 
 
 def get_columns(session_id: str) -> Dict[str, List[str]]:
 	"""
 	Return mapping of filename -> ordered list of column names for the session.
 	"""
-	conn = _get_conn()
+	if not session_db_exists(session_id):
+		return {}
+	conn = _get_conn(session_id)
 	try:
 		# files
 		files = conn.execute("SELECT id, filename FROM files WHERE session_id = ? ORDER BY id", (session_id,)).fetchall()
@@ -3,16 +3,15 @@ from datetime import datetime
 import sqlite3
 
 from src.config.settings import get_settings
+from src.storage.sqlite import get_conn, register_session_schema, session_db_exists, session_db_path
+from src.storage.writer import write
 
 
-def _get_conn() -> sqlite3.Connection:
-	settings = get_settings()
-	conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-	conn.row_factory = sqlite3.Row
-	_init_schema(conn)
-	return conn
+def _get_conn(session_id: str) -> sqlite3.Connection:
+	return get_conn(session_db_path(session_id))
 
 
+@register_session_schema
 def _init_schema(conn: sqlite3.Connection) -> None:
 	conn.executescript(
 		"""
@@ -41,7 +40,9 @@ def _approx_char_budget(tokens: int) -> int:
 def build_db_context(session_id: str, max_tokens: Optional[int] = None) -> str:
 	settings = get_settings()
 	budget_chars = _approx_char_budget(max_tokens or settings.DB_CONTEXT_MAX_TOKENS)
-	conn = _get_conn()
+	if not session_db_exists(session_id):
+		return f"Session: {session_id}\n(no indexed files yet)"
+	conn = _get_conn(session_id)
 	try:
 		# If ingestion tables are not initialized yet, return minimal context
 		for required in ("files", "schema_columns", "rows"):
@@ -75,20 +76,21 @@ def build_db_context(session_id: str, max_tokens: Optional[int] = None) -> str:
 
 
 def upsert_session_profile(session_id: str, db_context: str) -> None:
-	conn = _get_conn()
-	try:
-		conn.execute(
+	now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+	write(
+		lambda conn: conn.execute(
 			"INSERT INTO session_profiles(session_id, db_context, updated_at) VALUES (?, ?, ?) "
 			"ON CONFLICT(session_id) DO UPDATE SET db_context = excluded.db_context, updated_at = excluded.updated_at",
-			(session_id, db_context, datetime.utcnow().isoformat(timespec="seconds") + "Z"),
-		)
-		conn.commit()
-	finally:
-		conn.close()
+			(session_id, db_context, now),
+		),
+		db_path=session_db_path(session_id),
+	)
 
 
 def get_session_profile(session_id: str) -> Optional[str]:
-	conn = _get_conn()
+	if not session_db_exists(session_id):
+		return None
+	conn = _get_conn(session_id)
 	try:
 		row = conn.execute("SELECT db_context FROM session_profiles WHERE session_id = ?", (session_id,)).fetchone()
 		return row["db_context"] if row else None
@@ -96,6 +98,15 @@ def get_session_profile(session_id: str) -> Optional[str]:
 		conn.close()
 
 
+def delete_session_profile(session_id: str) -> None:
+	if not session_db_exists(session_id):
+		return
+	write(
+		lambda conn: conn.execute("DELETE FROM session_profiles WHERE session_id = ?", (session_id,)),
+		db_path=session_db_path(session_id),
+	)
+
+
 def refresh_session_profile(session_id: str, max_tokens: Optional[int] = None) -> str:
 	ctx = build_db_context(session_id=session_id, max_tokens=max_tokens)
 	upsert_session_profile(session_id=session_id, db_context=ctx)
@@ -1,10 +1,12 @@
 from typing import Any, Dict, List, Tuple
 import asyncio
-import sqlite3
 import re
 
 from src.config.settings import get_settings
+from src.ingestion import columnar
+from src.ingestion.typed_tables import get_typed_tables, quote_ident
 from src.model.litellm_client import complete_chat
+from src.storage.sqlite import get_conn, session_db_path
 
 
 _SELECT_RE = re.compile(r"^\s*select\b", re.IGNORECASE | re.DOTALL)
@@ -46,7 +48,7 @@ def _extract_select(raw: str) -> str | None:
 	if not raw:
 		return None
 	text = _strip_code_fences(raw).strip()
-	m = re.search(r"select\\b[\\s\\S]*", text, re.IGNORECASE)
+	m = re.search(r"select\b[\s\S]*", text, re.IGNORECASE)
 	if not m:
 		return None
 	stmt = m.group(0).strip()
@@ -57,21 +59,53 @@ def _extract_select(raw: str) -> str | None:
 	return stmt
 
 
+def _describe_typed_tables(session_id: str, max_columns: int = 40) -> str:
+	"""
+	One line per typed per-file table of the session, e.g.
+	csv_3(row_index INTEGER, "지역" TEXT, "금액" REAL) -- file a.csv, 120 rows
+	"""
+	try:
+		tables = get_typed_tables(session_id)
+	except Exception:
+		return ""
+	lines: List[str] = []
+	for t in tables:
+		cols = ", ".join(f"{quote_ident(c['name'])} {c['type']}" for c in t["columns"][:max_columns])
+		lines.append(f"{t['table']}(row_index INTEGER, {cols}) -- file {t['file']}, {t['rows']} rows")
+	return "\n".join(lines)
+
+
 async def generate_sql(question: str, session_id: str) -> str:
 	"""
-	Generate a SQLite SELECT for our schema (schema_columns, files, rows, fts_rows).
-	Always filter by session_id.
+	Generate a SQLite SELECT for our schema (schema_columns, files, rows, fts_rows, fts_rows_tri)
+	and the session's typed per-file tables.
+	Always filter the shared tables by session_id.
 	"""
+	typed = _describe_typed_tables(session_id)
 	system = (
 		"You write only safe SQLite SELECT queries for tables: "
 		"schema_columns(session_id,file_id,col_name,inferred_type,position), "
 		"files(id,session_id,filename), "
-		"rows(session_id,file_id,row_index,data_json,chunk_id), "
+		"rows(session_id,file_id,row_index,text,data_json,chunk_id), "
 		"fts_rows(text,session_id,file_id,row_index,chunk_id), "
+		"fts_rows_tri(text,session_id,file_id,row_index,chunk_id) (trigram index: MATCH finds substrings of 3+ characters, use it for Korean terms), "
 		"row_kv(session_id,file_id,row_index,col_name,value_text). "
 		"For statistics and counts, prefer row_kv with GROUP BY col_name,value_text. "
 		"Constraints: Use WHERE session_id = '{session_id}'. No PRAGMA/ATTACH/DDL/DML. Return only SQL, start with SELECT, no prose, no backticks."
 	).replace("{session_id}", session_id.replace("'", "''"))
+	if typed:
+		system += (
+			"\nThis session's files are also loaded as typed tables (one per file, only this session's rows, "
+			"native INTEGER/REAL columns, no session_id column):\n"
+			+ typed
+			+ "\nPrefer these tables for statistics, filters and aggregations; quote column names with double quotes "
+			"and do not CAST numeric columns."
+		)
+		if columnar.is_enabled():
+			system += (
+				" Queries that use only these typed tables run on DuckDB, so median(col) and "
+				"quantile_cont(col, 0.9) are available there."
+			)
 	msgs = [
 		{"role": "system", "content": system},
 		{"role": "user", "content": question},
@@ -80,11 +114,10 @@ async def generate_sql(question: str, session_id: str) -> str:
 	return sql
 
 
-def _execute_sql(sql: str) -> Tuple[List[str], List[List[Any]], int]:
-	settings = get_settings()
-	conn = sqlite3.connect(settings.SQLITE_DB_PATH)
+def _execute_sql(sql: str, session_id: str) -> Tuple[List[str], List[List[Any]], int]:
+	# only the session's own database: other sessions, chats and secrets are not reachable
+	conn = get_conn(session_db_path(session_id))
 	try:
-		conn.row_factory = sqlite3.Row
 		# read-only mode best-effort
 		try:
 			conn.execute("PRAGMA query_only = ON;")
@@ -95,6 +128,8 @@ def _execute_sql(sql: str) -> Tuple[List[str], List[List[Any]], int]:
 		cols = [d[0] for d in cur.description] if cur.description else []
 		return cols, [list(r) for r in rows], len(rows)
 	finally:
+		# pooled connection: writable again for the next user
+		conn.execute("PRAGMA query_only = OFF;")
 		conn.close()
 
 
@@ -112,8 +147,14 @@ async def run_sql(question: str, session_id: str) -> Dict[str, Any]:
 	except Exception as e:
 		return {"sql": stmt_candidate, "error": f"{e.__class__.__name__}: {e}"}
 
-	async def _run():
-		return _execute_sql(stmt)
+	def _run():
+		# typed-table-only queries go to DuckDB over Parquet when enabled; SQLite otherwise or on failure
+		if columnar.is_enabled() and columnar.can_serve(session_id, stmt):
+			try:
+				return columnar.execute_sql(session_id, stmt)
+			except Exception:
+				pass
+		return _execute_sql(stmt, session_id)
 
 	try:
 		cols, rows, count = await asyncio.wait_for(asyncio.to_thread(_run), timeout=5.0)
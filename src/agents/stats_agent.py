@@ -1,14 +1,13 @@
 from typing import Any, Dict, List, Optional
+import json
 import sqlite3
 
-from src.config.settings import get_settings
+from src.storage.sqlite import get_conn, session_db_exists, session_db_path
+from src.ingestion import columnar
 
 
-def _get_conn() -> sqlite3.Connection:
-	settings = get_settings()
-	conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-	conn.row_factory = sqlite3.Row
-	return conn
+def _get_conn(session_id: str) -> sqlite3.Connection:
+	return get_conn(session_db_path(session_id))
 
 
 def _get_columns(conn: sqlite3.Connection, session_id: str) -> List[Dict[str, Any]]:
@@ -29,15 +28,78 @@ def _is_numeric(inferred_type: Optional[str]) -> bool:
 	return str(inferred_type or "").lower() in {"integer", "float", "number", "numeric"}
 
 
+def _get_typed_tables(conn: sqlite3.Connection, session_id: str) -> Dict[int, Dict[str, Any]]:
+	exists = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name = 'typed_tables'").fetchone()
+	if not exists:
+		return {}
+	cur = conn.execute("SELECT file_id, table_name, columns_json FROM typed_tables WHERE session_id = ?", (session_id,))
+	return {int(r["file_id"]): {"table": r["table_name"], "columns": json.loads(r["columns_json"])} for r in cur.fetchall()}
+
+
+def _quote(name: str) -> str:
+	return '"' + str(name).replace('"', '""') + '"'
+
+
+def _typed_column_stats(conn: sqlite3.Connection, table: str, column: Dict[str, Any]) -> Dict[str, Any]:
+	"""
+	Column scan over a typed per-file table; blanks were stored as NULL.
+	"""
+	col = _quote(column["name"])
+	tbl = _quote(table)
+	numeric = column["type"] in ("INTEGER", "REAL")
+	aggs = f", MIN({col}) AS mn, MAX({col}) AS mx, AVG({col}) AS av" if numeric else ""
+	row = conn.execute(f"SELECT COUNT({col}) AS nn, COUNT(1) - COUNT({col}) AS nu, COUNT(DISTINCT {col}) AS ds{aggs} FROM {tbl}").fetchone()
+	top_vals = conn.execute(
+		f"SELECT {col} AS v, COUNT(1) AS cnt FROM {tbl} WHERE {col} IS NOT NULL GROUP BY {col} ORDER BY cnt DESC LIMIT 5"
+	).fetchall()
+	item: Dict[str, Any] = {
+		"non_null_count": int(row["nn"]),
+		"null_count": int(row["nu"]),
+		"distinct_count": int(row["ds"]),
+		"top_values": [{"value": str(r["v"]), "count": int(r["cnt"])} for r in top_vals],
+	}
+	if numeric:
+		item["min"] = row["mn"]
+		item["max"] = row["mx"]
+		item["avg"] = row["av"]
+	return item
+
+
 def compute_stats(session_id: str) -> Dict[str, Any]:
-	conn = _get_conn()
+	"""
+	Per-column statistics for a session. Files with Parquet data are answered
+	by DuckDB when the columnar backend is enabled, files with a typed table are
+	scanned column-wise in SQLite, and older ingests fall back to row_kv.
+	"""
+	parquet: Dict[int, Dict[str, Dict[str, Any]]] = {}
+	if columnar.is_enabled():
+		try:
+			parquet = columnar.table_stats(session_id)
+		except Exception:
+			parquet = {}
+	if not session_db_exists(session_id):
+		return {"total_rows": 0, "columns": {}}
+	conn = _get_conn(session_id)
 	try:
 		total_rows = _get_total_rows(conn, session_id)
 		cols = _get_columns(conn, session_id)
+		typed = _get_typed_tables(conn, session_id)
 		per_column: Dict[str, Any] = {}
 		for c in cols:
 			col = c["col_name"]
 			file_id = c["file_id"]
+			if col in parquet.get(int(file_id), {}):
+				item = {"file_id": file_id, "inferred_type": c.get("inferred_type")}
+				item.update(parquet[int(file_id)][col])
+				per_column[f"{file_id}:{col}"] = item
+				continue
+			entry = typed.get(int(file_id))
+			typed_col = next((tc for tc in entry["columns"] if tc["source"] == col), None) if entry else None
+			if typed_col is not None:
+				item = {"file_id": file_id, "inferred_type": c.get("inferred_type")}
+				item.update(_typed_column_stats(conn, entry["table"], typed_col))
+				per_column[f"{file_id}:{col}"] = item
+				continue
 			inferred_type = c.get("inferred_type")
 			# counts
 			non_null = conn.execute(
@@ -96,6 +158,8 @@ def summarize_stats(stats: Dict[str, Any]) -> str:
 			line += f", 상위값={top_str}"
 		if "avg" in info and info["avg"] is not None:
 			line += f", 평균={round(float(info['avg']), 3)}"
+		if info.get("median") is not None:
+			line += f", 중앙값={round(float(info['median']), 3)}"
 		lines.append(line)
 	return "\n".join(lines)
 
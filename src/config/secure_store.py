@@ -11,17 +11,16 @@ from cryptography.hazmat.backends import default_backend
 import secrets
 
 from src.config.settings import get_settings
+from src.storage.sqlite import get_conn, register_schema
+from src.storage.writer import write
 
 
 def _db_conn() -> sqlite3.Connection:
 	settings = get_settings()
-	db_path = Path(settings.SQLITE_DB_PATH)
-	conn = sqlite3.connect(str(db_path))
-	conn.row_factory = sqlite3.Row
-	_init_schema(conn)
-	return conn
+	return get_conn(settings.SQLITE_DB_PATH)
 
 
+@register_schema
 def _init_schema(conn: sqlite3.Connection) -> None:
 	conn.executescript(
 		"""
@@ -74,16 +73,14 @@ def set_secret(key: str, value: str) -> None:
 	aead = AESGCM(aes_key)
 	nonce = secrets.token_bytes(12)
 	ct = aead.encrypt(nonce, plain, associated_data=key.encode("utf-8"))
-	conn = _db_conn()
-	try:
-		conn.execute(
+	now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+	write(
+		lambda conn: conn.execute(
 			"INSERT INTO app_secrets(key, nonce, ciphertext, updated_at) VALUES (?, ?, ?, ?) "
 			"ON CONFLICT(key) DO UPDATE SET nonce = excluded.nonce, ciphertext = excluded.ciphertext, updated_at = excluded.updated_at",
-			(key, nonce, ct, datetime.utcnow().isoformat(timespec="seconds") + "Z"),
+			(key, nonce, ct, now),
 		)
-		conn.commit()
-	finally:
-		conn.close()
+	)
 
 
 def get_secret(key: str) -> Optional[str]:
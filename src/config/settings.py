@@ -23,12 +23,52 @@ class Settings(BaseSettings):
 	OUTPUT_DIR: str = Field(default="./outputs")
 	DATA_DIR: str = Field(default="./data")
 	CHROMA_DB_DIR: str = Field(default="./data/indices/chroma")
+	CHROMA_COLLECTION_CACHE_SIZE: int = Field(default=256)  # collection handles kept open by the shared Chroma client (LRU)
+	EMBED_BATCH_SIZE: int = Field(default=256)  # chunks embedded and upserted per batch when building a vector index
+	EMBED_WORKERS: int = Field(default=2)  # threads embedding batches; upserts overlap them on the indexing thread
+	EMBED_MAX_PENDING_BATCHES: int = Field(default=4)  # batches embedded ahead of the upserts before the chunk stream waits
+	EMBED_CACHE_ENABLED: bool = Field(default=True)  # reuse vectors of texts embedded before (any session), keyed by model and text hash
+	EMBED_CACHE_MAX_MB: int = Field(default=1024)  # least recently used vectors are evicted above this size
+	EMBED_CACHE_DB_PATH: str = Field(default="")  # embedding cache database; default: embeddings.db next to SQLITE_DB_PATH
+	SEARCH_CACHE_SIZE: int = Field(default=1024)  # hybrid search results kept per process (LRU), valid until the session's data changes; 0 = off
+	QUERY_EMBED_CACHE_SIZE: int = Field(default=1024)  # query vectors kept per process (LRU); 0 = off
+	VECTOR_BACKEND: str = Field(default="auto")  # auto | chroma | numpy; auto keeps sessions up to NUMPY_VECTOR_MAX_CHUNKS in the NumPy store
+	NUMPY_VECTOR_MAX_CHUNKS: int = Field(default=50000)  # auto: larger sessions move to Chroma (vectors copied, not re-embedded)
+	NUMPY_VECTOR_DIR: str = Field(default="")  # NumPy vector stores; default: a vectors/ directory next to CHROMA_DB_DIR
+	NUMPY_VECTOR_QUANTIZE: bool = Field(default=False)  # new NumPy stores keep int8 vectors with a scale per row (4x smaller)
 	SQLITE_DB_PATH: str = Field(default="./data/indices/sqlite/app.db")
+	SQLITE_POOL_MAX_IDLE: int = Field(default=4)  # idle pooled connections kept per thread and database file
+	SQLITE_MMAP_SIZE_MB: int = Field(default=256)  # memory-mapped I/O per connection; 0 disables
+	SQLITE_CACHE_SIZE_MB: int = Field(default=32)  # page cache per connection
+	SQLITE_TEMP_STORE: str = Field(default="memory")  # default | file | memory (sorts, temp indexes)
+	SQLITE_SINGLE_WRITER: bool = Field(default=True)  # run all writes on one writer thread per database, with group commits
+	SQLITE_WRITER_MAX_BATCH: int = Field(default=64)  # queued interactive writes committed together
+	SQLITE_SHARD_SESSIONS: bool = Field(default=True)  # ingested data of each session in its own SQLite file; SQLITE_DB_PATH keeps chats, jobs and the session catalog
+	SQLITE_SESSION_DIR: str = Field(default="")  # session database files; default: a sessions/ directory next to SQLITE_DB_PATH
+	SESSION_TTL_HOURS: float = Field(default=0)  # sessions not accessed for this long are deleted by the reaper; 0 keeps them
+	SESSION_QUOTA_MB: float = Field(default=0)  # disk used by all sessions; least recently accessed ones are deleted above it; 0 = no quota
+	SESSION_REAPER_INTERVAL_S: int = Field(default=600)  # seconds between reaper passes
+	SESSION_REAPER_BATCH: int = Field(default=20)  # sessions deleted per reaper pass
 	HYBRID_SEARCH_ENABLED: bool = Field(default=True)
 	SQL_AGENT_ENABLED: bool = Field(default=True)
 	SQL_MAX_ROWS: int = Field(default=200)
 	DB_CONTEXT_ENABLED: bool = Field(default=True)
 	DB_CONTEXT_MAX_TOKENS: int = Field(default=512)
+	CSV_STREAM_THRESHOLD_MB: int = Field(default=64)  # CSVs larger than this are ingested in streaming mode
+	CSV_STREAM_BATCH_ROWS: int = Field(default=5000)
+	SQL_INGEST_BATCH_ROWS: int = Field(default=5000)  # chunks per executemany batch / transaction during bulk load
+	INGEST_WORKERS: int = Field(default=0)  # parse processes for multi-file uploads; 0 = one per CPU
+	INGEST_PARALLEL_MIN_MB: int = Field(default=8)  # smaller multi-file uploads are parsed in-process
+	INGEST_JOB_WORKERS: int = Field(default=1)  # background ingest jobs that run at once; the rest wait as queued
+	UPLOAD_MAX_MB: int = Field(default=4096)  # per uploaded file (or zip), streamed to disk
+	ZIP_MAX_UNCOMPRESSED_MB: int = Field(default=16384)  # total uncompressed size allowed inside one zip
+	INGEST_DEDUP_ENABLED: bool = Field(default=True)  # reuse rows/tables/vectors of a byte-identical file from another session
+	SQL_DEFER_INDEXES: bool = Field(default=True)  # drop secondary indexes during large ingests and rebuild once after; only in per-session files (SQLITE_SHARD_SESSIONS)
+	SQL_DEFER_INDEXES_MIN_MB: int = Field(default=32)  # total upload size that switches ingestion to deferred-index mode
+	TYPED_TABLES_ENABLED: bool = Field(default=True)  # also load each CSV into a typed per-file table (csv_<file_id>)
+	TYPED_INDEX_MAX_DISTINCT: int = Field(default=1000)  # typed-table columns with at most this many distinct values get an index
+	COLUMNAR_ENABLED: bool = Field(default=False)  # serve stats / typed-table SQL from DuckDB over Parquet (pip install .[columnar])
+	COLUMNAR_DIR: str = Field(default="./data/columnar")
 	CORS_ORIGINS: str = Field(default="*")  # comma-separated or '*'
 
 	model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
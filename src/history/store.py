@@ -1,20 +1,21 @@
 from typing import Optional, List, Dict, Any
+from concurrent.futures import Future
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import sqlite3
 from uuid import uuid4
 
 from src.config.settings import get_settings
+from src.storage.sqlite import get_conn, register_schema
+from src.storage.writer import submit_write, write
 
 
 def _get_conn() -> sqlite3.Connection:
 	settings = get_settings()
-	conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-	conn.row_factory = sqlite3.Row
-	_init_schema(conn)
-	return conn
+	return get_conn(settings.SQLITE_DB_PATH)
 
 
+@register_schema
 def _init_schema(conn: sqlite3.Connection) -> None:
 	conn.executescript(
 		"""
@@ -41,36 +42,30 @@ def _init_schema(conn: sqlite3.Connection) -> None:
 
 
 def create_chat(session_id: Optional[str] = None, title: Optional[str] = None) -> Dict[str, Any]:
-	conn = _get_conn()
-	try:
-		chat_id = str(uuid4())
-		# Title timestamp in KST (Asia/Seoul), stored timestamps remain UTC
-		now_dt = datetime.utcnow()
-		kst_now = datetime.now(ZoneInfo("Asia/Seoul"))
-		now = now_dt.isoformat(timespec="seconds") + "Z"
-		# Default title to timestamp yyyy-mm-dd_hh-mm-ss if not provided
-		final_title = title if (title and title.strip()) else kst_now.strftime("%Y-%m-%d_%H-%M-%S")
-		conn.execute(
+	chat_id = str(uuid4())
+	# Title timestamp in KST (Asia/Seoul), stored timestamps remain UTC
+	now_dt = datetime.utcnow()
+	kst_now = datetime.now(ZoneInfo("Asia/Seoul"))
+	now = now_dt.isoformat(timespec="seconds") + "Z"
+	# Default title to timestamp yyyy-mm-dd_hh-mm-ss if not provided
+	final_title = title if (title and title.strip()) else kst_now.strftime("%Y-%m-%d_%H-%M-%S")
+	write(
+		lambda conn: conn.execute(
 			"INSERT INTO chats(chat_id, title, session_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
 			(chat_id, final_title, session_id, now, now),
 		)
-		conn.commit()
-		return {"chat_id": chat_id, "title": final_title, "session_id": session_id, "created_at": now, "updated_at": now}
-	finally:
-		conn.close()
+	)
+	return {"chat_id": chat_id, "title": final_title, "session_id": session_id, "created_at": now, "updated_at": now}
 
 
 def update_chat_session(chat_id: str, session_id: str) -> None:
-	conn = _get_conn()
-	try:
-		now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-		conn.execute(
+	now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+	write(
+		lambda conn: conn.execute(
 			"UPDATE chats SET session_id = COALESCE(session_id, ?), updated_at = ? WHERE chat_id = ?",
 			(session_id, now, chat_id),
 		)
-		conn.commit()
-	finally:
-		conn.close()
+	)
 
 
 def get_chat(chat_id: str) -> Optional[Dict[str, Any]]:
@@ -94,20 +89,27 @@ def list_chats(limit: int = 100) -> List[Dict[str, Any]]:
 		conn.close()
 
 
-def append_message(chat_id: str, role: str, content: str) -> int:
-	conn = _get_conn()
-	try:
-		now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+def submit_message(chat_id: str, role: str, content: str) -> "Future[int]":
+	"""
+	Queue a message for storage and return a Future of its id, so the caller
+	can go on (e.g. start the agent) while the writer commits it.
+	"""
+	now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+	def _write(conn: sqlite3.Connection) -> int:
 		cur = conn.execute(
 			"INSERT INTO chat_messages(chat_id, role, content, created_at) VALUES (?, ?, ?, ?)",
 			(chat_id, role, content, now),
 		)
 		# bump chat updated_at
 		conn.execute("UPDATE chats SET updated_at = ? WHERE chat_id = ?", (now, chat_id))
-		conn.commit()
 		return int(cur.lastrowid)
-	finally:
-		conn.close()
+
+	return submit_write(_write)
+
+
+def append_message(chat_id: str, role: str, content: str) -> int:
+	return submit_message(chat_id, role, content).result()
 
 
 def list_messages(chat_id: str, limit: int = 100) -> List[Dict[str, Any]]:
@@ -2,7 +2,7 @@ from typing import List, Dict, Any
 from pathlib import Path
 import pandas as pd
 
-from src.ingestion.sql_store import insert_schema_columns
+from src.ingestion.sql_store import insert_schema_columns, get_file_encoding
 from src.ingestion.csv_ingestor import _read_csv_with_smart_header
 
 
@@ -23,26 +23,35 @@ def _infer_type_from_series(s: pd.Series) -> str:
 	return _PANDAS_TO_SIMPLE.get(dt, "text")
 
 
-def analyze_csv_file(file_path: str | Path) -> List[Dict[str, Any]]:
+def analyze_frame(df: pd.DataFrame) -> List[Dict[str, Any]]:
 	"""
-	Heuristic CSV schema analysis using pandas dtypes.
+	Schema analysis of an already parsed frame.
 	Returns: [{ name, type, position }]
 	"""
-	file_path = Path(file_path)
-	try:
-		df = _read_csv_with_smart_header(file_path)
-	except Exception:
-		df = pd.read_csv(file_path, on_bad_lines="skip", encoding_errors="ignore")
 	schema: List[Dict[str, Any]] = []
 	for idx, col in enumerate(df.columns):
-		schema.append({"name": str(col), "type": _infer_type_from_series(df[col]), "position": idx})
+		schema.append({"name": str(col), "type": _infer_type_from_series(df.iloc[:, idx]), "position": idx})
 	return schema
 
 
-def analyze_and_store_schema(session_id: str, file_path: str | Path) -> List[Dict[str, Any]]:
+def analyze_csv_file(file_path: str | Path, df: pd.DataFrame | None = None, encoding: str | None = None) -> List[Dict[str, Any]]:
+	"""
+	Heuristic CSV schema analysis using pandas dtypes.
+	Returns: [{ name, type, position }]
+	"""
 	file_path = Path(file_path)
-	cols = analyze_csv_file(file_path)
-	insert_schema_columns(session_id=session_id, filename=file_path.name, columns=cols)
-	return cols
+	if df is None:
+		try:
+			df = _read_csv_with_smart_header(file_path, encoding=encoding)
+		except Exception:
+			df = pd.read_csv(file_path, on_bad_lines="skip", encoding=encoding, encoding_errors="ignore")
+	return analyze_frame(df)
 
 
+def analyze_and_store_schema(session_id: str, file_path: str | Path, df: pd.DataFrame | None = None) -> List[Dict[str, Any]]:
+	file_path = Path(file_path)
+	# re-analysis reuses the encoding recorded at ingest instead of sniffing again
+	encoding = df.attrs.get("encoding") if df is not None else get_file_encoding(session_id, file_path.name)
+	cols = analyze_csv_file(file_path, df=df, encoding=encoding)
+	insert_schema_columns(session_id=session_id, filename=file_path.name, columns=cols, encoding=encoding)
+	return cols
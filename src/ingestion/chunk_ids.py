@@ -0,0 +1,28 @@
+from typing import Dict, Any, Optional
+import hashlib
+
+
+def chunk_id(filename: str, row_index: Optional[int] = None, part: Optional[int] = 0, text: Optional[str] = None) -> str:
+	"""
+	Stable id of a chunk, shared by rows.chunk_id, fts_rows.chunk_id and the
+	Chroma collection. CSV row chunks are identified by their position (file,
+	row_index, part), so re-ingesting a row upserts it; chunks without a row
+	position (text files) by their file and stripped text.
+	"""
+	if row_index is None:
+		position = "text:" + hashlib.sha256((text or "").strip().encode("utf-8")).hexdigest()
+	else:
+		position = f"{int(row_index)}:{int(part or 0)}"
+	return hashlib.sha1(f"{filename}\x1f{position}".encode("utf-8")).hexdigest()
+
+
+def ensure_chunk_id(chunk: Dict[str, Any]) -> str:
+	"""
+	The chunk's id, derived (and set on the chunk) when the producer did not
+	assign one.
+	"""
+	if chunk.get("id"):
+		return str(chunk["id"])
+	meta = chunk.get("metadata", {}) or {}
+	chunk["id"] = chunk_id(str(meta.get("file", "unknown.txt")), meta.get("row_index"), meta.get("part"), chunk.get("text", ""))
+	return chunk["id"]
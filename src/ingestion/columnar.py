@@ -0,0 +1,236 @@
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+import re
+import shutil
+
+import pandas as pd
+
+from src.config.settings import get_settings
+from src.ingestion.typed_tables import frame_positions, get_typed_table, get_typed_tables, quote_ident, _column_values
+from src.utils.logging import get_logger
+
+try:  # optional dependencies: pip install .[columnar]
+	import duckdb
+	import pyarrow as pa
+	import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - exercised only without the extra
+	duckdb = None
+	pa = None
+	pq = None
+
+
+logger = get_logger(__name__)
+
+# shared SQLite tables that only exist in the row store
+_SQLITE_ONLY = re.compile(r"\b(files|schema_columns|rows|row_kv|fts_rows|fts_rows_tri|typed_tables|ingestion_sessions)\b", re.IGNORECASE)
+_TYPED_REF = re.compile(r"\bcsv_(\d+)\b", re.IGNORECASE)
+
+_PANDAS_DTYPES = {"INTEGER": "Int64", "REAL": "Float64", "TEXT": "string"}
+
+
+def is_available() -> bool:
+	return duckdb is not None and pq is not None
+
+
+def is_enabled() -> bool:
+	"""
+	COLUMNAR_ENABLED and the optional dependencies are installed.
+	"""
+	settings = get_settings()
+	if not settings.COLUMNAR_ENABLED:
+		return False
+	if not is_available():
+		logger.warning({"event": "columnar_unavailable", "hint": "pip install .[columnar]"})
+		return False
+	return True
+
+
+def _session_dir(session_id: str) -> Path:
+	settings = get_settings()
+	safe = re.sub(r"[^A-Za-z0-9_.-]", "_", session_id)
+	return Path(settings.COLUMNAR_DIR) / safe
+
+
+def _table_dir(session_id: str, table: str) -> Path:
+	return _session_dir(session_id) / table
+
+
+def _to_parquet_frame(df: pd.DataFrame, columns: List[Dict[str, Any]]) -> pd.DataFrame:
+	"""
+	Frame with the typed-table column names and nullable native dtypes. Values
+	that do not fit a numeric column's type (possible in later streamed
+	batches) become NULL here; the SQLite typed table keeps them as text.
+	Columns are taken by header, and those `df` lacks are all NULL.
+	"""
+	data: Dict[str, Any] = {"row_index": pd.array([int(i) for i in df.index], dtype="Int64")}
+	for c, pos in zip(columns, frame_positions(columns, df)):
+		if pos is None:
+			values = pd.Series([None] * len(df), dtype=object)
+		else:
+			values = pd.Series(_column_values(df.iloc[:, pos], c["type"]), dtype=object)
+		if c["type"] == "TEXT":
+			data[c["name"]] = values.astype(_PANDAS_DTYPES["TEXT"])
+			continue
+		nums = pd.to_numeric(values, errors="coerce")
+		if c["type"] == "INTEGER":
+			nums = nums.where(nums % 1 == 0)
+		data[c["name"]] = nums.astype(_PANDAS_DTYPES[c["type"]])
+	return pd.DataFrame(data)
+
+
+def write_parquet_part(session_id: str, filename: str, df: pd.DataFrame, part: int = 0) -> Optional[Path]:
+	"""
+	Write one parsed frame (or streamed batch) of a file as a Parquet part,
+	using the column names and types of its typed table. Part 0 replaces any
+	earlier copy of the file. Returns the written path.
+	"""
+	entry = get_typed_table(session_id, filename)
+	if entry is None:
+		return None
+	folder = _table_dir(session_id, entry["table"])
+	if part == 0 and folder.exists():
+		shutil.rmtree(folder)
+	folder.mkdir(parents=True, exist_ok=True)
+	path = folder / f"part-{int(part):05d}.parquet"
+	table = pa.Table.from_pandas(_to_parquet_frame(df, entry["columns"]), preserve_index=False)
+	pq.write_table(table, path)
+	return path
+
+
+def next_part(session_id: str, filename: str) -> int:
+	"""
+	Part number for rows appended to a file that already has Parquet parts.
+	"""
+	entry = get_typed_table(session_id, filename)
+	if entry is None:
+		return 0
+	return len(list(_table_dir(session_id, entry["table"]).glob("part-*.parquet")))
+
+
+def copy_parquet(src_session_id: str, src_table: str, session_id: str, table: str) -> bool:
+	"""
+	Copy the Parquet parts of a typed table to another session / table name.
+	Returns False if the source has no Parquet data.
+	"""
+	src = _table_dir(src_session_id, src_table)
+	if not any(src.glob("*.parquet")):
+		return False
+	dest = _table_dir(session_id, table)
+	if dest.exists():
+		shutil.rmtree(dest)
+	shutil.copytree(src, dest)
+	return True
+
+
+def drop_session(session_id: str) -> None:
+	shutil.rmtree(_session_dir(session_id), ignore_errors=True)
+
+
+def session_bytes(session_id: str) -> int:
+	"""
+	Size of the session's Parquet files.
+	"""
+	return sum(p.stat().st_size for p in _session_dir(session_id).rglob("*.parquet"))
+
+
+def _session_tables(session_id: str) -> Dict[str, Dict[str, Any]]:
+	"""
+	Typed tables of the session that have Parquet data, keyed by table name.
+	"""
+	tables: Dict[str, Dict[str, Any]] = {}
+	for t in get_typed_tables(session_id):
+		if any(_table_dir(session_id, t["table"]).glob("*.parquet")):
+			tables[t["table"]] = t
+	return tables
+
+
+def connect(session_id: str, tables: Optional[Dict[str, Dict[str, Any]]] = None):
+	"""
+	In-memory DuckDB connection with one view per Parquet-backed typed table of
+	the session (same names as the SQLite typed tables). File access is then
+	limited to the session's Parquet folder and the configuration is locked.
+	"""
+	tables = _session_tables(session_id) if tables is None else tables
+	folder = _session_dir(session_id).resolve()
+	conn = duckdb.connect(database=":memory:")
+	for name in tables:
+		# parts written before an append added a column do not have it
+		pattern = str(folder / name / "*.parquet").replace("'", "''")
+		conn.execute(f"CREATE VIEW {quote_ident(name)} AS SELECT * FROM read_parquet('{pattern}', union_by_name = true)")
+	allowed = (str(folder) + "/").replace("'", "''")
+	conn.execute(f"SET allowed_directories = ['{allowed}']")
+	conn.execute("SET enable_external_access = false")
+	conn.execute("SET lock_configuration = true")
+	return conn
+
+
+def can_serve(session_id: str, sql: str) -> bool:
+	"""
+	True when the statement only references Parquet-backed typed tables of the
+	session, so it can run in DuckDB instead of SQLite.
+	"""
+	if _SQLITE_ONLY.search(sql):
+		return False
+	refs = {f"csv_{m}" for m in _TYPED_REF.findall(sql)}
+	return bool(refs) and refs <= set(_session_tables(session_id))
+
+
+def execute_sql(session_id: str, sql: str) -> Tuple[List[str], List[List[Any]], int]:
+	"""
+	Run a validated SELECT against the session's Parquet data.
+	Returns (columns, rows, row_count) like sql_agent._execute_sql.
+	"""
+	conn = connect(session_id)
+	try:
+		cur = conn.execute(sql)
+		rows = cur.fetchall()
+		cols = [d[0] for d in cur.description] if cur.description else []
+		return cols, [list(r) for r in rows], len(rows)
+	finally:
+		conn.close()
+
+
+def table_stats(session_id: str) -> Dict[int, Dict[str, Dict[str, Any]]]:
+	"""
+	Per-column statistics for every Parquet-backed typed table of the session:
+	{ file_id: { source column name: { non_null_count, null_count, distinct_count, top_values, [min, max, avg, median] } } }.
+	Counts and numeric aggregates of a table come from a single vectorized scan.
+	"""
+	tables = _session_tables(session_id)
+	if not tables:
+		return {}
+	conn = connect(session_id, tables)
+	out: Dict[int, Dict[str, Dict[str, Any]]] = {}
+	try:
+		for name, t in tables.items():
+			aggs: List[str] = []
+			for i, c in enumerate(t["columns"]):
+				col = quote_ident(c["name"])
+				aggs += [f"COUNT({col}) AS nn{i}", f"COUNT(DISTINCT {col}) AS ds{i}"]
+				if c["type"] in ("INTEGER", "REAL"):
+					aggs += [f"MIN({col}) AS mn{i}", f"MAX({col}) AS mx{i}", f"AVG({col}) AS av{i}", f"MEDIAN({col}) AS md{i}"]
+			cur = conn.execute(f"SELECT COUNT(*) AS total, {', '.join(aggs)} FROM {quote_ident(name)}")
+			row = dict(zip([d[0] for d in cur.description], cur.fetchone()))
+			per_col: Dict[str, Dict[str, Any]] = {}
+			for i, c in enumerate(t["columns"]):
+				col = quote_ident(c["name"])
+				top = conn.execute(
+					f"SELECT {col} AS v, COUNT(*) AS cnt FROM {quote_ident(name)} WHERE {col} IS NOT NULL "
+					f"GROUP BY {col} ORDER BY cnt DESC LIMIT 5"
+				).fetchall()
+				item: Dict[str, Any] = {
+					"non_null_count": int(row[f"nn{i}"]),
+					"null_count": int(row["total"]) - int(row[f"nn{i}"]),
+					"distinct_count": int(row[f"ds{i}"]),
+					"top_values": [{"value": str(v), "count": int(cnt)} for v, cnt in top],
+				}
+				if c["type"] in ("INTEGER", "REAL"):
+					item["min"] = row[f"mn{i}"]
+					item["max"] = row[f"mx{i}"]
+					item["avg"] = row[f"av{i}"]
+					item["median"] = row[f"md{i}"]
+				per_col.setdefault(c["source"], item)
+			out[int(t["file_id"])] = per_col
+		return out
+	finally:
+		conn.close()
@@ -1,42 +1,48 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
+from itertools import repeat
 import pandas as pd
 from pathlib import Path
 import re
 
+from src.ingestion.encoding import sniff_encoding, fallback_encodings
+from src.ingestion.sources import Source, as_source, csv_input
+from src.ingestion.chunk_ids import chunk_id
 
-def _read_csv_best_effort(file_path: Path) -> pd.DataFrame:
+
+def _read_csv_once(file_path: Source, encoding: str | None = None, **kwargs: Any) -> pd.DataFrame:
 	"""
-	Try multiple encodings commonly used in KR/legacy files to avoid UnicodeDecodeError.
-	Fallback to latin1 if UTF-8 and CP949/EUC-KR fail. Skip bad lines to be robust.
+	Run pandas once with the given encoding, or one sniffed from a bounded byte
+	sample. Other candidates are only tried if decoding still fails on bytes
+	outside the sample. The encoding used is recorded in `df.attrs["encoding"]`.
 	"""
+	if encoding is None:
+		encoding, _ = sniff_encoding(file_path)
 	last_err: Exception | None = None
-	for enc in ["utf-8", "cp949", "euc-kr", "latin1"]:
+	for enc in [encoding] + fallback_encodings(encoding):
 		try:
-			return pd.read_csv(file_path, encoding=enc, on_bad_lines="skip")
-		except Exception as e:
+			with csv_input(file_path) as src:
+				df = pd.read_csv(src, encoding=enc, on_bad_lines="skip", **kwargs)
+		except UnicodeDecodeError as e:
 			last_err = e
 			continue
-	# If all attempts failed, re-raise the last error
-	if last_err:
-		raise last_err
-	# Should not reach here
-	return pd.read_csv(file_path)
+		df.attrs["encoding"] = enc
+		return df
+	raise last_err  # type: ignore[misc]
+
+
+def _read_csv_best_effort(file_path: Source, encoding: str | None = None) -> pd.DataFrame:
+	"""
+	Read a CSV with the first row as header, handling KR/legacy encodings
+	(CP949/EUC-KR) without trial parses. Skip bad lines to be robust.
+	"""
+	return _read_csv_once(file_path, encoding=encoding)
 
 
-def _read_csv_no_header_best_effort(file_path: Path, nrows: int | None = None) -> pd.DataFrame:
+def _read_csv_no_header_best_effort(file_path: Source, nrows: int | None = None, encoding: str | None = None) -> pd.DataFrame:
 	"""
 	Read CSV without treating the first row as header; used for header detection.
 	"""
-	last_err: Exception | None = None
-	for enc in ["utf-8", "cp949", "euc-kr", "latin1"]:
-		try:
-			return pd.read_csv(file_path, encoding=enc, on_bad_lines="skip", header=None, nrows=nrows)
-		except Exception as e:
-			last_err = e
-			continue
-	if last_err:
-		raise last_err
-	return pd.read_csv(file_path, header=None, nrows=nrows)
+	return _read_csv_once(file_path, encoding=encoding, header=None, nrows=nrows)
 
 
 def _looks_like_name(value: str) -> bool:
@@ -63,12 +69,11 @@ def _score_header_row(values: List[str]) -> float:
 	return looks * 2.0 + unique * 1.0 - dup_penalty * 0.5 - numeric_like * 1.0
 
 
-def _read_csv_with_smart_header(file_path: Path, scan_rows: int = 12) -> pd.DataFrame:
+def _detect_header_row(df0: pd.DataFrame, scan_rows: int = 12) -> int:
 	"""
-	Detect header row by scanning the first few rows and choosing the one that
-	looks most like column names, then return a DataFrame with proper columns set.
+	Return the positional index of the row that looks most like column names
+	among the first `scan_rows` rows of a header-less frame.
 	"""
-	df0 = _read_csv_no_header_best_effort(file_path)
 	max_scan = min(scan_rows, len(df0))
 	best_idx = 0
 	best_score = float("-inf")
@@ -77,52 +82,177 @@ def _read_csv_with_smart_header(file_path: Path, scan_rows: int = 12) -> pd.Data
 		if score > best_score:
 			best_score = score
 			best_idx = i
+	return best_idx
+
+
+def _header_values(df0: pd.DataFrame, header_idx: int) -> List[str]:
+	return [str(v).strip() if str(v).strip() != "" else f"col_{k}" for k, v in enumerate(df0.iloc[header_idx].tolist())]
+
+
+def _read_csv_with_smart_header(file_path: Source, scan_rows: int = 12, encoding: str | None = None) -> pd.DataFrame:
+	"""
+	Detect header row by scanning the first few rows and choosing the one that
+	looks most like column names, then return a DataFrame with proper columns set.
+	"""
+	df0 = _read_csv_no_header_best_effort(file_path, encoding=encoding)
+	best_idx = _detect_header_row(df0, scan_rows=scan_rows)
 	# build final df: use row best_idx as header, drop rows up to that
-	header_vals = [str(v).strip() if str(v).strip() != "" else f"col_{k}" for k, v in enumerate(df0.iloc[best_idx].tolist())]
+	header_vals = _header_values(df0, best_idx)
 	df = df0.iloc[best_idx + 1 :].copy()
 	df.columns = header_vals
 	df = df.reset_index(drop=True)
+	df.attrs["encoding"] = df0.attrs.get("encoding")
 	return df
 
 
-def csv_to_chunks(file_path: str | Path, max_chars_per_chunk: int = 2000) -> List[Dict[str, Any]]:
+def read_csv_frame(file_path: str | Path, encoding: str | None = None) -> pd.DataFrame:
 	"""
-	Read a CSV file and turn each row into a text chunk with metadata.
+	Parse a CSV file once into the frame shared by chunking and schema analysis.
+	Uses smart header detection and falls back to a plain best-effort read.
+	Pass a known `encoding` (e.g. recorded in the files table) to skip sniffing.
+	Accepts files on disk and zip members (read straight from the archive).
 	"""
-	file_path = Path(file_path)
-	# Use smart header detection to robustly find header row even if not the first row
+	file_path = as_source(file_path)
+	if encoding is None:
+		encoding, _ = sniff_encoding(file_path)
 	try:
-		df = _read_csv_with_smart_header(file_path)
-		use_smart = True
+		return _read_csv_with_smart_header(file_path, encoding=encoding)
 	except Exception:
-		df = _read_csv_best_effort(file_path)
-		use_smart = False
+		return _read_csv_best_effort(file_path, encoding=encoding)
+
+
+def _column_as_text(col: pd.Series) -> List[str]:
+	"""
+	Convert one column to its text form in bulk: missing values become "" and
+	everything else its str() representation.
+	"""
+	if col.dtype.kind in "biufcOUS":
+		text = col.astype(str)
+	else:
+		# e.g. datetimes, where astype(str) formats differently from str(value)
+		text = col.map(str)
+	return text.mask(col.isna(), "").tolist()
+
+
+def frame_to_chunks(df: pd.DataFrame, filename: str, max_chars_per_chunk: int = 2000, structured: bool = True) -> List[Dict[str, Any]]:
+	"""
+	Turn each row of an already parsed frame into a text chunk with metadata.
+	Values and the "col: value, ..." row text are built column-wise; only the
+	final chunk dicts are assembled per row. Each chunk gets its stable id
+	(see chunk_ids.chunk_id) from the file name, row index and part.
+	With `structured=False` the chunks carry no per-row key-values; they are
+	then stored from the frame (see frame_key_values).
+	"""
+	names = [str(col) for col in df.columns]
+	if not names or len(df) == 0:
+		return []
+	# Positional access keeps duplicate column names apart; as in a dict, the
+	# last column with a given name provides that name's value.
+	last_pos = {name: pos for pos, name in enumerate(names)}
+	values = [_column_as_text(df.iloc[:, pos]) for pos in range(len(names))]
+	text_values = [values[last_pos[name]] for name in names]
+	row_texts = pd.Series([f"{names[0]}: "] * len(df), dtype=object) + pd.Series(text_values[0], dtype=object)
+	for name, col_values in zip(names[1:], text_values[1:]):
+		row_texts = row_texts + f", {name}: " + pd.Series(col_values, dtype=object)
+	keys = list(last_pos.keys())
+	key_values = [values[last_pos[key]] for key in keys]
+	fname = str(filename)
 	chunks: List[Dict[str, Any]] = []
-	for i, row in df.iterrows():
-		# build structured mapping for SQL normalization
-		# Use positional lookup to avoid Series ambiguity when duplicate column names exist
-		structured: Dict[str, Any] = {}
-		for idx, col in enumerate(list(df.columns)):
-			try:
-				val = row.iloc[idx]
-			except Exception:
-				# Fallback to label-based as a last resort
-				val = row.get(col, None)
-			if val is None or (pd.isna(val) if not isinstance(val, (list, tuple, dict)) else False):
-				structured[str(col)] = ""
-			else:
-				structured[str(col)] = str(val)
-		row_text = ", ".join([f"{col}: {structured[str(col)]}" for col in df.columns])
-		# simple splitting for long rows
-		parts = [row_text[j : j + max_chars_per_chunk] for j in range(0, len(row_text), max_chars_per_chunk)]
+	rows_values = zip(*key_values) if structured else repeat(None)
+	for i, row_text, row_values in zip(df.index.tolist(), row_texts.tolist(), rows_values):
+		row_kv = dict(zip(keys, row_values)) if row_values is not None else None
+		if len(row_text) <= max_chars_per_chunk:
+			parts = [row_text]
+		else:
+			# simple splitting for long rows
+			parts = [row_text[j : j + max_chars_per_chunk] for j in range(0, len(row_text), max_chars_per_chunk)]
 		for p_idx, part in enumerate(parts):
 			chunks.append(
 				{
-					"text": str(part),
-					"metadata": {"file": str(file_path.name), "row_index": int(i), "part": int(p_idx)},
-					"structured": structured if p_idx == 0 else None,
+					"id": chunk_id(fname, i, p_idx),
+					"text": part,
+					"metadata": {"file": fname, "row_index": int(i), "part": int(p_idx)},
+					"structured": row_kv if p_idx == 0 else None,
 				}
 			)
 	return chunks
 
 
+def frame_key_values(df: pd.DataFrame) -> Tuple[List[str], Iterator[Tuple[int, Tuple[str, ...]]]]:
+	"""
+	The row key-values frame_to_chunks puts in each chunk's `structured`, column
+	by column: the keys, and (row_index, values) per row.
+	"""
+	names = [str(col) for col in df.columns]
+	last_pos = {name: pos for pos, name in enumerate(names)}
+	keys = list(last_pos.keys())
+	key_values = [_column_as_text(df.iloc[:, last_pos[key]]) for key in keys]
+	return keys, zip((int(i) for i in df.index.tolist()), zip(*key_values))
+
+
+def iter_csv_frames(
+	file_path: str | Path,
+	batch_rows: int = 5000,
+	scan_rows: int = 12,
+	encoding: str | None = None,
+) -> Iterator[pd.DataFrame]:
+	"""
+	Read a CSV in fixed-size row batches with bounded memory.
+	The header is detected from the first `scan_rows` rows only; every yielded
+	frame has the detected column names and a running 0-based row index and
+	records its encoding in `attrs["encoding"]`. Cell values are read as strings.
+	"""
+	file_path = as_source(file_path)
+	if encoding is None:
+		encoding, _ = sniff_encoding(file_path)
+	header_vals: List[str] | None = None
+	next_row = 0
+	# The file cannot be re-read once batches have been handed out, so a byte
+	# the sample did not cover is replaced instead of aborting the stream.
+	with csv_input(file_path) as src, pd.read_csv(
+		src,
+		encoding=encoding,
+		encoding_errors="replace",
+		on_bad_lines="skip",
+		header=None,
+		dtype=str,
+		chunksize=max(batch_rows, scan_rows),
+	) as reader:
+		for frame in reader:
+			if header_vals is None:
+				best_idx = _detect_header_row(frame, scan_rows=scan_rows)
+				header_vals = _header_values(frame, best_idx)
+				frame = frame.iloc[best_idx + 1 :]
+			frame.columns = header_vals
+			frame.index = pd.RangeIndex(next_row, next_row + len(frame))
+			frame.attrs["encoding"] = encoding
+			next_row += len(frame)
+			if len(frame):
+				yield frame
+
+
+def iter_csv_chunks(
+	file_path: str | Path,
+	batch_rows: int = 5000,
+	scan_rows: int = 12,
+	max_chars_per_chunk: int = 2000,
+) -> Iterator[List[Dict[str, Any]]]:
+	"""
+	Streaming mode of csv_to_chunks for very large files: yields one list of
+	chunks per `batch_rows` CSV rows instead of materializing every chunk.
+	"""
+	file_path = as_source(file_path)
+	for frame in iter_csv_frames(file_path, batch_rows=batch_rows, scan_rows=scan_rows):
+		yield frame_to_chunks(frame, file_path.name, max_chars_per_chunk=max_chars_per_chunk)
+
+
+def csv_to_chunks(file_path: str | Path, max_chars_per_chunk: int = 2000, df: pd.DataFrame | None = None) -> List[Dict[str, Any]]:
+	"""
+	Read a CSV file and turn each row into a text chunk with metadata.
+	Pass an already parsed frame via `df` to avoid parsing the file again.
+	"""
+	file_path = as_source(file_path)
+	if df is None:
+		# Use smart header detection to robustly find header row even if not the first row
+		df = read_csv_frame(file_path)
+	return frame_to_chunks(df, file_path.name, max_chars_per_chunk=max_chars_per_chunk)
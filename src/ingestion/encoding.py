@@ -0,0 +1,94 @@
+from typing import List, Tuple
+from pathlib import Path
+import codecs
+
+from src.ingestion.sources import Source, ZipMember, as_source
+
+
+# Candidate order matters: cp949 is a superset of euc-kr, latin1 never fails.
+_CANDIDATES = ["utf-8", "cp949"]
+_FALLBACK = "latin1"
+
+_BOMS = [
+	(codecs.BOM_UTF8, "utf-8-sig"),
+	(codecs.BOM_UTF16_LE, "utf-16"),
+	(codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def _read_samples(file_path: Source, sample_bytes: int) -> List[bytes]:
+	"""
+	Read a bounded sample from the head, middle and tail of the file.
+	Blocks after the head start at the next line break so they never begin in
+	the middle of a multibyte character ("\\n" is never a trail byte in UTF-8,
+	CP949 or EUC-KR).
+	"""
+	size = file_path.stat().st_size
+	block = max(1, sample_bytes // 3)
+	with file_path.open("rb") as f:
+		if size <= sample_bytes:
+			return [f.read()]
+		samples = [f.read(block)]
+		for offset in (size // 2, size - block):
+			f.seek(offset)
+			data = f.read(block)
+			nl = data.find(b"\n")
+			if nl != -1:
+				samples.append(data[nl + 1 :])
+	return samples
+
+
+def _decodes(encoding: str, samples: List[bytes]) -> str | None:
+	"""
+	Decode every sample with an incremental decoder. A truncated character at
+	the end of a sample is tolerated; any other invalid byte rejects the encoding.
+	"""
+	parts: List[str] = []
+	for data in samples:
+		decoder = codecs.getincrementaldecoder(encoding)()
+		try:
+			parts.append(decoder.decode(data, final=False))
+		except UnicodeDecodeError:
+			return None
+	return "".join(parts)
+
+
+def _hangul_ratio(text: str) -> float:
+	non_ascii = [ch for ch in text if ord(ch) > 0x7F]
+	if not non_ascii:
+		return 0.0
+	hangul = sum(1 for ch in non_ascii if "가" <= ch <= "힣" or "ㄱ" <= ch <= "ㆎ")
+	return hangul / len(non_ascii)
+
+
+def sniff_encoding(file_path: str | Path | ZipMember, sample_bytes: int = 1 << 20) -> Tuple[str, float]:
+	"""
+	Detect a file's text encoding from a bounded byte sample instead of trial
+	parsing the whole file. Returns (encoding, confidence in [0, 1]).
+	"""
+	file_path = as_source(file_path)
+	samples = _read_samples(file_path, sample_bytes)
+	head = samples[0] if samples else b""
+	for bom, encoding in _BOMS:
+		if head.startswith(bom):
+			return encoding, 1.0
+	if all(s.isascii() for s in samples):
+		# ASCII is valid in every candidate; only unsampled bytes could disagree
+		full = sum(len(s) for s in samples) >= file_path.stat().st_size
+		return "utf-8", 1.0 if full else 0.9
+	text = _decodes("utf-8", samples)
+	if text is not None:
+		# non-ASCII bytes that form valid UTF-8 sequences are very unlikely otherwise
+		return "utf-8", 0.99
+	text = _decodes("cp949", samples)
+	if text is not None:
+		return "cp949", round(0.6 + 0.4 * _hangul_ratio(text), 3)
+	return _FALLBACK, 0.1
+
+
+def fallback_encodings(detected: str) -> List[str]:
+	"""
+	Encodings to try, in order, if reading with the detected one still fails
+	on bytes outside the sample.
+	"""
+	return [enc for enc in _CANDIDATES + [_FALLBACK] if enc != detected]
@@ -0,0 +1,463 @@
+from typing import List, Dict, Any, Optional, Callable
+from pathlib import Path
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+
+from src.config.settings import get_settings
+from src.ingestion.csv_ingestor import read_csv_frame, frame_to_chunks, frame_key_values, iter_csv_frames
+from src.ingestion.analyze import analyze_frame
+from src.ingestion.sources import Source, ZipMember, as_source, content_sha256
+from src.ingestion.chunk_ids import chunk_id
+from src.ingestion.sql_store import (
+	store_chunks,
+	bulk_load_key_values,
+	insert_schema_columns,
+	add_schema_columns,
+	file_row_offset,
+	deferred_indexes,
+	record_file_hash,
+	find_ingested_file,
+	copy_file_data,
+	load_file_chunks,
+)
+from src.ingestion.typed_tables import (
+	materialize_frame,
+	create_typed_table,
+	append_typed_rows,
+	index_typed_table,
+	copy_typed_table,
+	typed_table_name,
+	get_typed_table,
+)
+from src.ingestion import columnar
+from src.rag.base import RAGAdapter
+from src.storage.sqlite import session_db_path
+from src.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+_TEXT_SUFFIXES = {".txt", ".md"}
+
+# progress(stage, rows_processed) callback used by background ingest jobs
+Progress = Callable[[str, int], None]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def parse_file(path: str | Path | ZipMember, row_offset: Optional[int] = None, structured: bool = True) -> Optional[Dict[str, Any]]:
+	"""
+	Parse a single uploaded file exactly once.
+	Returns: { file, path, chunks, columns, encoding, frame, row_offset, structured } or None for unsupported file types.
+	For CSV files, chunks (and their row_kv values), schema columns and the
+	typed table all come from the same parsed frame. Zip members are read
+	straight from their archive.
+	A `row_offset` marks the file as rows appended to the session's stored file
+	of the same name; its rows are numbered from there.
+	With `structured=False` the chunks carry no row_kv values; store_parsed
+	takes them from the frame instead, so a parse worker does not send every
+	value back twice.
+	"""
+	path = as_source(path)
+	suffix = path.suffix.lower()
+	if suffix == ".csv":
+		df = read_csv_frame(path)
+		if row_offset:
+			df.index = df.index + row_offset
+		return {
+			"file": path.name,
+			"path": path,
+			"chunks": frame_to_chunks(df, path.name, structured=structured),
+			"columns": analyze_frame(df),
+			"encoding": df.attrs.get("encoding"),
+			"frame": df,
+			"row_offset": row_offset,
+			"structured": structured,
+		}
+	if suffix in _TEXT_SUFFIXES:
+		# universal newlines, as Path.read_text would apply
+		text = path.read_bytes().decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+		return {
+			"file": path.name,
+			"path": path,
+			"chunks": [{"id": chunk_id(path.name, text=text), "text": text, "metadata": {"file": path.name}}],
+			"columns": [],
+			"encoding": None,
+			"frame": None,
+			"row_offset": row_offset,
+		}
+	return None
+
+
+def list_files(folder_path: str | Path) -> List[Path]:
+	return [p for p in Path(folder_path).rglob("*") if p.is_file()]
+
+
+def parse_folder(folder_path: str | Path) -> List[Dict[str, Any]]:
+	parsed: List[Dict[str, Any]] = []
+	for path in list_files(folder_path):
+		item = parse_file(path)
+		if item is not None:
+			parsed.append(item)
+	return parsed
+
+
+def store_parsed(session_id: str, parsed: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+	"""
+	Write parsed files to SQLite (rows + FTS + row_kv), store CSV schemas and
+	materialize each CSV as a typed table (plus a Parquet copy when the
+	columnar backend is enabled). Items parsed with a row_offset are appended
+	to the stored file: new schema columns are added and the rows go into its
+	existing typed table and as a further Parquet part.
+	Returns the flattened list of chunks for vector indexing.
+	"""
+	settings = get_settings()
+	chunks: List[Dict[str, Any]] = [ch for item in parsed for ch in item["chunks"]]
+	if chunks:
+		store_chunks(session_id=session_id, chunks=chunks)
+	for item in parsed:
+		if item.get("frame") is not None and not item.get("structured", True):
+			keys, rows = frame_key_values(item["frame"])
+			bulk_load_key_values(session_id=session_id, filename=item["file"], keys=keys, rows=rows)
+		if not item["columns"]:
+			continue
+		append = item.get("row_offset") is not None
+		try:
+			if append:
+				add_schema_columns(session_id=session_id, filename=item["file"], columns=item["columns"], encoding=item.get("encoding"))
+			else:
+				insert_schema_columns(session_id=session_id, filename=item["file"], columns=item["columns"], encoding=item.get("encoding"))
+		except Exception:
+			logger.exception("schema_analysis_failed")
+		if settings.TYPED_TABLES_ENABLED and item.get("frame") is not None:
+			part = 0
+			try:
+				if append and get_typed_table(session_id, item["file"]) is not None:
+					part = columnar.next_part(session_id, item["file"]) if columnar.is_enabled() else 0
+					append_typed_rows(session_id=session_id, filename=item["file"], df=item["frame"])
+				else:
+					materialize_frame(session_id=session_id, filename=item["file"], df=item["frame"])
+			except Exception:
+				logger.exception("typed_table_failed")
+				continue
+			if columnar.is_enabled():
+				try:
+					columnar.write_parquet_part(session_id=session_id, filename=item["file"], df=item["frame"], part=part)
+				except Exception:
+					logger.exception("columnar_write_failed")
+	return chunks
+
+
+def should_stream(path: str | Path | ZipMember) -> bool:
+	settings = get_settings()
+	path = as_source(path)
+	if path.suffix.lower() != ".csv":
+		return False
+	return path.stat().st_size > settings.CSV_STREAM_THRESHOLD_MB * 1024 * 1024
+
+
+def should_defer_indexes(session_id: str, paths: List[Source]) -> bool:
+	"""
+	Large uploads load faster with the secondary indexes dropped and rebuilt once.
+	Only in a session's own database file: in the shared SQLITE_DB_PATH
+	(SQLITE_SHARD_SESSIONS=false) that would slow every other session's
+	queries and rebuild the indexes over all of their rows.
+	"""
+	settings = get_settings()
+	if not settings.SQL_DEFER_INDEXES:
+		return False
+	if os.path.abspath(session_db_path(session_id)) == os.path.abspath(settings.SQLITE_DB_PATH):
+		return False
+	total = sum(as_source(p).stat().st_size for p in paths if as_source(p).is_file())
+	return total >= settings.SQL_DEFER_INDEXES_MIN_MB * 1024 * 1024
+
+
+async def ingest_csv_streaming(
+	session_id: str,
+	path: str | Path | ZipMember,
+	rag: RAGAdapter,
+	batch_rows: Optional[int] = None,
+	progress: Optional[Progress] = None,
+	row_offset: Optional[int] = None,
+) -> int:
+	"""
+	Stream a large CSV into SQLite and the vector index in fixed-size batches.
+	Only one batch of rows and chunks is held in memory at a time, plus the
+	previous batch while its chunks are still being embedded.
+	With a `row_offset` the rows are appended to the session's stored file of
+	the same name (see parse_file).
+	Returns the number of chunks ingested.
+	"""
+	settings = get_settings()
+	path = as_source(path)
+	columns: Optional[List[Dict[str, Any]]] = None
+	encoding: Optional[str] = None
+	typed = settings.TYPED_TABLES_ENABLED
+	parquet = typed and columnar.is_enabled()
+	append = row_offset is not None
+	# appending to an existing typed table keeps its column types and indexes
+	new_table = not (append and typed and get_typed_table(session_id, path.name) is not None)
+	first_part = 0 if new_table or not parquet else columnar.next_part(session_id, path.name)
+	total = 0
+	indexing: Optional[asyncio.Task] = None
+	try:
+		for part, frame in enumerate(iter_csv_frames(path, batch_rows=batch_rows or settings.CSV_STREAM_BATCH_ROWS), start=first_part):
+			if row_offset:
+				frame.index = frame.index + row_offset
+			if columns is None:
+				columns = analyze_frame(frame)
+				encoding = frame.attrs.get("encoding")
+				if typed and new_table:
+					# column types are inferred from the first batch
+					create_typed_table(session_id=session_id, filename=path.name, df=frame)
+				elif typed:
+					append_typed_rows(session_id=session_id, filename=path.name, df=frame)
+			elif typed:
+				append_typed_rows(session_id=session_id, filename=path.name, df=frame)
+			if parquet:
+				columnar.write_parquet_part(session_id=session_id, filename=path.name, df=frame, part=part)
+			chunks = frame_to_chunks(frame, path.name)
+			store_chunks(session_id=session_id, chunks=chunks)
+			# the previous batch was embedded while this one was parsed and stored;
+			# one batch is indexed at a time, so reading waits on a slow index
+			if indexing is not None:
+				await indexing
+			indexing = asyncio.create_task(rag.build_index(session_id=session_id, chunks=chunks))
+			# let the task start its embedding threads before the next batch is read
+			await asyncio.sleep(0)
+			total += len(chunks)
+			if progress is not None:
+				progress("storing", len(frame))
+	finally:
+		if indexing is not None:
+			await indexing
+	if columns:
+		if append:
+			add_schema_columns(session_id=session_id, filename=path.name, columns=columns, encoding=encoding)
+		else:
+			insert_schema_columns(session_id=session_id, filename=path.name, columns=columns, encoding=encoding)
+		if typed and new_table:
+			index_typed_table(session_id=session_id, filename=path.name)
+	return total
+
+
+async def reuse_ingested_file(
+	session_id: str,
+	filename: str,
+	src: Dict[str, Any],
+	rag: RAGAdapter,
+	progress: Optional[Progress] = None,
+) -> int:
+	"""
+	Give `session_id` a copy of a file already ingested in another session
+	(found by content hash) instead of parsing and embedding it again: stored
+	rows / FTS / row_kv / schema, the typed table, its Parquet parts and the
+	vectors. Adapters that cannot copy vectors re-index the copied chunks.
+	Returns the number of chunks.
+	"""
+	settings = get_settings()
+	copied = copy_file_data(src_session_id=src["session_id"], src_file_id=src["file_id"], session_id=session_id, filename=filename)
+	if settings.TYPED_TABLES_ENABLED:
+		try:
+			table = copy_typed_table(src_session_id=src["session_id"], src_file_id=src["file_id"], session_id=session_id, filename=filename)
+			if table and columnar.is_enabled():
+				columnar.copy_parquet(src["session_id"], typed_table_name(src["file_id"]), session_id, table)
+		except Exception:
+			logger.exception("typed_table_copy_failed")
+	if progress is not None:
+		progress("storing", copied["rows"])
+	copy_vectors = getattr(rag, "copy_file", None)
+	vectors = await copy_vectors(src["session_id"], session_id, src["filename"], filename) if copy_vectors else None
+	if vectors is None:
+		if progress is not None:
+			progress("indexing", 0)
+		await rag.build_index(session_id=session_id, chunks=load_file_chunks(session_id, filename))
+	logger.info(
+		{
+			"event": "ingest_file_reused",
+			"session_id": session_id,
+			"file": filename,
+			"from_session": src["session_id"],
+			"from_file": src["filename"],
+			"rows": copied["rows"],
+			"vectors": vectors,
+		}
+	)
+	return copied["rows"]
+
+
+def timed_parse_file(path: str | Path | ZipMember, row_offset: Optional[int] = None, structured: bool = True) -> Optional[Dict[str, Any]]:
+	"""
+	parse_file plus its wall time as `parse_seconds`. Runs in pool workers.
+	"""
+	started = time.perf_counter()
+	item = parse_file(path, row_offset=row_offset, structured=structured)
+	if item is not None:
+		item["parse_seconds"] = round(time.perf_counter() - started, 4)
+	return item
+
+
+def ingest_workers(paths: List[Source]) -> int:
+	"""
+	Number of parse processes for these (non-streamed) files: INGEST_WORKERS
+	(0 = one per CPU), capped at the file count. Small uploads stay in-process
+	because starting workers costs more than it saves.
+	"""
+	settings = get_settings()
+	if len(paths) < 2:
+		return 1
+	total = sum(as_source(p).stat().st_size for p in paths if as_source(p).is_file())
+	if total < settings.INGEST_PARALLEL_MIN_MB * 1024 * 1024:
+		return 1
+	workers = settings.INGEST_WORKERS or os.cpu_count() or 1
+	return max(1, min(workers, len(paths)))
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+	"""
+	Shared parse pool, created on first use and kept for later uploads.
+	Workers are spawned, not forked, so they never inherit the server's threads.
+	"""
+	global _pool, _pool_workers
+	with _pool_lock:
+		if _pool is None or _pool_workers != workers:
+			if _pool is not None:
+				_pool.shutdown(wait=False)
+			_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+			_pool_workers = workers
+		return _pool
+
+
+async def ingest_files(
+	session_id: str,
+	paths: List[Source],
+	rag: RAGAdapter,
+	progress: Optional[Progress] = None,
+	hashes: Optional[Dict[str, str]] = None,
+	append: bool = False,
+) -> Dict[str, Any]:
+	"""
+	Ingest saved upload files into SQLite and the vector index.
+	With `append`, a file named like one already stored in the session adds its
+	rows to that file (row_index continues, new columns join the schema, only
+	the new chunks are embedded); other files are added as new files. The cost
+	is that of the uploaded data, never a rebuild of the session.
+	With INGEST_DEDUP_ENABLED, a file whose sha256 (from `hashes`, keyed by
+	str(path), or computed here) matches a file stored in another session is
+	copied from there instead of being parsed and embedded.
+	CSVs above CSV_STREAM_THRESHOLD_MB are streamed batch by batch. The other
+	files are parsed and chunked in a process pool; this process is the single
+	SQLite writer and stores each file as soon as its parse finishes. Uploads
+	above SQL_DEFER_INDEXES_MIN_MB are loaded with deferred indexes.
+	`progress(stage, rows)` is called with the rows stored since its last call.
+	Returns: { doc_count, seconds, files: [{ file, chunks, seconds, parse_seconds, store_seconds, streamed, deduplicated, appended }] }
+	"""
+	settings = get_settings()
+	started = time.perf_counter()
+	report: List[Dict[str, Any]] = []
+	chunks: List[Dict[str, Any]] = []
+	streamed = 0
+	reused = 0
+	file_hashes: Dict[str, Optional[str]] = {}
+	# row_index of the next row, for uploads that extend a stored file
+	offsets: Dict[str, int] = {}
+	if append:
+		for path in paths:
+			offset = file_row_offset(session_id, as_source(path).name)
+			if offset is not None:
+				offsets[as_source(path).name] = offset
+				# the stored file no longer matches any single upload
+				file_hashes[as_source(path).name] = None
+
+	def _report(stage: str, rows: int = 0) -> None:
+		if progress is not None:
+			progress(stage, rows)
+
+	_report("parsing")
+	to_ingest: List[Source] = []
+	for path in paths:
+		name = as_source(path).name
+		if not settings.INGEST_DEDUP_ENABLED or name in offsets:
+			to_ingest.append(path)
+			continue
+		sha256 = (hashes or {}).get(str(path)) or content_sha256(path)
+		src = find_ingested_file(sha256, exclude_session=session_id)
+		if src is None:
+			file_hashes[name] = sha256
+			to_ingest.append(path)
+			continue
+		file_started = time.perf_counter()
+		count = await reuse_ingested_file(session_id=session_id, filename=name, src=src, rag=rag, progress=progress)
+		record_file_hash(session_id, name, sha256)
+		reused += count
+		report.append({"file": name, "chunks": count, "seconds": round(time.perf_counter() - file_started, 4), "streamed": False, "deduplicated": True})
+
+	# rebuilding every index of an existing session would cost more than the append
+	bulk = not append and should_defer_indexes(session_id, to_ingest)
+	with deferred_indexes(session_id) if bulk else nullcontext() as index_stats:
+		to_parse: List[Source] = []
+		for path in to_ingest:
+			if not should_stream(path):
+				to_parse.append(path)
+				continue
+			file_started = time.perf_counter()
+			name = as_source(path).name
+			count = await ingest_csv_streaming(session_id=session_id, path=path, rag=rag, progress=progress, row_offset=offsets.get(name))
+			streamed += count
+			report.append(
+				{"file": name, "chunks": count, "seconds": round(time.perf_counter() - file_started, 4), "streamed": True, "appended": name in offsets}
+			)
+
+		def _store(item: Dict[str, Any]) -> None:
+			store_started = time.perf_counter()
+			stored = store_parsed(session_id=session_id, parsed=[item])
+			chunks.extend(stored)
+			store_seconds = round(time.perf_counter() - store_started, 4)
+			report.append(
+				{
+					"file": item["file"],
+					"chunks": len(stored),
+					"seconds": round(item.get("parse_seconds", 0.0) + store_seconds, 4),
+					"parse_seconds": item.get("parse_seconds"),
+					"store_seconds": store_seconds,
+					"streamed": False,
+					"appended": item.get("row_offset") is not None,
+				}
+			)
+			frame = item.get("frame")
+			_report("storing", len(frame) if frame is not None else len(stored))
+
+		workers = ingest_workers(to_parse)
+		if workers > 1:
+			loop = asyncio.get_running_loop()
+			pool = _get_pool(workers)
+			# row_kv values are written from the returned frame, not sent a second time in the chunks
+			futures = [loop.run_in_executor(pool, timed_parse_file, path, offsets.get(as_source(path).name), False) for path in to_parse]
+			for next_done in asyncio.as_completed(futures):
+				item = await next_done
+				if item is not None:
+					_store(item)
+		else:
+			for path in to_parse:
+				item = timed_parse_file(path, row_offset=offsets.get(as_source(path).name), structured=False)
+				if item is not None:
+					_store(item)
+	if bulk:
+		logger.info({"event": "ingest_deferred_indexes", "session_id": session_id, **(index_stats or {})})
+	if chunks:
+		_report("indexing")
+		await rag.build_index(session_id=session_id, chunks=chunks)
+	# only completely stored and indexed files become reusable
+	for entry in report:
+		if entry["file"] in file_hashes:
+			record_file_hash(session_id, entry["file"], file_hashes[entry["file"]])
+	seconds = round(time.perf_counter() - started, 4)
+	logger.info({"event": "ingest_files", "session_id": session_id, "workers": workers, "seconds": seconds, "files": report})
+	return {"doc_count": reused + streamed + len(chunks), "seconds": seconds, "files": report}
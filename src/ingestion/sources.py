@@ -0,0 +1,105 @@
+from typing import List, Union, BinaryIO, Iterator
+from pathlib import Path, PurePosixPath
+from contextlib import contextmanager
+from types import SimpleNamespace
+import hashlib
+import zipfile
+
+
+class ZipMember:
+	"""
+	A file inside a zip archive, read as a stream straight from the archive
+	instead of being extracted. Supports the parts of the Path API the ingestion
+	pipeline uses (name, suffix, stat().st_size, is_file(), open("rb")) and is
+	picklable, so parse workers can open it themselves.
+	"""
+
+	def __init__(self, archive: str | Path, member: str, size: int):
+		self.archive = Path(archive)
+		self.member = member
+		self.size = int(size)
+
+	@property
+	def name(self) -> str:
+		return PurePosixPath(self.member).name
+
+	@property
+	def suffix(self) -> str:
+		return PurePosixPath(self.member).suffix
+
+	def stat(self) -> SimpleNamespace:
+		# uncompressed size, as it would be on disk after extraction
+		return SimpleNamespace(st_size=self.size)
+
+	def is_file(self) -> bool:
+		return True
+
+	def open(self, mode: str = "rb") -> BinaryIO:
+		"""
+		Seekable decompressing stream of the member. Closing it releases the
+		archive file handle as well.
+		"""
+		if mode != "rb":
+			raise ValueError("zip members can only be opened with mode 'rb'")
+		archive = zipfile.ZipFile(self.archive)
+		try:
+			return archive.open(self.member)
+		finally:
+			# the member stream keeps its own reference to the underlying file
+			archive.close()
+
+	def read_bytes(self) -> bytes:
+		with self.open() as f:
+			return f.read()
+
+	def __repr__(self) -> str:
+		return f"ZipMember({str(self.archive)!r}, {self.member!r})"
+
+
+Source = Union[Path, ZipMember]
+
+
+def as_source(path: str | Path | ZipMember) -> Source:
+	return path if isinstance(path, ZipMember) else Path(path)
+
+
+@contextmanager
+def csv_input(source: Source) -> Iterator[Union[Path, BinaryIO]]:
+	"""
+	Argument for pd.read_csv: the path itself for files on disk, a stream opened
+	for the duration of the block for zip members.
+	"""
+	if isinstance(source, ZipMember):
+		with source.open("rb") as f:
+			yield f
+	else:
+		yield source
+
+
+def content_sha256(source: Source, chunk_bytes: int = 1 << 20) -> str:
+	"""
+	sha256 of the file contents (decompressed, for zip members), read in pieces.
+	"""
+	digest = hashlib.sha256()
+	with as_source(source).open("rb") as f:
+		for piece in iter(lambda: f.read(chunk_bytes), b""):
+			digest.update(piece)
+	return digest.hexdigest()
+
+
+def list_zip_members(zip_path: str | Path, max_total_bytes: int | None = None) -> List[ZipMember]:
+	"""
+	Regular files inside an archive, without extracting anything. Skips
+	directories and macOS resource forks. Raises ValueError if the total
+	uncompressed size exceeds `max_total_bytes`.
+	"""
+	with zipfile.ZipFile(zip_path) as z:
+		infos = [
+			info
+			for info in z.infolist()
+			if not info.is_dir() and not info.filename.startswith("__MACOSX/") and not PurePosixPath(info.filename).name.startswith("._")
+		]
+	total = sum(info.file_size for info in infos)
+	if max_total_bytes is not None and total > max_total_bytes:
+		raise ValueError(f"zip expands to {total} bytes, limit is {max_total_bytes}")
+	return [ZipMember(zip_path, info.filename, info.file_size) for info in infos]
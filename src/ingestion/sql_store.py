@@ -1,35 +1,135 @@
-from typing import List, Dict, Any, Optional
-from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional, Iterable, Iterator, Tuple
+from concurrent.futures import Future
 from datetime import datetime
 import sqlite3
+from contextlib import contextmanager
 import json
+import os
+import threading
+import time
 
 from src.config.settings import get_settings
+from src.ingestion.chunk_ids import chunk_id as make_chunk_id, ensure_chunk_id
+from src.storage.sqlite import get_conn, register_schema, register_session_schema, remove_db, session_db_exists, session_db_path
+from src.storage.writer import submit_write, write, yield_writes
+from src.utils.logging import get_logger
 
 
-def _get_conn() -> sqlite3.Connection:
+logger = get_logger(__name__)
+
+# Secondary indexes maintained on every insert into the bulk-loaded tables.
+# In deferred-index mode they are dropped during the load and rebuilt once.
+_BULK_INDEXES = {
+	"idx_rows_session": "rows(session_id)",
+	"idx_rows_file": "rows(file_id)",
+	"idx_rows_chunk": "rows(chunk_id)",
+	"idx_row_kv_session": "row_kv(session_id)",
+	"idx_row_kv_session_col": "row_kv(session_id, col_name)",
+	"idx_row_kv_session_col_val": "row_kv(session_id, col_name, value_text)",
+}
+_bulk_lock = threading.Lock()
+# running deferred-index ingests per session database file
+_bulk_depth: Dict[str, int] = {}
+# rows per statement inside a bulk write; between two, waiting chat writes get the
+# writer (see yield_writes), so they wait for one step rather than a whole batch.
+# FTS5 writes a segment per statement, so much smaller steps slow the load down
+WRITE_STEP_ROWS = 1000
+
+# Full-text indexes over rows.text. External content: an index does not keep its
+# own copy of the text, columns are read back from rows by rowid = rows.id.
+# fts_rows tokenizes words (porter stemming for English); fts_rows_tri indexes
+# character trigrams, so substrings and Korean terms inside longer words (no
+# whitespace between them) are found through the index as well.
+_FTS_TABLES = {"fts_rows": ("fts", "porter"), "fts_rows_tri": ("fts_tri", "trigram")}
+_FTS_COLUMNS = "text, session_id, file_id, row_index, chunk_id"
+_FTS_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+	text,
+	session_id UNINDEXED,
+	file_id UNINDEXED,
+	row_index UNINDEXED,
+	chunk_id UNINDEXED,
+	content = 'rows',
+	content_rowid = 'id',
+	tokenize = '{tokenizer}'
+);
+"""
+
+# Keep the external-content indexes in sync when rows change or go away. New
+# rows are indexed per batch by _index_new_rows, which is faster than a row trigger.
+_FTS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS rows_{prefix}_delete AFTER DELETE ON rows BEGIN
+	INSERT INTO {table}({table}, rowid, text, session_id, file_id, row_index, chunk_id)
+	VALUES ('delete', old.id, old.text, old.session_id, old.file_id, old.row_index, old.chunk_id);
+END;
+CREATE TRIGGER IF NOT EXISTS rows_{prefix}_update AFTER UPDATE ON rows BEGIN
+	INSERT INTO {table}({table}, rowid, text, session_id, file_id, row_index, chunk_id)
+	VALUES ('delete', old.id, old.text, old.session_id, old.file_id, old.row_index, old.chunk_id);
+	INSERT INTO {table}(rowid, text, session_id, file_id, row_index, chunk_id)
+	VALUES (new.id, new.text, new.session_id, new.file_id, new.row_index, new.chunk_id);
+END;
+"""
+
+
+def _fts_ddl(table: str) -> str:
+	return _FTS_DDL.format(table=table, tokenizer=_FTS_TABLES[table][1])
+
+
+def _get_conn(session_id: Optional[str] = None) -> sqlite3.Connection:
+	"""
+	Connection to the session's database, or to the catalog without a session.
+	"""
 	settings = get_settings()
-	db_path = Path(settings.SQLITE_DB_PATH)
-	conn = sqlite3.connect(str(db_path))
-	conn.row_factory = sqlite3.Row
-	conn.execute("PRAGMA journal_mode=WAL;")
-	conn.execute("PRAGMA synchronous=NORMAL;")
-	_init_schema(conn)
-	return conn
+	return get_conn(session_db_path(session_id) if session_id is not None else settings.SQLITE_DB_PATH)
 
 
-def _init_schema(conn: sqlite3.Connection) -> None:
+def _write(fn: Callable[[sqlite3.Connection], Any], session_id: str, **kwargs: Any) -> Any:
+	# ingest writes to a session database are bulk writes
+	return write(fn, db_path=session_db_path(session_id), bulk=True, **kwargs)
+
+
+@register_schema
+def _init_catalog_schema(conn: sqlite3.Connection) -> None:
 	conn.executescript(
 		"""
 		CREATE TABLE IF NOT EXISTS ingestion_sessions (
 			session_id TEXT PRIMARY KEY,
-			created_at TEXT NOT NULL
+			created_at TEXT NOT NULL,
+			last_access_at TEXT,
+			generation INTEGER NOT NULL DEFAULT 0
 		);
 
+		-- content hashes of completely stored files (dedup registry), across sessions
+		CREATE TABLE IF NOT EXISTS file_hashes (
+			session_id TEXT NOT NULL,
+			filename TEXT NOT NULL,
+			file_id INTEGER NOT NULL,
+			sha256 TEXT NOT NULL,
+			PRIMARY KEY (session_id, filename)
+		);
+		CREATE INDEX IF NOT EXISTS idx_file_hashes_sha256 ON file_hashes(sha256);
+		"""
+	)
+	_ensure_column(conn, "ingestion_sessions", "last_access_at", "TEXT")
+	_ensure_column(conn, "ingestion_sessions", "generation", "INTEGER NOT NULL DEFAULT 0")
+	# databases from before the registry kept the hashes on files (shared layout only)
+	cols = {r["name"] for r in conn.execute("PRAGMA table_info(files)").fetchall()}
+	if "sha256" in cols:
+		conn.execute(
+			"INSERT OR IGNORE INTO file_hashes(session_id, filename, file_id, sha256) "
+			"SELECT session_id, filename, id, sha256 FROM files WHERE sha256 IS NOT NULL"
+		)
+
+
+@register_session_schema
+def _init_schema(conn: sqlite3.Connection) -> None:
+	conn.executescript(
+		"""
 		CREATE TABLE IF NOT EXISTS files (
 			id INTEGER PRIMARY KEY AUTOINCREMENT,
 			session_id TEXT NOT NULL,
-			filename TEXT NOT NULL
+			filename TEXT NOT NULL,
+			encoding TEXT
 		);
 		CREATE INDEX IF NOT EXISTS idx_files_session ON files(session_id);
 
@@ -49,12 +149,10 @@ def _init_schema(conn: sqlite3.Connection) -> None:
 			session_id TEXT NOT NULL,
 			file_id INTEGER NOT NULL,
 			row_index INTEGER,
-			data_json TEXT NOT NULL,
-			chunk_id TEXT
+			data_json TEXT NOT NULL,     -- {"metadata": {...}}; the chunk text is in `text`
+			chunk_id TEXT,
+			text TEXT
 		);
-		CREATE INDEX IF NOT EXISTS idx_rows_session ON rows(session_id);
-		CREATE INDEX IF NOT EXISTS idx_rows_file ON rows(file_id);
-		CREATE INDEX IF NOT EXISTS idx_rows_chunk ON rows(chunk_id);
 
 		CREATE TABLE IF NOT EXISTS row_kv (
 			session_id TEXT NOT NULL,
@@ -63,30 +161,189 @@ def _init_schema(conn: sqlite3.Connection) -> None:
 			col_name TEXT NOT NULL,
 			value_text TEXT
 		);
-		CREATE INDEX IF NOT EXISTS idx_row_kv_session ON row_kv(session_id);
-		CREATE INDEX IF NOT EXISTS idx_row_kv_session_col ON row_kv(session_id, col_name);
-		CREATE INDEX IF NOT EXISTS idx_row_kv_session_col_val ON row_kv(session_id, col_name, value_text);
-
-		CREATE VIRTUAL TABLE IF NOT EXISTS fts_rows USING fts5(
-			text,
-			session_id UNINDEXED,
-			file_id UNINDEXED,
-			row_index UNINDEXED,
-			chunk_id UNINDEXED,
-			tokenize = 'porter'
+
+		-- catalog of per-file typed tables (see src/ingestion/typed_tables.py)
+		CREATE TABLE IF NOT EXISTS typed_tables (
+			file_id INTEGER PRIMARY KEY,
+			session_id TEXT NOT NULL,
+			table_name TEXT NOT NULL,
+			columns_json TEXT NOT NULL,
+			row_count INTEGER NOT NULL DEFAULT 0
 		);
+		CREATE INDEX IF NOT EXISTS idx_typed_tables_session ON typed_tables(session_id);
 		"""
+		+ _fts_ddl("fts_rows")
+	)
+	# migrate databases created before files.encoding / files.sha256 existed
+	_ensure_column(conn, "files", "encoding", "TEXT")
+	# content hash, set once a file is completely stored (dedup registry)
+	_ensure_column(conn, "files", "sha256", "TEXT")
+	# migrate databases created before rows.text / the external-content fts_rows
+	_ensure_column(conn, "rows", "text", "TEXT")
+	_migrate_fts_external_content(conn)
+	# the trigram index was added later; it is built from rows when missing
+	_ensure_fts_index(conn, "fts_rows_tri")
+	for table, (prefix, _) in _FTS_TABLES.items():
+		conn.executescript(_FTS_TRIGGERS.format(table=table, prefix=prefix))
+	# while a deferred-index bulk ingest is running these are rebuilt at its end
+	path = conn.execute("PRAGMA database_list").fetchone()["file"]
+	if not _bulk_depth.get(os.path.abspath(path) if path else path):
+		_create_bulk_indexes(conn)
+
+
+def _migrate_fts_external_content(conn: sqlite3.Connection) -> None:
+	"""
+	One-time migration from the fts_rows table that stored its own copy of every
+	chunk text (and rows.data_json a third): move the text into rows.text, drop
+	it from data_json and rebuild fts_rows as an external-content index.
+	Space is reused by later inserts; run VACUUM to return it to the OS.
+	"""
+	def _needs_migration() -> bool:
+		row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'fts_rows'").fetchone()
+		return row is not None and "content_rowid" not in row["sql"]
+
+	if not _needs_migration():
+		return
+	conn.execute("BEGIN IMMEDIATE")
+	try:
+		# another connection may have migrated while we waited for the lock
+		if _needs_migration():
+			started = time.perf_counter()
+			moved = conn.execute(
+				"UPDATE rows SET text = json_extract(data_json, '$.text'), data_json = json_remove(data_json, '$.text') WHERE text IS NULL"
+			).rowcount
+			conn.execute("DROP TABLE fts_rows")
+			conn.execute(_fts_ddl("fts_rows"))
+			conn.execute("INSERT INTO fts_rows(fts_rows) VALUES('rebuild')")
+			logger.info({"event": "fts_migrated_external_content", "rows": moved, "seconds": round(time.perf_counter() - started, 4)})
+		conn.commit()
+	except BaseException:
+		conn.rollback()
+		raise
+
+
+def _ensure_fts_index(conn: sqlite3.Connection, table: str) -> None:
+	"""
+	Create a full-text index missing from an existing database and build it
+	from the rows already stored.
+	"""
+	def _missing() -> bool:
+		return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is None
+
+	if not _missing():
+		return
+	conn.execute("BEGIN IMMEDIATE")
+	try:
+		if _missing():
+			started = time.perf_counter()
+			conn.execute(_fts_ddl(table))
+			conn.execute(f"INSERT INTO {table}({table}) VALUES('rebuild')")
+			logger.info({"event": "fts_index_built", "table": table, "seconds": round(time.perf_counter() - started, 4)})
+		conn.commit()
+	except BaseException:
+		conn.rollback()
+		raise
+
+
+def _index_new_rows(conn: sqlite3.Connection, count: int) -> None:
+	"""
+	Add the `count` rows just inserted on this connection to the full-text
+	indexes. The inserting statement held the write lock, so their ids are
+	contiguous and end at last_insert_rowid().
+	"""
+	if count <= 0:
+		return
+	last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+	for table in _FTS_TABLES:
+		conn.execute(
+			f"INSERT INTO {table}(rowid, {_FTS_COLUMNS}) SELECT id, {_FTS_COLUMNS} FROM rows WHERE id BETWEEN ? AND ?",
+			(last - count + 1, last),
+		)
+
+
+def _create_bulk_indexes(conn: sqlite3.Connection) -> None:
+	for name, target in _BULK_INDEXES.items():
+		conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+	cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+	if column not in cols:
+		conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _now() -> str:
+	return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+def _ensure_session(conn: sqlite3.Connection, session_id: str) -> None:
+	now = _now()
+	# a session id used again after a delete never starts from a generation seen before
+	conn.execute(
+		"INSERT INTO ingestion_sessions(session_id, created_at, last_access_at, generation) VALUES (?, ?, ?, ?) "
+		"ON CONFLICT(session_id) DO UPDATE SET last_access_at = excluded.last_access_at",
+		(session_id, now, now, time.time_ns()),
 	)
 
 
 def ensure_session(session_id: str) -> None:
+	"""
+	Register the session in the catalog (an ingest counts as an access).
+	"""
+	write(lambda conn: _ensure_session(conn, session_id))
+
+
+def bump_generation(session_id: str) -> None:
+	"""
+	Mark the session's searchable data (rows, FTS, vectors) as changed, once
+	the new data is stored: cached search results of older generations are
+	no longer served (see src/rag/search_cache.py).
+	"""
+	write(
+		lambda conn: conn.execute(
+			"UPDATE ingestion_sessions SET generation = MAX(generation + 1, ?) WHERE session_id = ?",
+			(time.time_ns(), session_id),
+		)
+	)
+
+
+def session_generation(session_id: str) -> Optional[int]:
+	"""
+	The session's data generation; None for an unregistered session.
+	"""
 	conn = _get_conn()
 	try:
-		conn.execute(
-			"INSERT OR IGNORE INTO ingestion_sessions(session_id, created_at) VALUES (?, ?)",
-			(session_id, datetime.utcnow().isoformat(timespec="seconds") + "Z"),
+		row = conn.execute("SELECT generation FROM ingestion_sessions WHERE session_id = ?", (session_id,)).fetchone()
+		return None if row is None else int(row[0])
+	finally:
+		conn.close()
+
+
+def touch_session(session_id: str) -> "Future[Any]":
+	"""
+	Record an access to a registered session (see src/server/sessions.py).
+	Returns the queued write's Future.
+	"""
+	return submit_write(
+		lambda conn: conn.execute(
+			"UPDATE ingestion_sessions SET last_access_at = ? WHERE session_id = ?",
+			(_now(), session_id),
 		)
-		conn.commit()
+	)
+
+
+def list_sessions() -> List[Dict[str, Any]]:
+	"""
+	Registered sessions, least recently accessed first:
+	[{ session_id, created_at, last_access_at }]
+	"""
+	conn = _get_conn()
+	try:
+		cur = conn.execute(
+			"SELECT session_id, created_at, COALESCE(last_access_at, created_at) AS last_access_at "
+			"FROM ingestion_sessions ORDER BY COALESCE(last_access_at, created_at), session_id"
+		)
+		return [dict(r) for r in cur.fetchall()]
 	finally:
 		conn.close()
 
@@ -106,106 +363,525 @@ def _ensure_file(conn: sqlite3.Connection, session_id: str, filename: str) -> in
 	return int(cur.lastrowid)
 
 
-def insert_schema_columns(session_id: str, filename: str, columns: List[Dict[str, Any]]) -> None:
-	conn = _get_conn()
-	try:
-		ensure_session(session_id)
+def insert_schema_columns(session_id: str, filename: str, columns: List[Dict[str, Any]], encoding: Optional[str] = None) -> None:
+	"""
+	Replace the stored schema of a file. When given, the detected text encoding
+	is recorded on the file so later re-reads do not have to sniff again.
+	"""
+	def _replace(conn: sqlite3.Connection) -> None:
 		file_id = _ensure_file(conn, session_id, filename)
+		if encoding:
+			conn.execute("UPDATE files SET encoding = ? WHERE id = ?", (encoding, file_id))
 		conn.execute("DELETE FROM schema_columns WHERE session_id = ? AND file_id = ?", (session_id, file_id))
-		for col in columns:
+		conn.executemany(
+			"INSERT INTO schema_columns(session_id, file_id, col_name, inferred_type, position) VALUES (?, ?, ?, ?, ?)",
+			[
+				(session_id, file_id, str(col.get("name", "")), str(col.get("type", "text")), int(col.get("position", 0)))
+				for col in columns
+			],
+		)
+
+	ensure_session(session_id)
+	_write(_replace, session_id)
+
+
+def add_schema_columns(session_id: str, filename: str, columns: List[Dict[str, Any]], encoding: Optional[str] = None) -> int:
+	"""
+	Incremental schema update for rows appended to a stored file: columns not
+	stored yet are added after the existing ones; stored columns keep their
+	inferred type. Returns the number of columns added.
+	"""
+	def _add(conn: sqlite3.Connection) -> int:
+		file_id = _ensure_file(conn, session_id, filename)
+		if encoding:
+			conn.execute("UPDATE files SET encoding = COALESCE(encoding, ?) WHERE id = ?", (encoding, file_id))
+		stored = conn.execute(
+			"SELECT col_name, position FROM schema_columns WHERE session_id = ? AND file_id = ?",
+			(session_id, file_id),
+		).fetchall()
+		names = {r["col_name"] for r in stored}
+		next_pos = max((int(r["position"]) for r in stored), default=-1) + 1
+		added = [col for col in columns if str(col.get("name", "")) not in names]
+		conn.executemany(
+			"INSERT INTO schema_columns(session_id, file_id, col_name, inferred_type, position) VALUES (?, ?, ?, ?, ?)",
+			[(session_id, file_id, str(col.get("name", "")), str(col.get("type", "text")), next_pos + i) for i, col in enumerate(added)],
+		)
+		return len(added)
+
+	ensure_session(session_id)
+	return _write(_add, session_id)
+
+
+def file_row_offset(session_id: str, filename: str) -> Optional[int]:
+	"""
+	row_index for the next row appended to a stored file (last row_index + 1),
+	or None if the session has no such file. Rows are always stored in
+	row_index order, so the newest row is found through idx_rows_file without
+	scanning the file.
+	"""
+	if not session_db_exists(session_id):
+		return None
+	conn = _get_conn(session_id)
+	try:
+		row = conn.execute("SELECT id FROM files WHERE session_id = ? AND filename = ?", (session_id, filename)).fetchone()
+		if not row:
+			return None
+		last = conn.execute(
+			"SELECT row_index FROM rows WHERE file_id = ? AND row_index IS NOT NULL ORDER BY id DESC LIMIT 1",
+			(int(row["id"]),),
+		).fetchone()
+		return int(last["row_index"]) + 1 if last else 0
+	finally:
+		conn.close()
+
+
+def get_file_encoding(session_id: str, filename: str) -> Optional[str]:
+	if not session_db_exists(session_id):
+		return None
+	conn = _get_conn(session_id)
+	try:
+		row = conn.execute(
+			"SELECT encoding FROM files WHERE session_id = ? AND filename = ? AND encoding IS NOT NULL LIMIT 1",
+			(session_id, filename),
+		).fetchone()
+		return row["encoding"] if row else None
+	finally:
+		conn.close()
+
+
+def record_file_hash(session_id: str, filename: str, sha256: Optional[str]) -> None:
+	"""
+	Register the content hash of a completely stored file, so later sessions
+	uploading the same bytes can reuse its data (see find_ingested_file).
+	None clears it, e.g. once rows have been appended to the file. The hash is
+	kept on the file and in the catalog's file_hashes, which is searched.
+	"""
+	def _set(conn: sqlite3.Connection) -> int:
+		file_id = _ensure_file(conn, session_id, filename)
+		conn.execute("UPDATE files SET sha256 = ? WHERE id = ?", (sha256, file_id))
+		return file_id
+
+	def _register(conn: sqlite3.Connection) -> None:
+		if sha256 is None:
+			conn.execute("DELETE FROM file_hashes WHERE session_id = ? AND filename = ?", (session_id, filename))
+		else:
 			conn.execute(
-				"INSERT INTO schema_columns(session_id, file_id, col_name, inferred_type, position) VALUES (?, ?, ?, ?, ?)",
-				(session_id, file_id, str(col.get("name", "")), str(col.get("type", "text")), int(col.get("position", 0))),
+				"INSERT OR REPLACE INTO file_hashes(session_id, filename, file_id, sha256) VALUES (?, ?, ?, ?)",
+				(session_id, filename, file_id, sha256),
 			)
-		conn.commit()
+
+	file_id = _write(_set, session_id)
+	write(_register)
+
+
+def find_ingested_file(sha256: str, exclude_session: Optional[str] = None) -> Optional[Dict[str, Any]]:
+	"""
+	Most recent stored file with this content hash in another session.
+	Returns: { file_id, session_id, filename } or None.
+	"""
+	conn = _get_conn()
+	try:
+		row = conn.execute(
+			"SELECT file_id, session_id, filename FROM file_hashes WHERE sha256 = ? AND session_id != ? ORDER BY rowid DESC LIMIT 1",
+			(sha256, exclude_session or ""),
+		).fetchone()
+		if not row:
+			return None
+		return {"file_id": int(row["file_id"]), "session_id": row["session_id"], "filename": row["filename"]}
 	finally:
 		conn.close()
 
 
-def store_chunks(session_id: str, chunks: List[Dict[str, Any]]) -> int:
+def _source_db(src_session_id: str, session_id: str) -> Tuple[str, Optional[Dict[str, str]]]:
 	"""
-	Store chunked data rows and FTS content. Returns number of rows inserted.
-	Requires each chunk to have 'text' and optional metadata including 'file', 'row_index', 'id'.
+	Schema name to read another session's tables under, in a bulk write to
+	`session_id`, and the database to attach for it (None if both sessions
+	share a database file).
+	"""
+	src_path = os.path.abspath(session_db_path(src_session_id))
+	if src_path == os.path.abspath(session_db_path(session_id)):
+		return "main", None
+	return "src", {"src": src_path}
+
+
+def copy_file_data(src_session_id: str, src_file_id: int, session_id: str, filename: str) -> Dict[str, Any]:
+	"""
+	Copy the stored rows, FTS entries, row_kv values, schema and encoding of an
+	already ingested file into `session_id` as `filename`, with INSERT ... SELECT
+	(no parsing) from the source session's database, attached to the writes.
+	Rows are copied SQL_INGEST_BATCH_ROWS at a time and row_kv one column at a
+	time, each as its own bulk write, so interactive writes are not held up for
+	the whole copy. Chunk metadata is renamed if the file name differs, and
+	chunk ids are derived for the new name.
+	Returns: { file_id, rows, kv_rows }
+	"""
+	step = max(1, int(get_settings().SQL_INGEST_BATCH_ROWS))
+	src, attach = _source_db(src_session_id, session_id)
+
+	def _start(conn: sqlite3.Connection) -> Tuple[int, List[str]]:
+		file_id = _ensure_file(conn, session_id, filename)
+		conn.execute(
+			f"UPDATE files SET encoding = (SELECT encoding FROM {src}.files WHERE id = ?) WHERE id = ?",
+			(src_file_id, file_id),
+		)
+		conn.execute("DELETE FROM schema_columns WHERE session_id = ? AND file_id = ?", (session_id, file_id))
+		conn.execute(
+			"INSERT INTO schema_columns(session_id, file_id, col_name, inferred_type, position) "
+			f"SELECT ?, ?, col_name, inferred_type, position FROM {src}.schema_columns WHERE file_id = ? ORDER BY id",
+			(session_id, file_id, src_file_id),
+		)
+		# distinct column names come off idx_row_kv_session_col without touching the table
+		cols = conn.execute(f"SELECT DISTINCT col_name FROM {src}.row_kv WHERE session_id = ?", (src_session_id,)).fetchall()
+		return file_id, [r[0] for r in cols]
+
+	def _copy_rows(conn: sqlite3.Connection, file_id: int, after: int) -> Tuple[int, Optional[int]]:
+		conn.create_function("chunk_id", 4, make_chunk_id, deterministic=True)
+		bound = conn.execute(
+			f"SELECT MAX(id) FROM (SELECT id FROM {src}.rows WHERE file_id = ? AND id > ? ORDER BY id LIMIT ?)",
+			(src_file_id, after, step),
+		).fetchone()[0]
+		if bound is None:
+			return 0, None
+		count = conn.execute(
+			"INSERT INTO rows(session_id, file_id, row_index, text, data_json, chunk_id) "
+			"SELECT ?, ?, row_index, text, json_set(data_json, '$.metadata.file', ?), "
+			"chunk_id(?, row_index, json_extract(data_json, '$.metadata.part'), text) "
+			f"FROM {src}.rows WHERE file_id = ? AND id > ? AND id <= ? ORDER BY id",
+			(session_id, file_id, filename, filename, src_file_id, after, bound),
+		).rowcount
+		_index_new_rows(conn, count)
+		return count, int(bound)
+
+	def _copy_kv(conn: sqlite3.Connection, file_id: int, col_name: str) -> int:
+		# inserting in value_text order keeps the row_kv index b-trees appending
+		# instead of splitting pages at random (~1.8x faster)
+		return conn.execute(
+			"INSERT INTO row_kv(session_id, file_id, row_index, col_name, value_text) "
+			f"SELECT ?, ?, row_index, col_name, value_text FROM {src}.row_kv "
+			"WHERE session_id = ? AND col_name = ? AND file_id = ? ORDER BY value_text",
+			(session_id, file_id, src_session_id, col_name, src_file_id),
+		).rowcount
+
+	ensure_session(session_id)
+	file_id, cols = _write(_start, session_id, attach=attach)
+	rows = 0
+	after: Optional[int] = 0
+	while after is not None:
+		count, after = _write(lambda conn: _copy_rows(conn, file_id, after), session_id, attach=attach)
+		rows += count
+	kv_rows = 0
+	for col_name in cols:
+		kv_rows += _write(lambda conn: _copy_kv(conn, file_id, col_name), session_id, attach=attach)
+	bump_generation(session_id)
+	return {"file_id": file_id, "rows": rows, "kv_rows": kv_rows}
+
+
+def load_file_chunks(session_id: str, filename: str) -> List[Dict[str, Any]]:
 	"""
+	Stored chunks of one file ({ text, metadata }), in insertion order.
+	"""
+	conn = _get_conn(session_id)
+	try:
+		cur = conn.execute(
+			"SELECT r.text, r.data_json, r.chunk_id FROM rows r JOIN files f ON f.id = r.file_id "
+			"WHERE f.session_id = ? AND f.filename = ? ORDER BY r.id",
+			(session_id, filename),
+		)
+		chunks: List[Dict[str, Any]] = []
+		for r in cur.fetchall():
+			data = json.loads(r["data_json"])
+			chunk = {"text": r["text"] or "", "metadata": data.get("metadata", {}) or {}}
+			if r["chunk_id"]:
+				chunk["id"] = r["chunk_id"]
+			chunks.append(chunk)
+		return chunks
+	finally:
+		conn.close()
+
+
+def _flush_batches(conn: sqlite3.Connection, rows_batch: List[tuple], kv_batch: List[tuple]) -> None:
+	for start in range(0, len(rows_batch), WRITE_STEP_ROWS):
+		step = rows_batch[start : start + WRITE_STEP_ROWS]
+		conn.executemany(
+			"INSERT INTO rows(session_id, file_id, row_index, text, data_json, chunk_id) VALUES (?, ?, ?, ?, ?, ?)",
+			step,
+		)
+		_index_new_rows(conn, len(step))
+		yield_writes(conn)
+	# a row has one value per column: kv steps are as long as row steps with ~10 columns
+	kv_step = WRITE_STEP_ROWS * 10
+	for start in range(0, len(kv_batch), kv_step):
+		conn.executemany(
+			"INSERT INTO row_kv(session_id, file_id, row_index, col_name, value_text) VALUES (?, ?, ?, ?, ?)",
+			kv_batch[start : start + kv_step],
+		)
+		yield_writes(conn)
+
+
+def bulk_load_chunks(session_id: str, chunks: Iterable[Dict[str, Any]], batch_rows: Optional[int] = None) -> Dict[str, Any]:
+	"""
+	Bulk-load chunks into rows (and through them the FTS indexes) and row_kv.
+	File ids are resolved once per filename, inserts are grouped into one
+	executemany per table, and every `batch_rows` chunks (default
+	SQL_INGEST_BATCH_ROWS) are queued as one bulk write; the next batch is
+	built while the writer stores the previous one.
+	Returns: { rows, kv_rows, seconds, rows_per_sec }
+	"""
+	settings = get_settings()
+	batch_rows = max(1, int(batch_rows or settings.SQL_INGEST_BATCH_ROWS))
+	started = time.perf_counter()
 	inserted = 0
-	conn = _get_conn()
+	kv_rows = 0
+	file_ids: Dict[str, int] = {}
+	rows_batch: List[tuple] = []
+	kv_batch: List[tuple] = []
+	pending = None
+
+	def _flush() -> None:
+		nonlocal pending, rows_batch, kv_batch
+		if pending is not None:
+			pending.result()
+		rows, kv = rows_batch, kv_batch
+		pending = submit_write(lambda conn: _flush_batches(conn, rows, kv), db_path=session_db_path(session_id), bulk=True)
+		rows_batch, kv_batch = [], []
+
+	ensure_session(session_id)
 	try:
-		ensure_session(session_id)
 		for ch in chunks:
 			meta = ch.get("metadata", {}) or {}
 			filename = str(meta.get("file", "unknown.txt"))
-			file_id = _ensure_file(conn, session_id, filename)
+			file_id = file_ids.get(filename)
+			if file_id is None:
+				file_id = file_ids[filename] = _write(lambda conn: _ensure_file(conn, session_id, filename), session_id)
 			row_index = meta.get("row_index", None)
-			chunk_id = ch.get("id", None)
-			data_json = json.dumps({"metadata": meta, "text": ch.get("text", "")}, ensure_ascii=False)
-			conn.execute(
-				"INSERT INTO rows(session_id, file_id, row_index, data_json, chunk_id) VALUES (?, ?, ?, ?, ?)",
-				(session_id, file_id, row_index, data_json, chunk_id),
-			)
-			conn.execute(
-				"INSERT INTO fts_rows(text, session_id, file_id, row_index, chunk_id) VALUES (?, ?, ?, ?, ?)",
-				(ch.get("text", ""), session_id, file_id, row_index, chunk_id),
-			)
+			chunk_id = ensure_chunk_id(ch)
+			text = ch.get("text", "")
+			data_json = json.dumps({"metadata": meta}, ensure_ascii=False)
+			rows_batch.append((session_id, file_id, row_index, text, data_json, chunk_id))
 			# store structured key-values for statistics (only once per original row)
 			structured = ch.get("structured", None)
 			if structured and row_index is not None:
 				for col_name, value in structured.items():
-					conn.execute(
-						"INSERT INTO row_kv(session_id, file_id, row_index, col_name, value_text) VALUES (?, ?, ?, ?, ?)",
-						(session_id, file_id, int(row_index), str(col_name), None if value is None else str(value)),
-					)
+					kv_batch.append((session_id, file_id, int(row_index), str(col_name), None if value is None else str(value)))
+				kv_rows += len(structured)
 			inserted += 1
-		conn.commit()
-		return inserted
+			if len(rows_batch) >= batch_rows:
+				_flush()
+		_flush()
 	finally:
-		conn.close()
+		# a failed batch raises here; batches before it stay stored
+		if pending is not None:
+			pending.result()
+		bump_generation(session_id)
+	seconds = time.perf_counter() - started
+	stats = {
+		"rows": inserted,
+		"kv_rows": kv_rows,
+		"seconds": round(seconds, 4),
+		"rows_per_sec": round(inserted / seconds, 1) if seconds > 0 else None,
+	}
+	logger.info({"event": "sql_bulk_load", "session_id": session_id, **stats})
+	return stats
+
+
+def bulk_load_key_values(
+	session_id: str,
+	filename: str,
+	keys: List[str],
+	rows: Iterable[Tuple[int, Tuple[Any, ...]]],
+	batch_rows: Optional[int] = None,
+) -> int:
+	"""
+	Bulk-load row_kv for rows of a stored file whose chunks were stored without
+	`structured` key-values: `rows` yields (row_index, one value per key), e.g.
+	from csv_ingestor.frame_key_values. Batched as in bulk_load_chunks.
+	Returns the number of key-values stored.
+	"""
+	batch_rows = max(1, int(batch_rows or get_settings().SQL_INGEST_BATCH_ROWS))
+	file_id = _write(lambda conn: _ensure_file(conn, session_id, filename), session_id)
+	stored = 0
+	kv_batch: List[tuple] = []
+	pending: Optional[Future] = None
+
+	def _flush() -> None:
+		nonlocal pending, kv_batch
+		if pending is not None:
+			pending.result()
+		kv = kv_batch
+		pending = submit_write(lambda conn: _flush_batches(conn, [], kv), db_path=session_db_path(session_id), bulk=True)
+		kv_batch = []
+
+	try:
+		for count, (row_index, values) in enumerate(rows, start=1):
+			kv_batch.extend((session_id, file_id, row_index, key, None if value is None else str(value)) for key, value in zip(keys, values))
+			stored += len(keys)
+			if count % batch_rows == 0:
+				_flush()
+		if kv_batch:
+			_flush()
+	finally:
+		if pending is not None:
+			pending.result()
+	logger.info({"event": "sql_kv_load", "session_id": session_id, "file": filename, "kv_rows": stored})
+	return stored
+
+
+def store_chunks(session_id: str, chunks: Iterable[Dict[str, Any]]) -> int:
+	"""
+	Store chunked data rows and FTS content. Returns number of rows inserted.
+	Requires each chunk to have 'text' and optional metadata including 'file', 'row_index', 'id'.
+	"""
+	return bulk_load_chunks(session_id=session_id, chunks=chunks)["rows"]
+
+
+def optimize_fts(session_id: str) -> float:
+	"""
+	Merge the FTS5 index segments of fts_rows and fts_rows_tri of a session's
+	database into one b-tree each. Returns the time taken in seconds.
+	"""
+	started = time.perf_counter()
+	for table in _FTS_TABLES:
+		_write(lambda conn: conn.execute(f"INSERT INTO {table}({table}) VALUES('optimize')"), session_id)
+	return time.perf_counter() - started
+
+
+@contextmanager
+def deferred_indexes(session_id: str) -> Iterator[Dict[str, Any]]:
+	"""
+	Bulk-ingest mode for a session's database. Drops the secondary indexes on
+	rows/row_kv, lets the caller load, then builds each index once and runs an
+	FTS5 'optimize' merge. Nested or concurrent bulk ingests into the same
+	database file share one cycle.
+	Yields a dict that receives { index_seconds, optimize_seconds } on exit.
+	"""
+	path = os.path.abspath(session_db_path(session_id))
+	stats: Dict[str, Any] = {}
+	with _bulk_lock:
+		_bulk_depth[path] = _bulk_depth.get(path, 0) + 1
+		if _bulk_depth[path] == 1:
+			def _drop(conn: sqlite3.Connection) -> None:
+				for name in _BULK_INDEXES:
+					conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+			_write(_drop, session_id)
+	try:
+		yield stats
+	finally:
+		with _bulk_lock:
+			_bulk_depth[path] -= 1
+			if _bulk_depth[path] == 0:
+				del _bulk_depth[path]
+				started = time.perf_counter()
+				# one bulk write per index: a chat write waits for one build at most
+				for name, target in _BULK_INDEXES.items():
+					_write(lambda conn: conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"), session_id)
+				stats["index_seconds"] = round(time.perf_counter() - started, 4)
+				stats["optimize_seconds"] = round(optimize_fts(session_id), 4)
+				logger.info({"event": "sql_bulk_indexes_rebuilt", "session_id": session_id, **stats})
+
+
+def _fts_query_plan(query: str) -> Tuple[List[Tuple[str, str]], Optional[str], bool]:
+	"""
+	Pick the full-text index (and MATCH expression) for a query's tokens.
+	ASCII words go to the word index, with stemming; other tokens (Korean) of
+	3+ characters to the trigram index, as substrings; shorter ones are below
+	the trigram length and stay word matches. Also returns the trigram MATCH
+	of every 3+ character token, for substrings the word index misses, and
+	whether only a LIKE scan can answer the query (no token of 3+ characters).
+	"""
+	# split on whitespace, drop empty tokens, quote each token for MATCH
+	toks = [t.strip().strip('"').strip("'") for t in (query or "").split()]
+	toks = [t for t in toks if t]
+	quote = lambda t: '"' + t.replace('"', '""') + '"'
+	words = [quote(t) for t in toks if t.isascii() or len(t) < 3]
+	grams = [quote(t) for t in toks if not t.isascii() and len(t) >= 3]
+	plan: List[Tuple[str, str]] = []
+	if words:
+		plan.append(("fts_rows", " OR ".join(words)))
+	if grams:
+		plan.append(("fts_rows_tri", " OR ".join(grams)))
+	substrings = [quote(t) for t in toks if len(t) >= 3]
+	fallback = " OR ".join(substrings) if substrings and substrings != grams else None
+	return plan, fallback, not substrings
+
+
+def _fts_match(conn: sqlite3.Connection, table: str, match: str, session_id: str, id_range: Tuple[int, int], k: int) -> List[sqlite3.Row]:
+	"""
+	Top-k bm25 hits of one full-text index within a session. Sessions are
+	mostly stored as one contiguous id range, so hits are ranked within the
+	range first, which spares FTS5 a rows lookup per hit for session_id; the
+	text is read for the k winners only. Only if rows of another session show
+	up does the query run again with the session filter.
+	"""
+	def _run(session_filter: bool) -> List[sqlite3.Row]:
+		where = "AND session_id = ?" if session_filter else ""
+		cur = conn.execute(
+			f"""
+			SELECT r.id AS rowid, r.text, r.session_id, r.file_id, r.row_index, r.chunk_id, m.score
+			FROM (
+				SELECT rowid, bm25({table}) AS score FROM {table}
+				WHERE {table} MATCH ? AND rowid BETWEEN ? AND ? {where}
+				ORDER BY score LIMIT ?
+			) m JOIN rows r ON r.id = m.rowid
+			ORDER BY m.score
+			""",
+			(match, *id_range, *((session_id,) if session_filter else ()), k),
+		)
+		return cur.fetchall()
+
+	rows = _run(False)
+	if any(r["session_id"] != session_id for r in rows):
+		rows = _run(True)
+	return rows
 
 
 def search_fts(session_id: str, query: str, k: int = 5) -> List[Dict[str, Any]]:
-	conn = _get_conn()
+	if not session_db_exists(session_id):
+		return []
+	conn = _get_conn(session_id)
 	try:
-		def _fts_safe(q: str) -> str:
-			# split on whitespace, drop empty tokens, quote each token for MATCH
-			toks = [t.strip().strip('"').strip("'") for t in (q or "").split() if t.strip()]
-			if not toks:
-				return ""
-			return " OR ".join([f'"{t}"' for t in toks])
-
-		safe_query = _fts_safe(query)
-		out: List[Dict[str, Any]] = []
-		if safe_query:
+		k = max(1, k)
+		id_range = conn.execute(
+			"SELECT (SELECT MIN(id) FROM rows WHERE session_id = ?), (SELECT MAX(id) FROM rows WHERE session_id = ?)",
+			(session_id, session_id),
+		).fetchone()
+		if id_range[0] is None:
+			return []
+		plan, fallback, like_only = _fts_query_plan(query)
+		hits: Dict[int, Dict[str, Any]] = {}
+
+		def _collect(table: str, match: str) -> None:
 			try:
-				cur = conn.execute(
-					"""
-					SELECT rowid, text, session_id, file_id, row_index, chunk_id, bm25(fts_rows) AS score
-					FROM fts_rows
-					WHERE session_id = ? AND fts_rows MATCH ?
-					ORDER BY score LIMIT ?
-					""",
-					(session_id, safe_query, max(1, k)),
-				)
-				for r in cur.fetchall():
-					out.append(
-						{
-							"text": r["text"],
-							"metadata": {"file_id": r["file_id"], "row_index": r["row_index"]},
-							"id": r["chunk_id"],
-							"score": r["score"],
-						}
-					)
-			except Exception:
-				# fall back to LIKE search if MATCH fails due to syntax
-				pass
-		# fallback or empty safe query: basic LIKE search
-		if not out:
+				rows = _fts_match(conn, table, match, session_id, tuple(id_range), k)
+			except sqlite3.Error:
+				# malformed MATCH expression; treated as no hits
+				return
+			for r in rows:
+				prev = hits.get(r["rowid"])
+				if prev is None or r["score"] < prev["score"]:
+					hits[r["rowid"]] = {
+						"text": r["text"],
+						"metadata": {"file_id": r["file_id"], "row_index": r["row_index"]},
+						"id": r["chunk_id"],
+						"score": r["score"],
+					}
+
+		for table, match in plan:
+			_collect(table, match)
+		# no word hit: the words may still occur inside longer tokens
+		if not hits and fallback:
+			_collect("fts_rows_tri", fallback)
+		out: List[Dict[str, Any]] = sorted(hits.values(), key=lambda h: h["score"])[:k]
+		# tokens shorter than a trigram cannot be looked up as substrings: basic LIKE search
+		if not out and like_only:
 			cur = conn.execute(
 				"""
-				SELECT rowid, text, session_id, file_id, row_index, chunk_id
-				FROM fts_rows
+				SELECT id AS rowid, text, session_id, file_id, row_index, chunk_id
+				FROM rows
 				WHERE session_id = ? AND text LIKE ?
 				LIMIT ?
 				""",
-				(session_id, f"%{query}%", max(1, k)),
+				(session_id, f"%{query}%", k),
 			)
 			for r in cur.fetchall():
 				out.append(
@@ -225,7 +901,9 @@ def has_session_data(session_id: str) -> bool:
 	"""
 	Return True if any files or rows are present for the given session.
 	"""
-	conn = _get_conn()
+	if not session_db_exists(session_id):
+		return False
+	conn = _get_conn(session_id)
 	try:
 		row = conn.execute("SELECT 1 FROM files WHERE session_id = ? LIMIT 1", (session_id,)).fetchone()
 		if row:
@@ -236,3 +914,35 @@ def has_session_data(session_id: str) -> bool:
 		conn.close()
 
 
+def drop_session(session_id: str) -> bool:
+	"""
+	Delete everything stored for a session: its database file (with
+	SQLITE_SHARD_SESSIONS) and its catalog entries. In the shared layout its
+	rows are deleted from every table instead, which is much slower.
+	Returns whether the session existed.
+	"""
+
+	def _unregister(conn: sqlite3.Connection) -> int:
+		conn.execute("DELETE FROM file_hashes WHERE session_id = ?", (session_id,))
+		return conn.execute("DELETE FROM ingestion_sessions WHERE session_id = ?", (session_id,)).rowcount
+
+	# unregistered first, so no dedup copy starts from files that are going away
+	registered = write(_unregister) > 0
+	if os.path.abspath(session_db_path(session_id)) != os.path.abspath(get_settings().SQLITE_DB_PATH):
+		existed = remove_db(session_db_path(session_id))
+	else:
+		existed = has_session_data(session_id)
+		if existed:
+			_write(lambda conn: _delete_session_rows(conn, session_id), session_id)
+	existed = existed or registered
+	logger.info({"event": "session_dropped", "session_id": session_id, "existed": existed})
+	return existed
+
+
+def _delete_session_rows(conn: sqlite3.Connection, session_id: str) -> None:
+	for r in conn.execute("SELECT table_name FROM typed_tables WHERE session_id = ?", (session_id,)).fetchall():
+		conn.execute(f'DROP TABLE IF EXISTS "{r["table_name"]}"')
+	# fts entries go through the rows delete triggers
+	for table in ("typed_tables", "row_kv", "rows", "schema_columns", "files"):
+		conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+		yield_writes(conn)
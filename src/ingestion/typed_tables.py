@@ -0,0 +1,370 @@
+from typing import List, Dict, Any, Optional
+import json
+import re
+import sqlite3
+
+import pandas as pd
+
+from src.config.settings import get_settings
+from src.ingestion.csv_ingestor import _column_as_text
+from src.ingestion.sql_store import WRITE_STEP_ROWS, _get_conn, _write, _ensure_file, _source_db, ensure_session
+from src.storage.sqlite import session_db_exists
+from src.storage.writer import yield_writes
+from src.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+# numbers with a leading zero ("007", "-01") are codes, not quantities
+_LEADING_ZERO = re.compile(r"^\s*[+-]?0\d")
+
+
+def typed_table_name(file_id: int) -> str:
+	return f"csv_{int(file_id)}"
+
+
+def quote_ident(name: str) -> str:
+	return '"' + str(name).replace('"', '""') + '"'
+
+
+def _column_names(columns: List[Any]) -> List[str]:
+	"""
+	SQL column names for the frame columns: original names, de-duplicated and
+	never clashing with the row_index key column.
+	"""
+	names: List[str] = []
+	seen = {"row_index"}
+	for pos, col in enumerate(columns):
+		name = str(col).strip() or f"col{pos}"
+		if name.lower() in seen:
+			name = f"{name}_{pos}"
+		seen.add(name.lower())
+		names.append(name)
+	return names
+
+
+def frame_positions(columns: List[Dict[str, Any]], df: pd.DataFrame) -> List[Optional[int]]:
+	"""
+	Position in `df` of each typed-table column, matched by its source header
+	(a repeated header by occurrence), or None when `df` does not have it.
+	Appended files may order their columns differently from the stored file.
+	"""
+	free: Dict[str, List[int]] = {}
+	for pos, col in enumerate(df.columns):
+		free.setdefault(str(col), []).append(pos)
+	positions: List[Optional[int]] = []
+	for c in columns:
+		found = free.get(str(c.get("source", c["name"])))
+		positions.append(found.pop(0) if found else None)
+	return positions
+
+
+def _blank_to_none(col: pd.Series) -> pd.Series:
+	text = pd.Series(_column_as_text(col), index=col.index, dtype=object)
+	return text.where(text.str.strip() != "", None)
+
+
+def infer_sql_type(col: pd.Series) -> str:
+	"""
+	INTEGER / REAL when every non-blank value parses as a number, else TEXT.
+	"""
+	if col.dtype.kind in "iu":
+		return "INTEGER"
+	if col.dtype.kind == "f":
+		values = col.dropna()
+		return "INTEGER" if not values.empty and (values % 1 == 0).all() else "REAL"
+	values = _blank_to_none(col).dropna()
+	if values.empty or values.str.match(_LEADING_ZERO).any():
+		return "TEXT"
+	nums = pd.to_numeric(values, errors="coerce")
+	if nums.isna().any():
+		return "TEXT"
+	return "INTEGER" if (nums % 1 == 0).all() else "REAL"
+
+
+def _column_values(col: pd.Series, sql_type: str) -> List[Any]:
+	"""
+	Python values for one column. Blanks become NULL; in numeric columns a value
+	that does not parse (e.g. in a later streamed batch) is kept as text.
+	"""
+	text = _blank_to_none(col)
+	if sql_type == "TEXT":
+		return text.tolist()
+	nums = pd.to_numeric(text, errors="coerce").tolist()
+	out: List[Any] = []
+	for t, n in zip(text.tolist(), nums):
+		if t is None:
+			out.append(None)
+		elif n != n:
+			out.append(t)
+		elif sql_type == "INTEGER" and float(n).is_integer():
+			out.append(int(n))
+		else:
+			out.append(float(n))
+	return out
+
+
+def _get_entry(conn: sqlite3.Connection, file_id: int, schema: str = "main") -> Optional[Dict[str, Any]]:
+	row = conn.execute(
+		f"SELECT table_name, columns_json, row_count FROM {schema}.typed_tables WHERE file_id = ?",
+		(file_id,),
+	).fetchone()
+	if not row:
+		return None
+	return {"table": row["table_name"], "columns": json.loads(row["columns_json"]), "rows": int(row["row_count"])}
+
+
+def _insert_frame(session_id: str, file_id: int, table: str, columns: List[Dict[str, Any]], df: pd.DataFrame) -> int:
+	"""
+	Load `df` into a typed table as one bulk write per SQL_INGEST_BATCH_ROWS
+	rows; each also adds its rows to the catalog row_count (when the catalog
+	entry exists). Values are converted before anything is queued.
+	"""
+	settings = get_settings()
+	if df.empty:
+		return 0
+	present = [(c, pos) for c, pos in zip(columns, frame_positions(columns, df)) if pos is not None]
+	values = [_column_values(df.iloc[:, pos], c["type"]) for c, pos in present]
+	names = ["row_index"] + [c["name"] for c, _ in present]
+	sql = (
+		f"INSERT INTO {quote_ident(table)} ({', '.join(quote_ident(n) for n in names)}) "
+		f"VALUES ({', '.join('?' for _ in names)})"
+	)
+	records = list(zip((int(i) for i in df.index), *values))
+	step = max(1, settings.SQL_INGEST_BATCH_ROWS)
+
+	def _insert(conn: sqlite3.Connection, batch: List[tuple]) -> None:
+		for start in range(0, len(batch), WRITE_STEP_ROWS):
+			step = batch[start : start + WRITE_STEP_ROWS]
+			conn.executemany(sql, step)
+			conn.execute("UPDATE typed_tables SET row_count = row_count + ? WHERE file_id = ?", (len(step), file_id))
+			yield_writes(conn)
+
+	for start in range(0, len(records), step):
+		batch = records[start : start + step]
+		_write(lambda conn: _insert(conn, batch), session_id)
+	return len(records)
+
+
+def create_typed_table(session_id: str, filename: str, df: pd.DataFrame) -> str:
+	"""
+	(Re)create the typed table for (session, file) with native column types
+	inferred from `df`, and load `df` into it. Returns the table name. The
+	catalog entry is written once the rows are in, so the SQL agent never
+	sees a half-loaded table.
+	"""
+	columns = [
+		{"name": name, "source": str(col), "type": infer_sql_type(df.iloc[:, pos]), "position": pos, "indexed": False}
+		for pos, (name, col) in enumerate(zip(_column_names(list(df.columns)), df.columns))
+	]
+	col_defs = ", ".join(f"{quote_ident(c['name'])} {c['type']}" for c in columns)
+
+	def _create(conn: sqlite3.Connection) -> int:
+		file_id = _ensure_file(conn, session_id, filename)
+		table = quote_ident(typed_table_name(file_id))
+		conn.execute("DELETE FROM typed_tables WHERE file_id = ?", (file_id,))
+		conn.execute(f"DROP TABLE IF EXISTS {table}")
+		conn.execute(f"CREATE TABLE {table} (row_index INTEGER PRIMARY KEY, {col_defs})")
+		return file_id
+
+	ensure_session(session_id)
+	file_id = _write(_create, session_id)
+	table = typed_table_name(file_id)
+	count = _insert_frame(session_id, file_id, table, columns, df)
+	_write(
+		lambda conn: conn.execute(
+			"INSERT OR REPLACE INTO typed_tables(file_id, session_id, table_name, columns_json, row_count) VALUES (?, ?, ?, ?, ?)",
+			(file_id, session_id, table, json.dumps(columns, ensure_ascii=False), count),
+		),
+		session_id,
+	)
+	return table
+
+
+def append_typed_rows(session_id: str, filename: str, df: pd.DataFrame) -> int:
+	"""
+	Append a further batch of the same file (streaming ingest, or rows appended
+	to a stored file) to its typed table. Columns are matched by header, so
+	their order may differ from the stored file; columns the table does not
+	have yet are added to it (and to its catalog entry). Stored columns the
+	batch lacks are left NULL.
+	"""
+	def _lookup(conn: sqlite3.Connection):
+		file_id = _ensure_file(conn, session_id, filename)
+		entry = _get_entry(conn, file_id)
+		if entry is None:
+			return file_id, None
+		columns = entry["columns"]
+		claimed = {pos for pos in frame_positions(columns, df) if pos is not None}
+		seen = {"row_index"} | {c["name"].lower() for c in columns}
+		added = []
+		for pos, col in enumerate(df.columns):
+			if pos in claimed:
+				continue
+			position = max((c["position"] for c in columns), default=-1) + 1
+			name = str(col).strip() or f"col{position}"
+			if name.lower() in seen:
+				name = f"{name}_{position}"
+			seen.add(name.lower())
+			column = {"name": name, "source": str(col), "type": infer_sql_type(df.iloc[:, pos]), "position": position, "indexed": False}
+			conn.execute(f"ALTER TABLE {quote_ident(entry['table'])} ADD COLUMN {quote_ident(name)} {column['type']}")
+			columns.append(column)
+			added.append(name)
+		if added:
+			conn.execute("UPDATE typed_tables SET columns_json = ? WHERE file_id = ?", (json.dumps(columns, ensure_ascii=False), file_id))
+			logger.info({"event": "typed_table_columns_added", "session_id": session_id, "file": filename, "columns": added})
+		return file_id, entry
+
+	file_id, entry = _write(_lookup, session_id)
+	if entry is None:
+		raise ValueError(f"no typed table for {filename}")
+	return _insert_frame(session_id, file_id, entry["table"], entry["columns"], df)
+
+
+def index_typed_table(session_id: str, filename: str, max_distinct: Optional[int] = None) -> List[str]:
+	"""
+	Index the low-cardinality columns of a loaded typed table: those with at most
+	TYPED_INDEX_MAX_DISTINCT distinct values that repeat on average. Distinct
+	values are counted on a read connection; each index is built as its own
+	bulk write. Returns the indexed column names.
+	"""
+	settings = get_settings()
+	limit = max_distinct if max_distinct is not None else settings.TYPED_INDEX_MAX_DISTINCT
+	conn = _get_conn(session_id)
+	try:
+		row = conn.execute("SELECT id FROM files WHERE session_id = ? AND filename = ?", (session_id, filename)).fetchone()
+		entry = _get_entry(conn, int(row["id"])) if row else None
+		if entry is None:
+			return []
+		file_id = int(row["id"])
+		table = entry["table"]
+		for c in entry["columns"]:
+			distinct = conn.execute(f"SELECT COUNT(DISTINCT {quote_ident(c['name'])}) FROM {quote_ident(table)}").fetchone()[0]
+			c["indexed"] = 1 < distinct <= limit and distinct * 2 <= entry["rows"]
+	finally:
+		conn.close()
+	indexed: List[str] = []
+	for c in entry["columns"]:
+		if c["indexed"]:
+			index_name = quote_ident(f"idx_{table}_{c['position']}")
+			sql = f"CREATE INDEX IF NOT EXISTS {index_name} ON {quote_ident(table)} ({quote_ident(c['name'])})"
+			_write(lambda conn: conn.execute(sql), session_id)
+			indexed.append(c["name"])
+	_write(
+		lambda conn: conn.execute(
+			"UPDATE typed_tables SET columns_json = ? WHERE file_id = ?",
+			(json.dumps(entry["columns"], ensure_ascii=False), file_id),
+		),
+		session_id,
+	)
+	return indexed
+
+
+def materialize_frame(session_id: str, filename: str, df: pd.DataFrame) -> str:
+	"""
+	Create, load and index the typed table for a fully parsed file.
+	"""
+	table = create_typed_table(session_id, filename, df)
+	indexed = index_typed_table(session_id, filename)
+	logger.info({"event": "typed_table_created", "session_id": session_id, "file": filename, "table": table, "rows": len(df), "indexed": indexed})
+	return table
+
+
+def copy_typed_table(src_session_id: str, src_file_id: int, session_id: str, filename: str) -> Optional[str]:
+	"""
+	Copy the typed table of an already ingested file (same column types and
+	indexes) to (session, file), SQL_INGEST_BATCH_ROWS rows per bulk write.
+	Returns the new table name, or None if the source file has no typed table.
+	"""
+	step = max(1, int(get_settings().SQL_INGEST_BATCH_ROWS))
+	schema, attach = _source_db(src_session_id, session_id)
+
+	def _create(conn: sqlite3.Connection):
+		src = _get_entry(conn, src_file_id, schema)
+		if src is None:
+			return None, None
+		file_id = _ensure_file(conn, session_id, filename)
+		# qualified: an unqualified name missing from main resolves to the attached source
+		table = "main." + quote_ident(typed_table_name(file_id))
+		col_defs = ", ".join(f"{quote_ident(c['name'])} {c['type']}" for c in src["columns"])
+		conn.execute("DELETE FROM main.typed_tables WHERE file_id = ?", (file_id,))
+		conn.execute(f"DROP TABLE IF EXISTS {table}")
+		conn.execute(f"CREATE TABLE {table} (row_index INTEGER PRIMARY KEY, {col_defs})")
+		return file_id, src
+
+	def _copy(conn: sqlite3.Connection, table: str, after: Optional[int]) -> Optional[int]:
+		src_table = f"{schema}.{quote_ident(src['table'])}"
+		bound = conn.execute(
+			f"SELECT MAX(row_index) FROM (SELECT row_index FROM {src_table} WHERE row_index > ? ORDER BY row_index LIMIT ?)",
+			(after, step),
+		).fetchone()[0]
+		if bound is None:
+			return None
+		conn.execute(f"INSERT INTO main.{quote_ident(table)} SELECT * FROM {src_table} WHERE row_index > ? AND row_index <= ?", (after, bound))
+		return int(bound)
+
+	def _finish(conn: sqlite3.Connection, table: str) -> None:
+		for c in src["columns"]:
+			if c.get("indexed"):
+				index_name = quote_ident(f"idx_{table}_{c['position']}")
+				conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {quote_ident(table)} ({quote_ident(c['name'])})")
+		conn.execute(
+			"INSERT OR REPLACE INTO typed_tables(file_id, session_id, table_name, columns_json, row_count) VALUES (?, ?, ?, ?, ?)",
+			(file_id, session_id, table, json.dumps(src["columns"], ensure_ascii=False), src["rows"]),
+		)
+
+	ensure_session(session_id)
+	file_id, src = _write(_create, session_id, attach=attach)
+	if src is None:
+		return None
+	table = typed_table_name(file_id)
+	# row_index is the INTEGER PRIMARY KEY, so every range read is a rowid seek
+	after: Optional[int] = -(2 ** 63)
+	while after is not None:
+		after = _write(lambda conn: _copy(conn, table, after), session_id, attach=attach)
+	_write(lambda conn: _finish(conn, table), session_id)
+	return table
+
+
+def get_typed_table(session_id: str, filename: str) -> Optional[Dict[str, Any]]:
+	"""
+	Catalog entry of one file: { file_id, table, rows, columns } or None.
+	"""
+	if not session_db_exists(session_id):
+		return None
+	conn = _get_conn(session_id)
+	try:
+		row = conn.execute("SELECT id FROM files WHERE session_id = ? AND filename = ?", (session_id, filename)).fetchone()
+		entry = _get_entry(conn, int(row["id"])) if row else None
+		if entry is not None:
+			entry["file_id"] = int(row["id"])
+		return entry
+	finally:
+		conn.close()
+
+
+def get_typed_tables(session_id: str) -> List[Dict[str, Any]]:
+	"""
+	Typed tables of a session: [{ file_id, file, table, rows, columns: [{ name, source, type, position, indexed }] }]
+	"""
+	if not session_db_exists(session_id):
+		return []
+	conn = _get_conn(session_id)
+	try:
+		cur = conn.execute(
+			"SELECT t.file_id, f.filename, t.table_name, t.columns_json, t.row_count "
+			"FROM typed_tables t JOIN files f ON f.id = t.file_id WHERE t.session_id = ? ORDER BY t.file_id",
+			(session_id,),
+		)
+		return [
+			{
+				"file_id": int(r["file_id"]),
+				"file": r["filename"],
+				"table": r["table_name"],
+				"rows": int(r["row_count"]),
+				"columns": json.loads(r["columns_json"]),
+			}
+			for r in cur.fetchall()
+		]
+	finally:
+		conn.close()
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from abc import ABC, abstractmethod
 
 
@@ -9,4 +9,18 @@ class RAGAdapter(ABC):
 	@abstractmethod
 	async def search(self, session_id: str, query: str, k: int = 5) -> List[Dict]: ...
 
+	async def copy_file(self, src_session_id: str, session_id: str, src_file: str, filename: str) -> Optional[int]:
+		"""
+		Copy the indexed chunks of one file from another session without
+		re-embedding. None means unsupported; the caller re-indexes instead.
+		"""
+		return None
+
+	async def drop_session(self, session_id: str) -> Optional[bool]:
+		"""
+		Delete the session's index. Returns whether it existed; None means
+		the adapter keeps nothing per session.
+		"""
+		return None
+
 
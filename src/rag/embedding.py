@@ -0,0 +1,132 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import time
+
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+from src.config.settings import get_settings
+
+
+# texts in, one vector per text out
+EmbedFn = Callable[[List[str]], Any]
+# (chunk id, text, metadata)
+Doc = Tuple[str, str, Dict[str, Any]]
+
+# embedding cache key of default_embedding_function() (Chroma's all-MiniLM-L6-v2);
+# fixed here, so it does not depend on how a chromadb release names the model
+DEFAULT_EMBEDDING_MODEL = "chroma:default"
+
+_default_ef: Optional[Any] = None
+_default_ef_lock = threading.Lock()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+	"""
+	Shared embedding threads, so concurrent ingests together never run more
+	than EMBED_WORKERS batches through the model at once.
+	"""
+	global _executor, _executor_workers
+	with _executor_lock:
+		if _executor is None or _executor_workers != workers:
+			if _executor is not None:
+				_executor.shutdown(wait=False)
+			_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed")
+			_executor_workers = workers
+		return _executor
+
+
+def default_embedding_function() -> Any:
+	"""
+	Chroma's default embedding function (the one its collections embed with),
+	shared by the process, for vectors stored outside Chroma.
+	"""
+	global _default_ef
+	with _default_ef_lock:
+		if _default_ef is None:
+			_default_ef = DefaultEmbeddingFunction()
+		return _default_ef
+
+
+def _batches(docs: Iterable[Doc], size: int) -> Iterable[List[Doc]]:
+	batch: List[Doc] = []
+	for doc in docs:
+		batch.append(doc)
+		if len(batch) >= size:
+			yield batch
+			batch = []
+	if batch:
+		yield batch
+
+
+def embed_and_upsert(
+	collection: Any,
+	docs: Iterable[Doc],
+	embed: EmbedFn,
+	batch_size: Optional[int] = None,
+	progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+	"""
+	Embed `docs` in batches of EMBED_BATCH_SIZE on EMBED_WORKERS threads and
+	upsert each batch with its vectors, in order, from the calling thread, so
+	index writes overlap the embedding of the next batches. At most
+	EMBED_MAX_PENDING_BATCHES batches are embedded ahead of the upserts;
+	`docs` is only read further once one of them is written.
+	`progress(docs)` is called after each upsert. Blocking.
+	Returns { docs, batches, seconds, embed_seconds, upsert_seconds, docs_per_sec }.
+	"""
+	settings = get_settings()
+	size = max(1, int(batch_size or settings.EMBED_BATCH_SIZE))
+	workers = max(1, int(settings.EMBED_WORKERS))
+	ahead = max(1, int(settings.EMBED_MAX_PENDING_BATCHES))
+	pool = _get_executor(workers)
+	started = time.perf_counter()
+	stats: Dict[str, float] = {"docs": 0, "batches": 0, "embed_seconds": 0.0, "upsert_seconds": 0.0}
+
+	def _embed(batch: List[Doc]) -> Tuple[List[Doc], Any, float]:
+		embed_started = time.perf_counter()
+		vectors = embed([text for _, text, _ in batch])
+		return batch, vectors, time.perf_counter() - embed_started
+
+	def _upsert(future: "Future[Tuple[List[Doc], Any, float]]") -> None:
+		batch, vectors, embed_seconds = future.result()
+		upsert_started = time.perf_counter()
+		collection.upsert(
+			ids=[doc_id for doc_id, _, _ in batch],
+			embeddings=vectors,
+			documents=[text for _, text, _ in batch],
+			metadatas=[meta for _, _, meta in batch],
+		)
+		stats["upsert_seconds"] += time.perf_counter() - upsert_started
+		stats["embed_seconds"] += embed_seconds
+		stats["docs"] += len(batch)
+		stats["batches"] += 1
+		if progress is not None:
+			progress(len(batch))
+
+	pending: "deque[Future[Tuple[List[Doc], Any, float]]]" = deque()
+	try:
+		for batch in _batches(docs, size):
+			pending.append(pool.submit(_embed, batch))
+			if len(pending) >= ahead:
+				_upsert(pending.popleft())
+		while pending:
+			_upsert(pending.popleft())
+	finally:
+		# after a failed batch nothing queued behind it is written
+		for future in pending:
+			future.cancel()
+	seconds = time.perf_counter() - started
+	return {
+		"docs": int(stats["docs"]),
+		"batches": int(stats["batches"]),
+		"seconds": round(seconds, 4),
+		"embed_seconds": round(stats["embed_seconds"], 4),
+		"upsert_seconds": round(stats["upsert_seconds"], 4),
+		"docs_per_sec": round(stats["docs"] / seconds, 1) if seconds > 0 else None,
+	}
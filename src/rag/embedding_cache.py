@@ -0,0 +1,181 @@
+from typing import Any, Dict, List, Optional
+from concurrent.futures import Future
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from src.config.settings import get_settings
+from src.rag.embedding import EmbedFn
+from src.storage.sqlite import embeddings_db_path, get_conn, register_embeddings_schema
+from src.storage.writer import submit_write
+
+
+# hashes looked up per query, below SQLite's host parameter limit
+_LOOKUP_PAGE = 500
+# eviction brings the cache this far below EMBED_CACHE_MAX_MB, so it does not run on every store
+_EVICT_TO = 0.9
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, float] = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0, "evictions": 0}
+
+
+@register_embeddings_schema
+def _init_schema(conn: sqlite3.Connection) -> None:
+	conn.executescript(
+		"""
+		CREATE TABLE IF NOT EXISTS embedding_cache (
+			model TEXT NOT NULL,
+			text_hash TEXT NOT NULL,
+			vector BLOB NOT NULL,
+			used_at REAL NOT NULL,
+			PRIMARY KEY (model, text_hash)
+		);
+		CREATE INDEX IF NOT EXISTS idx_embedding_cache_used_at ON embedding_cache(used_at);
+		"""
+	)
+
+
+def _count(name: str, value: float = 1) -> None:
+	with _stats_lock:
+		_stats[name] += value
+
+
+def text_hash(text: str) -> str:
+	"""
+	Cache key of a chunk text: the sha256 of its UTF-8 bytes.
+	"""
+	return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def lookup(model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+	"""
+	Cached vectors of `model` for the given text hashes: {hash: vector}.
+	"""
+	found: Dict[str, np.ndarray] = {}
+	if not hashes:
+		return found
+	conn = get_conn(embeddings_db_path())
+	try:
+		for start in range(0, len(hashes), _LOOKUP_PAGE):
+			page = hashes[start : start + _LOOKUP_PAGE]
+			rows = conn.execute(
+				f"SELECT text_hash, vector FROM embedding_cache WHERE model = ? AND text_hash IN ({','.join('?' * len(page))})",
+				(model, *page),
+			).fetchall()
+			for row in rows:
+				found[row["text_hash"]] = np.frombuffer(row["vector"], dtype=np.float32)
+	finally:
+		conn.close()
+	return found
+
+
+def _evict(conn: sqlite3.Connection, max_bytes: int) -> int:
+	page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+	used = (conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]) * page_size
+	if used <= max_bytes:
+		return 0
+	rows = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+	# rows are about the same size: drop the share that is over the target
+	count = min(rows, int(rows * (1 - max_bytes * _EVICT_TO / used)) + 1)
+	conn.execute(
+		"DELETE FROM embedding_cache WHERE rowid IN (SELECT rowid FROM embedding_cache ORDER BY used_at LIMIT ?)",
+		(count,),
+	)
+	return count
+
+
+def store(model: str, vectors: Dict[str, Any], used: Optional[List[str]] = None) -> Future:
+	"""
+	Add freshly embedded `vectors` ({hash: vector}) and mark the `used` hashes
+	(cache hits) as recently used, then evict the least recently used vectors
+	while the cache is above EMBED_CACHE_MAX_MB. Written by the cache's
+	writer without waiting; the future resolves to the number evicted.
+	"""
+	now = time.time()
+	rows = [(model, h, np.asarray(v, dtype=np.float32).tobytes(), now) for h, v in vectors.items()]
+	max_bytes = max(1, int(get_settings().EMBED_CACHE_MAX_MB)) * 1024 * 1024
+
+	def _store(conn: sqlite3.Connection) -> int:
+		if rows:
+			conn.executemany("INSERT OR REPLACE INTO embedding_cache(model, text_hash, vector, used_at) VALUES (?, ?, ?, ?)", rows)
+		if used:
+			conn.executemany("UPDATE embedding_cache SET used_at = ? WHERE model = ? AND text_hash = ?", [(now, model, h) for h in used])
+		evicted = _evict(conn, max_bytes) if rows else 0
+		_count("stored", len(rows))
+		if evicted:
+			_count("evicted", evicted)
+			_count("evictions")
+		return evicted
+
+	return submit_write(_store, db_path=embeddings_db_path(), bulk=True)
+
+
+class CachedEmbedder:
+	"""
+	Embedding function that only embeds texts not in the cache for `model`
+	(and each distinct text of a batch once); the new vectors are stored for
+	every later session. Counts its own hits and misses; flush() waits for
+	its cache writes.
+	"""
+
+	def __init__(self, embed: EmbedFn, model: str):
+		self.embed = embed
+		self.model = model
+		self.hits = 0
+		self.misses = 0
+		self._writes: List[Future] = []
+		self._lock = threading.Lock()
+
+	def __call__(self, texts: List[str]) -> List[np.ndarray]:
+		hashes = [text_hash(t) for t in texts]
+		found = lookup(self.model, list(set(hashes)))
+		missing: Dict[str, str] = {}
+		for h, t in zip(hashes, texts):
+			if h not in found:
+				missing.setdefault(h, t)
+		fresh: Dict[str, np.ndarray] = {}
+		if missing:
+			vectors = self.embed(list(missing.values()))
+			fresh = {h: np.asarray(v, dtype=np.float32) for h, v in zip(missing, vectors)}
+		hits = len(texts) - len(missing)
+		with self._lock:
+			self.hits += hits
+			self.misses += len(missing)
+			if fresh or found:
+				self._writes.append(store(self.model, fresh, list(found)))
+		_count("hits", hits)
+		_count("misses", len(missing))
+		return [found[h] if h in found else fresh[h] for h in hashes]
+
+	def flush(self) -> None:
+		with self._lock:
+			writes, self._writes = self._writes, []
+		for future in writes:
+			future.result()
+
+	def stats(self) -> Dict[str, Any]:
+		lookups = self.hits + self.misses
+		return {"cache_hits": self.hits, "cache_misses": self.misses, "cache_hit_rate": round(self.hits / lookups, 3) if lookups else None}
+
+
+def embedding_cache_stats() -> Dict[str, Any]:
+	"""
+	Embedding cache counters since process start: texts served from the cache
+	(hits) or embedded (misses), vectors stored, vectors evicted and eviction
+	runs; plus the cache's size on disk.
+	"""
+	with _stats_lock:
+		stats: Dict[str, Any] = {k: int(v) for k, v in _stats.items()}
+	lookups = stats["hits"] + stats["misses"]
+	stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+	conn = get_conn(embeddings_db_path())
+	try:
+		stats["vectors"] = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+		page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+		stats["bytes"] = (conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]) * page_size
+	finally:
+		conn.close()
+	return stats
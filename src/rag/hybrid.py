@@ -2,8 +2,9 @@ from typing import List, Dict, Any, Tuple
 import asyncio
 
 from src.rag.local import LocalRAG
+from src.rag.search_cache import get_results, put_results
 from src.rag.sql_search import SqlSearch
-from src.ingestion.sql_store import store_chunks
+from src.ingestion.sql_store import session_generation, store_chunks
 
 
 def _rrf(scores: List[Any], k: int = 60) -> Dict[str, float]:
@@ -37,7 +38,21 @@ class HybridRAG:
 			store_chunks(session_id=session_id, chunks=chunks)
 		return await self._vec.build_index(session_id=session_id, chunks=chunks)
 
+	async def drop_session(self, session_id: str) -> bool:
+		# the keyword side lives in SQLite and goes with sql_store.drop_session
+		return await self._vec.drop_session(session_id)
+
 	async def search(self, session_id: str, query: str, k: int = 5) -> List[Dict[str, Any]]:
+		# a repeated question on unchanged data skips retrieval
+		generation = session_generation(session_id)
+		cached = get_results(session_id, query, k, generation)
+		if cached is not None:
+			return cached
+		results = await self._search(session_id=session_id, query=query, k=k)
+		put_results(session_id, query, k, generation, results)
+		return results
+
+	async def _search(self, session_id: str, query: str, k: int = 5) -> List[Dict[str, Any]]:
 		# Run in parallel
 		vec_task = asyncio.create_task(self._vec.search(session_id=session_id, query=query, k=k))
 		sql_task = asyncio.create_task(self._sql.search(session_id=session_id, query=query, k=k))
@@ -1,66 +1,198 @@
-from typing import List, Dict, Any
-from pathlib import Path
-import hashlib
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import asyncio
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-
 from src.config.settings import get_settings
+from src.ingestion.chunk_ids import chunk_id, ensure_chunk_id
+from src.ingestion.sql_store import bump_generation
+from src.rag import numpy_store
+from src.rag.embedding import DEFAULT_EMBEDDING_MODEL, EmbedFn, default_embedding_function, embed_and_upsert
+from src.rag.embedding_cache import CachedEmbedder
+from src.rag.numpy_store import NumpyCollection
+from src.rag.search_cache import get_query_embedding, normalize_query, put_query_embedding
+from src.rag.vector_store import collection_exists, delete_collection, get_client, get_collection
+from src.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
 
+# vectors read and written per round trip when copying a file between collections
+_COPY_PAGE = 5000
 
-def _hash_text(text: str) -> str:
-	return hashlib.sha256(text.encode("utf-8")).hexdigest()
+_BACKENDS = ("auto", "chroma", "numpy")
 
 
 class LocalRAG:
-	def __init__(self):
-		settings = get_settings()
-		self._client = chromadb.PersistentClient(
-			path=str(Path(settings.CHROMA_DB_DIR)),
-			settings=ChromaSettings(anonymized_telemetry=False),
-		)
+	"""
+	Vector index of each session on local disk: a Chroma collection, or for
+	sessions of up to NUMPY_VECTOR_MAX_CHUNKS chunks a NumPy store (see
+	src/rag/numpy_store.py), picked by VECTOR_BACKEND.
+	"""
+
+	def __init__(self, embedding_function: Optional[EmbedFn] = None, embedding_model: Optional[str] = None, backend: Optional[str] = None):
+		# shared by every adapter in the process; collections come from its cache
+		self._client = get_client()
+		# texts in, vectors out: the given function, else Chroma's default model, the
+		# same instance the collections are opened with; never read back from Chroma
+		self._embed: EmbedFn = default_embedding_function() if embedding_function is None else embedding_function
+		# embedding cache key of the model; vectors of different models never mix
+		if embedding_model:
+			self._model = embedding_model
+		elif embedding_function is None:
+			self._model = DEFAULT_EMBEDDING_MODEL
+		else:
+			self._model = getattr(embedding_function, "__qualname__", type(embedding_function).__name__)
+		# None: VECTOR_BACKEND
+		self._backend = backend
+
+	def _backend_setting(self) -> str:
+		backend = (self._backend or get_settings().VECTOR_BACKEND).lower()
+		if backend not in _BACKENDS:
+			raise ValueError(f"VECTOR_BACKEND must be one of {', '.join(_BACKENDS)}, not {backend!r}")
+		return backend
+
+	def _collection(self, session_id: str) -> Any:
+		# a session is served from where its vectors are
+		if numpy_store.store_exists(session_id):
+			return numpy_store.open_store(session_id)
+		return get_collection(session_id)
+
+	def _target(self, session_id: str, adding: int) -> Any:
+		"""
+		Where `adding` more vectors of the session go. In auto mode a session
+		is kept in the NumPy store up to NUMPY_VECTOR_MAX_CHUNKS vectors and
+		moved to Chroma past that. A session already in Chroma stays there.
+		"""
+		backend = self._backend_setting()
+		limit = get_settings().NUMPY_VECTOR_MAX_CHUNKS
+		if numpy_store.store_exists(session_id):
+			store = numpy_store.open_store(session_id)
+			if backend == "chroma" or (backend == "auto" and store.count() + adding > limit):
+				return self._promote(session_id, store)
+			return store
+		if backend == "chroma" or (collection_exists(session_id) and get_collection(session_id).count()):
+			return get_collection(session_id)
+		if backend == "numpy" or adding <= limit:
+			return numpy_store.open_store(session_id)
+		return get_collection(session_id)
+
+	def _promote(self, session_id: str, store: NumpyCollection) -> Any:
+		# stored vectors are copied, not re-embedded
+		collection = get_collection(session_id)
+		page = max(1, min(_COPY_PAGE, self._client.get_max_batch_size()))
+		moved = 0
+		for got in store.iter_pages(page):
+			collection.upsert(ids=got["ids"], embeddings=got["embeddings"], documents=got["documents"], metadatas=got["metadatas"])
+			moved += len(got["ids"])
+		numpy_store.drop_store(session_id)
+		logger.info({"event": "vector_store_promoted", "session_id": session_id, "vectors": moved})
+		return collection
 
 	async def build_index(self, session_id: str, chunks: List[Dict[str, Any]]) -> str:
 		if not chunks:
 			# Nothing to index; ensure collection exists and return
-			self._client.get_or_create_collection(name=session_id, metadata={"session_id": session_id})
+			self._collection(session_id)
 			return session_id
 
-		collection = self._client.get_or_create_collection(name=session_id, metadata={"session_id": session_id})
-
-		ids: List[str] = []
-		texts: List[str] = []
-		metas: List[Dict[str, Any]] = []
-
-		for idx, ch in enumerate(chunks):
+		# keyed by chunk id: a repeated chunk is upserted once
+		docs: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+		for ch in chunks:
 			raw_text = ch.get("text", "")
 			text = (raw_text or "").strip()
 			if not text:
 				# Skip empty/whitespace-only chunks to avoid Chroma upsert validation errors
 				continue
 			meta = ch.get("metadata", {}) or {}
-			# preserve provided chunk id if available to keep cross-store linkage
-			doc_id = str(ch.get("id")) if ch.get("id") else f"{idx}-{_hash_text(text)[:12]}"
-			ids.append(doc_id)
-			texts.append(text)
-			metas.append(meta)
-
-		# Upsert can be CPU-bound; run in a thread to avoid blocking the loop if needed
-		def _upsert():
-			# If everything filtered out, ensure collection exists and skip upsert
-			if not ids:
-				return
-			collection.upsert(ids=ids, documents=texts, metadatas=metas)
+			# same id as rows/fts_rows.chunk_id, so hybrid search can fuse both stores
+			docs[ensure_chunk_id(ch)] = (text, meta)
+		# If everything filtered out, there is nothing to embed
+		if not docs:
+			return session_id
+		settings = get_settings()
 
-		await asyncio.to_thread(_upsert)
+		# embedding is CPU-bound; it runs on the embedding threads, the upserts on this one
+		def _index() -> Dict[str, Any]:
+			collection = self._target(session_id, len(docs))
+			cache = CachedEmbedder(self._embed, self._model) if settings.EMBED_CACHE_ENABLED else None
+			batch_size = min(settings.EMBED_BATCH_SIZE, self._client.get_max_batch_size())
+			stats = embed_and_upsert(collection, ((i, text, meta) for i, (text, meta) in docs.items()), cache or self._embed, batch_size)
+			if cache is not None:
+				cache.flush()
+				stats.update(cache.stats())
+			stats["backend"] = "numpy" if isinstance(collection, NumpyCollection) else "chroma"
+			bump_generation(session_id)
+			return stats
+
+		stats = await asyncio.to_thread(_index)
+		logger.info({"event": "vector_index", "session_id": session_id, **stats})
 		return session_id
 
+	def _query_embedding(self, query: str) -> Any:
+		# repeated questions are embedded once; queries are embedded normalized, as cached
+		model = self._model
+		vector = get_query_embedding(model, query)
+		if vector is None:
+			# as documents are embedded: the default model embeds queries the same way
+			vector = self._embed([normalize_query(query)])[0]
+			put_query_embedding(model, query, vector)
+		return vector
+
+	def _file_pages(self, source: Any, src_file: str, page: int) -> Iterator[Dict[str, Any]]:
+		if isinstance(source, NumpyCollection):
+			yield from source.iter_pages(page, where={"file": src_file})
+			return
+		offset = 0
+		while True:
+			got = source.get(
+				where={"file": src_file},
+				include=["embeddings", "documents", "metadatas"],
+				limit=page,
+				offset=offset,
+			)
+			if not got.get("ids"):
+				return
+			yield got
+			offset += len(got["ids"])
+
+	async def copy_file(self, src_session_id: str, session_id: str, src_file: str, filename: str) -> int:
+		"""
+		Copy the stored vectors of one file from another session's collection
+		(embeddings included, so nothing is re-embedded). Returns the number copied.
+		"""
+		source = self._collection(src_session_id)
+		page = max(1, min(_COPY_PAGE, self._client.get_max_batch_size()))
+
+		def _copy() -> int:
+			copied = 0
+			for got in self._file_pages(source, src_file, page):
+				metas = [dict(m or {}, file=filename) for m in got["metadatas"]]
+				# ids follow the file name, as in the copied SQLite rows
+				new_ids = [chunk_id(filename, m.get("row_index"), m.get("part"), doc) for m, doc in zip(metas, got["documents"])]
+				target = self._target(session_id, len(new_ids))
+				target.upsert(ids=new_ids, embeddings=got["embeddings"], documents=got["documents"], metadatas=metas)
+				copied += len(new_ids)
+			return copied
+
+		copied = await asyncio.to_thread(_copy)
+		await asyncio.to_thread(bump_generation, session_id)
+		return copied
+
+	async def drop_session(self, session_id: str) -> bool:
+		"""
+		Delete the session's collection and NumPy store. Returns whether either existed.
+		"""
+
+		def _drop() -> bool:
+			dropped = numpy_store.drop_store(session_id)
+			return delete_collection(session_id) or dropped
+
+		return await asyncio.to_thread(_drop)
+
 	async def search(self, session_id: str, query: str, k: int = 5) -> List[Dict[str, Any]]:
-		collection = self._client.get_or_create_collection(name=session_id)
+		collection = self._collection(session_id)
 
 		def _query():
-			return collection.query(query_texts=[query], n_results=max(1, k))
+			return collection.query(query_embeddings=[self._query_embedding(query)], n_results=max(1, k))
 
 		result = await asyncio.to_thread(_query)
 		out: List[Dict[str, Any]] = []
@@ -77,3 +209,10 @@ class LocalRAG:
 		return out
 
 
+class NumpyRAG(LocalRAG):
+	"""
+	LocalRAG with every session in the NumPy store, whatever its size.
+	"""
+
+	def __init__(self, embedding_function: Optional[EmbedFn] = None, embedding_model: Optional[str] = None):
+		super().__init__(embedding_function=embedding_function, embedding_model=embedding_model, backend="numpy")
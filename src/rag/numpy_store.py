@@ -0,0 +1,310 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+
+from src.config.settings import get_settings
+
+
+# session ids used as directory names as they are; anything else is hashed
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,99}$")
+# open stores kept per process (least recently used first)
+_OPEN_STORES = 256
+# rows scored per matrix-vector product; bounds the float32 copy of int8 rows
+_QUERY_BLOCK = 32768
+
+_stores: "OrderedDict[str, NumpyCollection]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def store_dir() -> str:
+	settings = get_settings()
+	return settings.NUMPY_VECTOR_DIR or os.path.join(os.path.dirname(os.path.abspath(settings.CHROMA_DB_DIR)), "vectors")
+
+
+def store_path(session_id: str) -> str:
+	"""
+	Directory with the vectors of one session.
+	"""
+	name = str(session_id)
+	if not _SAFE_NAME.match(name):
+		name = "s-" + hashlib.sha256(name.encode("utf-8")).hexdigest()[:32]
+	return os.path.join(store_dir(), name)
+
+
+def _normalize(vectors: Any) -> np.ndarray:
+	arr = np.asarray(vectors, dtype=np.float32)
+	if arr.ndim == 1:
+		arr = arr[None, :]
+	norms = np.linalg.norm(arr, axis=1, keepdims=True)
+	return arr / np.where(norms > 0, norms, 1.0)
+
+
+class NumpyCollection:
+	"""
+	One session's normalized embeddings as append-only files, read through
+	memory maps: vectors (float32, or int8 with a float32 scale per row with
+	NUMPY_VECTOR_QUANTIZE), documents as JSON lines with their byte offsets,
+	and ids. manifest.json holds the row count and is replaced after the rows
+	are written, so readers only ever see complete rows. Offers the part of
+	Chroma's Collection API that LocalRAG uses (upsert, query, count);
+	distances are cosine distances.
+	"""
+
+	def __init__(self, path: str):
+		self.path = path
+		self._lock = threading.Lock()
+		self._manifest = self._read_manifest()
+		# memory maps of the current row count: (count, vectors, scales, offsets)
+		self._maps: Optional[Tuple[int, np.ndarray, Optional[np.ndarray], np.ndarray]] = None
+		# id -> row, loaded by the first write
+		self._rows: Optional[Dict[str, int]] = None
+
+	def _file(self, name: str) -> str:
+		return os.path.join(self.path, name)
+
+	def _read_manifest(self) -> Dict[str, Any]:
+		try:
+			with open(self._file("manifest.json"), encoding="utf-8") as f:
+				return json.load(f)
+		except FileNotFoundError:
+			return {"count": 0, "dim": None, "quantized": bool(get_settings().NUMPY_VECTOR_QUANTIZE)}
+
+	def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+		tmp = self._file("manifest.json.tmp")
+		with open(tmp, "w", encoding="utf-8") as f:
+			json.dump(manifest, f)
+		os.replace(tmp, self._file("manifest.json"))
+		self._manifest = manifest
+
+	def count(self) -> int:
+		return int(self._manifest["count"])
+
+	def nbytes(self) -> int:
+		return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(self.path) for name in files)
+
+	def _vector_file(self) -> str:
+		return self._file("vectors.i8" if self._manifest["quantized"] else "vectors.f32")
+
+	def _mapped(self) -> Tuple[int, Optional[np.ndarray], Optional[np.ndarray], Optional[np.ndarray]]:
+		manifest = self._manifest
+		count = int(manifest["count"])
+		if count == 0:
+			return 0, None, None, None
+		maps = self._maps
+		if maps is None or maps[0] != count:
+			dim = int(manifest["dim"])
+			quantized = manifest["quantized"]
+			vectors = np.memmap(self._vector_file(), dtype=np.int8 if quantized else np.float32, mode="r", shape=(count, dim))
+			scales = np.memmap(self._file("scales.f32"), dtype=np.float32, mode="r", shape=(count,)) if quantized else None
+			offsets = np.memmap(self._file("offsets.i64"), dtype=np.int64, mode="r", shape=(count,))
+			maps = self._maps = (count, vectors, scales, offsets)
+		return maps
+
+	def _ids(self, count: int) -> Dict[str, int]:
+		if self._rows is None:
+			ids: List[str] = []
+			if os.path.exists(self._file("ids.txt")):
+				with open(self._file("ids.txt"), encoding="utf-8") as f:
+					ids = [line.rstrip("\n") for line in f]
+			if len(ids) > count:
+				# left behind by a write that failed before its manifest
+				ids = ids[:count]
+				with open(self._file("ids.txt"), "w", encoding="utf-8") as f:
+					f.write("".join(f"{doc_id}\n" for doc_id in ids))
+			self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+		return self._rows
+
+	def _truncate(self, count: int, dim: int) -> None:
+		# rows past the manifest's count are from a write that failed; appends go after the last complete row
+		itemsize = 1 if self._manifest["quantized"] else 4
+		for name, size in ((self._vector_file(), count * dim * itemsize), (self._file("scales.f32"), count * 4), (self._file("offsets.i64"), count * 8)):
+			if os.path.exists(name) and os.path.getsize(name) > size:
+				os.truncate(name, size)
+
+	def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+		if not self._manifest["quantized"]:
+			return vectors, None
+		scales = np.abs(vectors).max(axis=1) / 127.0
+		scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+		return np.round(vectors / scales[:, None]).astype(np.int8), scales
+
+	def upsert(self, ids: List[str], embeddings: Any, documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+		"""
+		Add rows, or replace the rows of ids already stored (in place).
+		"""
+		vectors = _normalize(embeddings)
+		with self._lock:
+			try:
+				self._upsert(ids, vectors, documents, metadatas)
+			except BaseException:
+				# ids.txt may have lines past the manifest's count; reloading trims them
+				self._rows = None
+				raise
+
+	def _upsert(self, ids: List[str], vectors: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+		manifest = dict(self._manifest)
+		if manifest["dim"] is None:
+			manifest["dim"] = int(vectors.shape[1])
+		elif vectors.shape[1] != manifest["dim"]:
+			raise ValueError(f"embedding dimension {vectors.shape[1]} does not match the store's {manifest['dim']}")
+		Path(self.path).mkdir(parents=True, exist_ok=True)
+		count = int(manifest["count"])
+		self._truncate(count, int(manifest["dim"]))
+		rows = self._ids(count)
+		encoded, scales = self._encode(vectors)
+		replaced: Dict[int, int] = {}
+		appended: List[int] = []
+		# an id repeated within the call: its last row wins
+		latest = {str(doc_id): i for i, doc_id in enumerate(ids)}
+		for doc_id, i in latest.items():
+			row = rows.get(doc_id)
+			if row is None:
+				appended.append(i)
+			else:
+				replaced[row] = i
+		with open(self._file("docs.jsonl"), "ab") as f:
+			offsets: Dict[int, int] = {}
+			for i in list(replaced.values()) + appended:
+				offsets[i] = f.tell()
+				f.write((json.dumps({"id": str(ids[i]), "text": documents[i], "metadata": metadatas[i]}, ensure_ascii=False) + "\n").encode("utf-8"))
+		if appended:
+			with open(self._vector_file(), "ab") as f:
+				f.write(np.ascontiguousarray(encoded[appended]).tobytes())
+			if scales is not None:
+				with open(self._file("scales.f32"), "ab") as f:
+					f.write(scales[appended].tobytes())
+			with open(self._file("offsets.i64"), "ab") as f:
+				f.write(np.asarray([offsets[i] for i in appended], dtype=np.int64).tobytes())
+			with open(self._file("ids.txt"), "a", encoding="utf-8") as f:
+				f.write("".join(f"{ids[i]}\n" for i in appended))
+		total = count + len(appended)
+		if replaced:
+			dim = int(manifest["dim"])
+			vec_map = np.memmap(self._vector_file(), dtype=encoded.dtype, mode="r+", shape=(total, dim))
+			off_map = np.memmap(self._file("offsets.i64"), dtype=np.int64, mode="r+", shape=(total,))
+			for row, i in replaced.items():
+				vec_map[row] = encoded[i]
+				off_map[row] = offsets[i]
+			if scales is not None:
+				scale_map = np.memmap(self._file("scales.f32"), dtype=np.float32, mode="r+", shape=(total,))
+				for row, i in replaced.items():
+					scale_map[row] = scales[i]
+				scale_map.flush()
+			vec_map.flush()
+			off_map.flush()
+		for n, i in enumerate(appended):
+			rows[str(ids[i])] = count + n
+		manifest["count"] = total
+		self._write_manifest(manifest)
+
+	def _docs(self, rows: List[int], offsets: np.ndarray) -> List[Dict[str, Any]]:
+		out: List[Dict[str, Any]] = []
+		with open(self._file("docs.jsonl"), "rb") as f:
+			for row in rows:
+				f.seek(int(offsets[row]))
+				out.append(json.loads(f.readline()))
+		return out
+
+	def _dequantize(self, vectors: np.ndarray, scales: Optional[np.ndarray], rows: Any) -> np.ndarray:
+		block = np.asarray(vectors[rows], dtype=np.float32)
+		return block * np.asarray(scales[rows])[:, None] if scales is not None else block
+
+	def query(self, query_embeddings: Any, n_results: int = 10, **_: Any) -> Dict[str, List[List[Any]]]:
+		"""
+		Nearest rows by cosine similarity: one matrix-vector product per block
+		of rows and an argpartition for the top n_results.
+		"""
+		count, vectors, scales, offsets = self._mapped()
+		result: Dict[str, List[List[Any]]] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+		for query in _normalize(query_embeddings):
+			if count == 0:
+				for key in result:
+					result[key].append([])
+				continue
+			scores = np.empty(count, dtype=np.float32)
+			for start in range(0, count, _QUERY_BLOCK):
+				stop = min(count, start + _QUERY_BLOCK)
+				block = np.asarray(vectors[start:stop], dtype=np.float32)
+				scores[start:stop] = block @ query
+			if scales is not None:
+				scores *= scales
+			k = min(max(1, int(n_results)), count)
+			top = np.argpartition(-scores, k - 1)[:k] if k < count else np.arange(count)
+			top = top[np.argsort(-scores[top], kind="stable")]
+			docs = self._docs(top.tolist(), offsets)
+			result["ids"].append([d["id"] for d in docs])
+			result["documents"].append([d["text"] for d in docs])
+			result["metadatas"].append([d["metadata"] for d in docs])
+			result["distances"].append([float(1.0 - scores[row]) for row in top])
+		return result
+
+	def iter_pages(self, page: int, where: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+		"""
+		Stored rows with their (dequantized) embeddings, `page` rows at a time,
+		optionally only those whose metadata has the values in `where`.
+		"""
+		count, vectors, scales, offsets = self._mapped()
+		for start in range(0, count, page):
+			rows = list(range(start, min(count, start + page)))
+			docs = self._docs(rows, offsets)
+			if where:
+				kept = [(row, d) for row, d in zip(rows, docs) if all((d["metadata"] or {}).get(key) == value for key, value in where.items())]
+				if not kept:
+					continue
+				rows, docs = [row for row, _ in kept], [d for _, d in kept]
+			yield {
+				"ids": [d["id"] for d in docs],
+				"documents": [d["text"] for d in docs],
+				"metadatas": [d["metadata"] for d in docs],
+				"embeddings": self._dequantize(vectors, scales, rows),
+			}
+
+
+def store_exists(session_id: str) -> bool:
+	"""
+	Whether the session has vectors in the NumPy store.
+	"""
+	return os.path.exists(os.path.join(store_path(session_id), "manifest.json"))
+
+
+def open_store(session_id: str) -> NumpyCollection:
+	"""
+	The session's store (created on its first upsert), from a small LRU of
+	open stores so memory maps and id maps are reused.
+	"""
+	path = store_path(session_id)
+	with _lock:
+		store = _stores.get(path)
+		if store is None:
+			store = _stores[path] = NumpyCollection(path)
+		_stores.move_to_end(path)
+		while len(_stores) > _OPEN_STORES:
+			_stores.popitem(last=False)
+		return store
+
+
+def drop_store(session_id: str) -> bool:
+	"""
+	Delete the session's store. Returns whether it existed.
+	"""
+	path = store_path(session_id)
+	with _lock:
+		_stores.pop(path, None)
+	existed = os.path.exists(path)
+	shutil.rmtree(path, ignore_errors=True)
+	return existed
+
+
+def store_bytes(session_id: str) -> int:
+	"""
+	Bytes the session's store uses on disk.
+	"""
+	return open_store(session_id).nbytes() if os.path.isdir(store_path(session_id)) else 0
@@ -0,0 +1,118 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+import copy
+import threading
+
+from src.config.settings import get_settings
+
+
+_lock = threading.Lock()
+# (session_id, normalized query, k) -> (session generation, results)
+_results: "OrderedDict[Tuple[str, str, int], Tuple[int, List[Dict[str, Any]]]]" = OrderedDict()
+# (embedding model, normalized query) -> query vector
+_embeddings: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "embed_hits": 0, "embed_misses": 0}
+
+
+def normalize_query(query: str) -> str:
+	"""
+	Cache key of a query: trimmed, whitespace runs collapsed, lower case.
+	"""
+	return " ".join((query or "").split()).lower()
+
+
+def _put(cache: "OrderedDict[Any, Any]", key: Hashable, value: Any, size: int) -> None:
+	cache[key] = value
+	cache.move_to_end(key)
+	while len(cache) > size:
+		cache.popitem(last=False)
+
+
+def get_results(session_id: str, query: str, k: int, generation: Optional[int]) -> Optional[List[Dict[str, Any]]]:
+	"""
+	Cached results of a search on the session's data generation `generation`,
+	or None. Results cached for an older generation are dropped.
+	"""
+	if generation is None or get_settings().SEARCH_CACHE_SIZE <= 0:
+		return None
+	key = (session_id, normalize_query(query), int(k))
+	with _lock:
+		entry = _results.get(key)
+		if entry is not None and entry[0] != generation:
+			del _results[key]
+			_stats["stale"] += 1
+			entry = None
+		if entry is None:
+			_stats["misses"] += 1
+			return None
+		_results.move_to_end(key)
+		_stats["hits"] += 1
+	# callers may annotate the results they get
+	return copy.deepcopy(entry[1])
+
+
+def put_results(session_id: str, query: str, k: int, generation: Optional[int], results: List[Dict[str, Any]]) -> None:
+	"""
+	Cache the results of a search on data generation `generation`, in an LRU of
+	SEARCH_CACHE_SIZE entries. Searches of unregistered sessions are not cached.
+	"""
+	size = int(get_settings().SEARCH_CACHE_SIZE)
+	if generation is None or size <= 0:
+		return
+	key = (session_id, normalize_query(query), int(k))
+	with _lock:
+		_put(_results, key, (generation, copy.deepcopy(results)), size)
+
+
+def get_query_embedding(model: str, query: str) -> Optional[Any]:
+	"""
+	Cached vector of a query for `model`, or None.
+	"""
+	key = (model, normalize_query(query))
+	with _lock:
+		vector = _embeddings.get(key)
+		if vector is None:
+			_stats["embed_misses"] += 1
+			return None
+		_embeddings.move_to_end(key)
+		_stats["embed_hits"] += 1
+		return vector
+
+
+def put_query_embedding(model: str, query: str, vector: Any) -> None:
+	"""
+	Cache a query vector in an LRU of QUERY_EMBED_CACHE_SIZE entries.
+	"""
+	size = int(get_settings().QUERY_EMBED_CACHE_SIZE)
+	if size > 0:
+		with _lock:
+			_put(_embeddings, (model, normalize_query(query)), vector, size)
+
+
+def drop_session(session_id: str) -> int:
+	"""
+	Drop the session's cached results. Returns how many were dropped.
+	"""
+	with _lock:
+		keys = [key for key in _results if key[0] == session_id]
+		for key in keys:
+			del _results[key]
+	return len(keys)
+
+
+def search_cache_stats() -> Dict[str, Any]:
+	"""
+	Search cache counters since process start: searches served from the cache
+	(hits) or run (misses, of which stale: cached for an older data
+	generation), query embeddings reused or computed, and entries cached now.
+	"""
+	with _lock:
+		stats: Dict[str, Any] = dict(_stats)
+		stats["results_cached"] = len(_results)
+		stats["embeddings_cached"] = len(_embeddings)
+	lookups = stats["hits"] + stats["misses"]
+	stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+	embeds = stats["embed_hits"] + stats["embed_misses"]
+	stats["embed_hit_rate"] = round(stats["embed_hits"] / embeds, 3) if embeds else None
+	return stats
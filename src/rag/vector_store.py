@@ -0,0 +1,119 @@
+from typing import Any, Dict, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import os
+import threading
+import time
+
+import chromadb
+from chromadb.api.models.Collection import Collection
+from chromadb.config import Settings as ChromaSettings
+from chromadb.errors import ChromaError
+
+from src.config.settings import get_settings
+from src.rag.embedding import default_embedding_function
+
+
+# one client per Chroma directory and process: {abspath: client}
+_clients: Dict[str, Any] = {}
+# collection handles, least recently used first: {(abspath, name): collection}
+_collections: "OrderedDict[Tuple[str, str], Collection]" = OrderedDict()
+_lock = threading.Lock()
+
+_stats: Dict[str, float] = {"clients": 0, "client_seconds": 0.0, "warm": 0, "cold": 0, "evictions": 0}
+
+
+def _path() -> str:
+	return os.path.abspath(get_settings().CHROMA_DB_DIR)
+
+
+def get_client() -> Any:
+	"""
+	The process's Chroma client for CHROMA_DB_DIR, opened on first use.
+	"""
+	path = _path()
+	with _lock:
+		client = _clients.get(path)
+		if client is None:
+			started = time.perf_counter()
+			client = _clients[path] = chromadb.PersistentClient(
+				path=str(Path(path)),
+				settings=ChromaSettings(anonymized_telemetry=False),
+			)
+			_stats["clients"] += 1
+			_stats["client_seconds"] += time.perf_counter() - started
+		return client
+
+
+def get_collection(name: str) -> Collection:
+	"""
+	Handle of the collection `name`, created if missing, from an LRU cache of
+	CHROMA_COLLECTION_CACHE_SIZE handles (warm hit) or from the client (cold).
+	Collections are opened with the process's default embedding function, the
+	instance LocalRAG embeds with (see embedding.default_embedding_function).
+	"""
+	key = (_path(), name)
+	with _lock:
+		collection = _collections.get(key)
+		if collection is not None:
+			_collections.move_to_end(key)
+			_stats["warm"] += 1
+			return collection
+	collection = get_client().get_or_create_collection(
+		name=name,
+		metadata={"session_id": name},
+		embedding_function=default_embedding_function(),
+	)
+	with _lock:
+		_stats["cold"] += 1
+		_collections[key] = collection
+		_collections.move_to_end(key)
+		while len(_collections) > max(1, int(get_settings().CHROMA_COLLECTION_CACHE_SIZE)):
+			_collections.popitem(last=False)
+			_stats["evictions"] += 1
+	return collection
+
+
+def collection_exists(name: str) -> bool:
+	"""
+	Whether the collection `name` exists, without creating it.
+	"""
+	with _lock:
+		if (_path(), name) in _collections:
+			return True
+	try:
+		get_client().get_collection(name=name)
+	except (ValueError, ChromaError):
+		return False
+	return True
+
+
+def delete_collection(name: str) -> bool:
+	"""
+	Delete the collection `name` and drop its cached handle. Returns whether it existed.
+	"""
+	with _lock:
+		_collections.pop((_path(), name), None)
+	try:
+		get_client().delete_collection(name=name)
+	except (ValueError, ChromaError):
+		# missing collection: ValueError before chromadb 1.0, NotFoundError after
+		return False
+	return True
+
+
+def vector_store_stats() -> Dict[str, Any]:
+	"""
+	Chroma client and collection cache counters since process start: clients
+	opened (and time spent opening them), collection lookups served from the
+	cache (warm) or the client (cold), handles evicted and cached now.
+	"""
+	with _lock:
+		stats: Dict[str, Any] = dict(_stats)
+		stats["cached"] = len(_collections)
+	for name in ("clients", "warm", "cold", "evictions"):
+		stats[name] = int(stats[name])
+	stats["client_seconds"] = round(stats["client_seconds"], 4)
+	lookups = stats["warm"] + stats["cold"]
+	stats["hit_rate"] = round(stats["warm"] / lookups, 3) if lookups else None
+	return stats
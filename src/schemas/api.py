@@ -27,14 +27,66 @@ class ChatProcessResponse(BaseModel):
 	chat_id: Optional[str] = None
 
 
+class IngestFileReport(BaseModel):
+	file: str
+	chunks: int
+	seconds: float
+	parse_seconds: Optional[float] = None
+	store_seconds: Optional[float] = None
+	streamed: bool = False
+	deduplicated: bool = False  # copied from an identical file ingested in another session
+	appended: bool = False  # rows added to a file already stored in the session
+
+
 class CSVIngestResponse(BaseModel):
 	session_id: str
-	doc_count: int
+	job_id: Optional[str] = None
+	status: Optional[str] = None
+	doc_count: Optional[int] = None  # set once the job is done (or with ?wait=true)
+	seconds: Optional[float] = None
+	files: Optional[List[IngestFileReport]] = None
 
 
 class ChatIngestResponse(BaseModel):
 	session_id: str
-	doc_count: int
+	job_id: Optional[str] = None
+	status: Optional[str] = None
+	doc_count: Optional[int] = None  # set once the job is done (or with ?wait=true)
+	seconds: Optional[float] = None
+	files: Optional[List[IngestFileReport]] = None
+
+
+class SessionIngestResponse(BaseModel):
+	session_id: str
+	job_id: Optional[str] = None
+	status: Optional[str] = None
+	doc_count: Optional[int] = None  # chunks added by this upload
+	seconds: Optional[float] = None
+	files: Optional[List[IngestFileReport]] = None
+
+
+class SessionDeleteResponse(BaseModel):
+	session_id: str
+	deleted: bool
+	freed_bytes: int  # SQLite file, Parquet, uploads and outputs; Chroma not counted
+	seconds: float
+
+
+class JobStatusResponse(BaseModel):
+	job_id: str
+	session_id: str
+	kind: str
+	status: str  # queued | running | done | failed
+	stage: str  # queued | parsing | storing | indexing | profiling | done
+	rows_processed: int = 0
+	rows_per_sec: Optional[float] = None
+	doc_count: Optional[int] = None
+	seconds: Optional[float] = None
+	files: Optional[List[IngestFileReport]] = None
+	error: Optional[str] = None
+	created_at: str
+	updated_at: str
+	finished_at: Optional[str] = None
 
 
 class CSVProcessRequest(BaseModel):
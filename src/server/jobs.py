@@ -0,0 +1,286 @@
+from typing import Optional, List, Dict, Any, Iterator, Set, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from uuid import uuid4
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+from src.config.settings import get_settings
+from src.storage.sqlite import get_conn, register_schema
+from src.storage.writer import write
+from src.ingestion.pipeline import ingest_files
+from src.ingestion.sources import Source
+from src.rag.local import LocalRAG
+from src.agents.db_context import refresh_session_profile
+from src.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# sessions with a queued or running job, or an upload being saved, in this process: {session_id: holds}
+_active: Dict[str, int] = {}
+# sessions being deleted in this process
+_deleting: Set[str] = set()
+# job ids queued or running in this process
+_active_jobs: Set[str] = set()
+
+# progress rows are written at most this often; stage changes always are
+_PROGRESS_INTERVAL_S = 0.5
+
+
+class SessionDeleting(RuntimeError):
+	"""
+	The session is being deleted; nothing can be ingested into it.
+	"""
+
+
+def _get_conn() -> sqlite3.Connection:
+	settings = get_settings()
+	return get_conn(settings.SQLITE_DB_PATH)
+
+
+@register_schema
+def _init_schema(conn: sqlite3.Connection) -> None:
+	conn.executescript(
+		"""
+		CREATE TABLE IF NOT EXISTS ingest_jobs (
+			job_id TEXT PRIMARY KEY,
+			session_id TEXT NOT NULL,
+			kind TEXT NOT NULL,             -- 'chat' | 'csv' | 'append'
+			status TEXT NOT NULL,           -- 'queued' | 'running' | 'done' | 'failed'
+			stage TEXT NOT NULL,
+			rows_processed INTEGER NOT NULL DEFAULT 0,
+			rows_per_sec REAL,
+			doc_count INTEGER,
+			seconds REAL,
+			files_json TEXT,
+			error TEXT,
+			created_at TEXT NOT NULL,
+			updated_at TEXT NOT NULL,
+			finished_at TEXT
+		);
+		CREATE INDEX IF NOT EXISTS idx_ingest_jobs_session ON ingest_jobs(session_id);
+		"""
+	)
+
+
+def _now() -> str:
+	return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+def _get_executor() -> ThreadPoolExecutor:
+	"""
+	Jobs run on their own threads (each with its own event loop), so parsing and
+	SQLite writes never block the server's event loop. INGEST_JOB_WORKERS bounds
+	how many uploads are ingested at once; later ones wait as 'queued'.
+	"""
+	global _executor
+	with _executor_lock:
+		if _executor is None:
+			settings = get_settings()
+			_executor = ThreadPoolExecutor(max_workers=max(1, settings.INGEST_JOB_WORKERS), thread_name_prefix="ingest-job")
+		return _executor
+
+
+def create_job(session_id: str, kind: str) -> Dict[str, Any]:
+	job_id = str(uuid4())
+	now = _now()
+	write(
+		lambda conn: conn.execute(
+			"INSERT INTO ingest_jobs(job_id, session_id, kind, status, stage, created_at, updated_at) VALUES (?, ?, ?, 'queued', 'queued', ?, ?)",
+			(job_id, session_id, kind, now, now),
+		)
+	)
+	return get_job(job_id)  # type: ignore[return-value]
+
+
+def update_job(job_id: str, **fields: Any) -> None:
+	if "files" in fields:
+		fields["files_json"] = json.dumps(fields.pop("files"), ensure_ascii=False)
+	fields["updated_at"] = _now()
+	cols = ", ".join(f"{k} = ?" for k in fields)
+	write(lambda conn: conn.execute(f"UPDATE ingest_jobs SET {cols} WHERE job_id = ?", (*fields.values(), job_id)))
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+	conn = _get_conn()
+	try:
+		row = conn.execute("SELECT * FROM ingest_jobs WHERE job_id = ?", (job_id,)).fetchone()
+	finally:
+		conn.close()
+	if not row:
+		return None
+	job = dict(row)
+	files_json = job.pop("files_json", None)
+	job["files"] = json.loads(files_json) if files_json else None
+	return job
+
+
+class _ProgressWriter:
+	"""
+	Accumulates rows from pipeline progress callbacks and persists them, throttled.
+	"""
+
+	def __init__(self, job_id: str):
+		self.job_id = job_id
+		self.started = time.perf_counter()
+		self.rows = 0
+		self.stage = "queued"
+		self.last_write = 0.0
+
+	def rate(self) -> float:
+		elapsed = time.perf_counter() - self.started
+		return round(self.rows / elapsed, 1) if elapsed > 0 else 0.0
+
+	def __call__(self, stage: str, rows: int = 0) -> None:
+		self.rows += rows
+		now = time.perf_counter()
+		if stage == self.stage and now - self.last_write < _PROGRESS_INTERVAL_S:
+			return
+		self.stage = stage
+		self.last_write = now
+		update_job(self.job_id, status="running", stage=stage, rows_processed=self.rows, rows_per_sec=self.rate())
+
+
+def _run_job(job_id: str, session_id: str, paths: List[Source], hashes: Optional[Dict[str, str]] = None, append: bool = False) -> None:
+	progress = _ProgressWriter(job_id)
+	try:
+		progress("parsing")
+		result = asyncio.run(ingest_files(session_id=session_id, paths=paths, rag=LocalRAG(), progress=progress, hashes=hashes, append=append))
+		progress("profiling")
+		try:
+			refresh_session_profile(session_id=session_id)
+		except Exception:
+			logger.exception("db_context_refresh_failed")
+		update_job(
+			job_id,
+			status="done",
+			stage="done",
+			rows_processed=progress.rows,
+			rows_per_sec=progress.rate(),
+			doc_count=result["doc_count"],
+			seconds=result["seconds"],
+			files=result["files"],
+			finished_at=_now(),
+		)
+		logger.info({"event": "ingest_job_done", "job_id": job_id, "session_id": session_id, "doc_count": result["doc_count"], "rows": progress.rows})
+	except Exception as e:
+		logger.exception("ingest_job_failed")
+		update_job(job_id, status="failed", stage=progress.stage, rows_processed=progress.rows, error=f"{e.__class__.__name__}: {e}", finished_at=_now())
+
+
+def submit_ingest_job(
+	session_id: str,
+	kind: str,
+	paths: List[Source],
+	hashes: Optional[Dict[str, str]] = None,
+	append: bool = False,
+) -> Tuple[Dict[str, Any], Future]:
+	"""
+	Queue ingestion of saved upload files. `hashes` maps str(path) to the sha256
+	computed while saving, so the job does not read the files again to hash them.
+	With `append` the files extend an existing session (see ingest_files).
+	Returns the job row and a future that resolves when the job has finished
+	(successfully or not).
+	"""
+	job = create_job(session_id=session_id, kind=kind)
+	with _executor_lock:
+		_active[session_id] = _active.get(session_id, 0) + 1
+		_active_jobs.add(job["job_id"])
+	future = _get_executor().submit(_run_job, job["job_id"], session_id, list(paths), dict(hashes or {}), append)
+	future.add_done_callback(lambda _: _job_finished(session_id, job["job_id"]))
+	return job, future
+
+
+def _release(session_id: str) -> None:
+	# caller holds _executor_lock
+	left = _active.get(session_id, 0) - 1
+	if left > 0:
+		_active[session_id] = left
+	else:
+		_active.pop(session_id, None)
+
+
+def _job_finished(session_id: str, job_id: str) -> None:
+	with _executor_lock:
+		_active_jobs.discard(job_id)
+		_release(session_id)
+
+
+@contextmanager
+def session_ingest(session_id: str) -> Iterator[None]:
+	"""
+	Hold an existing session as busy (see active_sessions) for the block: an
+	append request holds it from its first check of the session until its
+	job is queued, so the session is not deleted while its upload is saved.
+	Raises SessionDeleting if the session is being deleted.
+	"""
+	with _executor_lock:
+		if session_id in _deleting:
+			raise SessionDeleting(session_id)
+		_active[session_id] = _active.get(session_id, 0) + 1
+	try:
+		yield
+	finally:
+		with _executor_lock:
+			_release(session_id)
+
+
+@contextmanager
+def session_deletion(session_id: str) -> Iterator[bool]:
+	"""
+	Claim a session for deletion. Yields False, claiming nothing, while it has
+	an ingest in flight; else True, and session_ingest refuses the session
+	until the block exits.
+	"""
+	with _executor_lock:
+		claimed = session_id not in _active and session_id not in _deleting
+		if claimed:
+			_deleting.add(session_id)
+	try:
+		yield claimed
+	finally:
+		if claimed:
+			with _executor_lock:
+				_deleting.discard(session_id)
+
+
+def active_sessions() -> Set[str]:
+	"""
+	Sessions with an ingest job queued or running, or an upload being saved
+	(see session_ingest), in this process.
+	"""
+	with _executor_lock:
+		return set(_active)
+
+
+def fail_interrupted_jobs() -> int:
+	"""
+	Mark jobs left 'queued' or 'running' by an earlier server process as
+	failed: their threads ended with that process, so they would never
+	finish and clients would poll them until they time out. Jobs of this
+	process are left alone. Returns the number of jobs marked.
+	"""
+	with _executor_lock:
+		mine = list(_active_jobs)
+	now = _now()
+	exclude = f" AND job_id NOT IN ({', '.join('?' for _ in mine)})" if mine else ""
+
+	def _fail(conn: sqlite3.Connection) -> int:
+		cur = conn.execute(
+			"UPDATE ingest_jobs SET status = 'failed', error = ?, updated_at = ?, finished_at = ? "
+			f"WHERE status IN ('queued', 'running'){exclude}",
+			("interrupted by server restart", now, now, *mine),
+		)
+		return cur.rowcount
+
+	count = write(_fail)
+	if count:
+		logger.info({"event": "ingest_jobs_interrupted", "jobs": count})
+	return count
@@ -2,29 +2,47 @@ from fastapi import FastAPI
 from fastapi import APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import UploadFile, File
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
 from uuid import uuid4
 from pathlib import Path
+import asyncio
 from fastapi.responses import FileResponse, JSONResponse
-from starlette.status import HTTP_404_NOT_FOUND
+from starlette.status import HTTP_404_NOT_FOUND, HTTP_409_CONFLICT
 
 from src.config.settings import get_settings
 from src.graphs.chat_graph import build_chat_graph
 from src.graphs.csv_graph import build_csv_graph
-from src.schemas.api import ChatProcessRequest, ChatProcessResponse, CSVIngestResponse, ChatIngestResponse, CSVProcessRequest, CSVProcessResponse
+from src.schemas.api import ChatProcessRequest, ChatProcessResponse, CSVIngestResponse, ChatIngestResponse, SessionIngestResponse, SessionDeleteResponse, CSVProcessRequest, CSVProcessResponse
 from src.utils.logging import get_logger
-from src.ingestion.csv_ingestor import csv_to_chunks
-from src.ingestion.fs_ingestor import unzip_to_folder, folder_to_chunks
-from src.rag.local import LocalRAG
-from src.ingestion.sql_store import store_chunks
-from src.ingestion.analyze import analyze_and_store_schema
-from src.agents.db_context import refresh_session_profile
-from src.history.store import create_chat, list_chats as db_list_chats, list_messages as db_list_messages, append_message as db_append_message, get_chat as db_get_chat, update_chat_session as db_update_chat_session
+from src.ingestion.sources import Source, list_zip_members
+from src.ingestion.sql_store import has_session_data
+from src.server.uploads import UploadTooLarge, save_upload
+from src.server.jobs import SessionDeleting, submit_ingest_job, get_job, fail_interrupted_jobs, session_deletion, session_ingest
+from src.server.sessions import delete_session, record_access, start_reaper, stop_reaper
+from src.storage.sqlite import init_schemas, pool_stats
+from src.storage.writer import writer_stats
+from src.rag.vector_store import vector_store_stats
+from src.rag.embedding_cache import embedding_cache_stats
+from src.rag.search_cache import search_cache_stats
+from src.history.store import create_chat, list_chats as db_list_chats, list_messages as db_list_messages, submit_message as db_submit_message, get_chat as db_get_chat, update_chat_session as db_update_chat_session
 from src.config.secure_store import get_secret as get_app_secret, set_secret as set_app_secret, is_set as is_secret_set
 import os
 from functools import lru_cache
 
-app = FastAPI(title="Agent Server (MVP)", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	# create/migrate all SQLite tables once, before the first request
+	init_schemas()
+	# jobs of a previous process will never finish
+	fail_interrupted_jobs()
+	start_reaper()
+	yield
+	stop_reaper()
+
+
+app = FastAPI(title="Agent Server (MVP)", version="0.1.0", lifespan=lifespan)
 logger = get_logger(__name__)
 settings = get_settings()
 
@@ -39,6 +57,44 @@ async def health():
 	return {"status": "ok"}
 
 
+@router.get("/stats/sqlite")
+async def sqlite_stats():
+	"""
+	SQLite connection pool counters: connections opened and time spent opening
+	them, checkouts and reuses, schema initialization runs; under "writer", the
+	single-writer queue counters (writes, group commits, queue time).
+	"""
+	return {**pool_stats(), "writer": writer_stats()}
+
+
+@router.get("/stats/chroma")
+async def chroma_stats():
+	"""
+	Shared Chroma client counters: clients opened and time spent opening them,
+	collection handle lookups served warm (cached) or cold, evictions.
+	"""
+	return vector_store_stats()
+
+
+@router.get("/stats/embeddings")
+async def embeddings_stats():
+	"""
+	Embedding cache counters: texts served from the cache (hits) or embedded
+	(misses) and the hit rate, vectors stored and evicted, size on disk.
+	"""
+	return await asyncio.to_thread(embedding_cache_stats)
+
+
+@router.get("/stats/search")
+async def search_stats():
+	"""
+	Search cache counters: hybrid searches served from the cache (hits) or
+	run (misses; stale: cached before the session's data changed), query
+	embeddings reused or computed, entries cached.
+	"""
+	return search_cache_stats()
+
+
 chat_app = build_chat_graph()
 csv_app = build_csv_graph()
 
@@ -71,16 +127,18 @@ async def process_chat(req: ChatProcessRequest):
 		"history_messages": history,
 	}
 	logger.info({"event": "chat_process_start", "model_id": state["model_id"]})
-	# Persist incoming user message
+	record_access(state["session_id"])
+	# Persist incoming user message; the writer commits it while the agent runs
+	saved = db_submit_message(chat_id=chat_id, role="user", content=req.query)
+	result = await chat_app.ainvoke(state)
+	logger.info({"event": "chat_process_end"})
 	try:
-		db_append_message(chat_id=chat_id, role="user", content=req.query)
+		await asyncio.wrap_future(saved)
 	except Exception:
 		logger.exception("chat_history_append_user_failed")
-	result = await chat_app.ainvoke(state)
-	logger.info({"event": "chat_process_end"})
 	# Persist assistant message
 	try:
-		db_append_message(chat_id=chat_id, role="assistant", content=result.get("answer", ""))
+		await asyncio.wrap_future(db_submit_message(chat_id=chat_id, role="assistant", content=result.get("answer", "")))
 	except Exception:
 		logger.exception("chat_history_append_assistant_failed")
 	# Build sources from both hybrid docs and SQL summary (if any)
@@ -102,107 +160,129 @@ async def process_chat(req: ChatProcessRequest):
 	)
 
 
+async def _save_uploads(upload_dir: Path, files: Optional[List[UploadFile]], folder_zip: Optional[UploadFile]) -> Tuple[List[Source], Dict[str, str]]:
+	"""
+	Stream uploads to disk (bounded memory, size-limited, sha256 per file).
+	A zip is kept as is; its members are read straight from the archive.
+	Returns the sources and the sha256 of each saved file, keyed by str(path).
+	"""
+	max_bytes = settings.UPLOAD_MAX_MB * 1024 * 1024
+	paths: List[Source] = []
+	hashes: Dict[str, str] = {}
+	for f in files or []:
+		saved = await save_upload(f, upload_dir, max_bytes=max_bytes)
+		logger.info({"event": "upload_saved", "file": saved["file"], "bytes": saved["bytes"], "sha256": saved["sha256"]})
+		paths.append(saved["path"])
+		hashes[str(saved["path"])] = saved["sha256"]
+	if folder_zip:
+		saved = await save_upload(folder_zip, upload_dir, max_bytes=max_bytes)
+		logger.info({"event": "upload_saved", "file": saved["file"], "bytes": saved["bytes"], "sha256": saved["sha256"]})
+		try:
+			paths.extend(list_zip_members(saved["path"], max_total_bytes=settings.ZIP_MAX_UNCOMPRESSED_MB * 1024 * 1024))
+		except ValueError as e:
+			raise UploadTooLarge(str(e)) from e
+	return paths, hashes
+
+
+async def _start_ingest_job(session_id: str, kind: str, paths: List[Source], hashes: Dict[str, str], wait: bool, append: bool = False) -> Dict[str, Any]:
+	job, future = submit_ingest_job(session_id=session_id, kind=kind, paths=paths, hashes=hashes, append=append)
+	if wait:
+		# awaiting the job's future keeps the event loop free for other requests
+		await asyncio.wrap_future(future)
+		job = get_job(job["job_id"]) or job
+	return job
+
+
+def _ingest_fields(job: Dict[str, Any]) -> Dict[str, Any]:
+	return {k: job.get(k) for k in ("job_id", "status", "doc_count", "seconds", "files")}
+
+
 @router.post("/apps/chat/ingest", response_model=ChatIngestResponse)
-async def ingest_chat(files: Optional[List[UploadFile]] = File(default=None), folder_zip: Optional[UploadFile] = File(default=None)):
+async def ingest_chat(files: Optional[List[UploadFile]] = File(default=None), folder_zip: Optional[UploadFile] = File(default=None), wait: bool = False):
 	try:
 		session_id = str(uuid4())
 		upload_dir = Path(settings.DATA_DIR) / "uploads" / session_id / "chat"
 		upload_dir.mkdir(parents=True, exist_ok=True)
 
-		chunks = []
-		csv_paths: List[Path] = []
-		if files:
-			for f in files:
-				dest = upload_dir / f.filename
-				content = await f.read()
-				dest.write_bytes(content)
-				if dest.suffix.lower() == ".csv":
-					chunks.extend(csv_to_chunks(dest))
-					csv_paths.append(dest)
-				elif dest.suffix.lower() in {".txt", ".md"}:
-					chunks.append({"text": dest.read_text(encoding="utf-8", errors="ignore"), "metadata": {"file": dest.name}})
-		if folder_zip:
-			zip_dest = upload_dir / folder_zip.filename
-			zip_dest.write_bytes(await folder_zip.read())
-			folder = unzip_to_folder(zip_dest, upload_dir / "unzipped")
-			chunks.extend(folder_to_chunks(folder))
-			# collect csv paths for schema analysis
-			for p in folder.rglob("*.csv"):
-				csv_paths.append(p)
-
-		# write to SQLite (rows + FTS)
-		if chunks:
-			store_chunks(session_id=session_id, chunks=chunks)
-		# analyze CSV schema and store
-		for p in csv_paths:
-			try:
-				analyze_and_store_schema(session_id=session_id, file_path=p)
-			except Exception:
-				logger.exception("schema_analysis_failed")
-		# refresh session DB profile
-		try:
-			refresh_session_profile(session_id=session_id)
-		except Exception:
-			logger.exception("db_context_refresh_failed")
-		rag = LocalRAG()
-		if chunks:
-			await rag.build_index(session_id=session_id, chunks=chunks)
-		return ChatIngestResponse(session_id=session_id, doc_count=len(chunks))
+		paths, hashes = await _save_uploads(upload_dir, files, folder_zip)
+
+		# parse, store, index and profile in a background job; poll /jobs/{job_id} for progress
+		job = await _start_ingest_job(session_id=session_id, kind="chat", paths=paths, hashes=hashes, wait=wait)
+		if job["status"] == "failed":
+			return JSONResponse({"detail": f"ingest failed: {job['error']}", "job_id": job["job_id"]}, status_code=500)
+		return ChatIngestResponse(session_id=session_id, **_ingest_fields(job))
+	except UploadTooLarge as e:
+		return JSONResponse({"detail": str(e)}, status_code=413)
 	except Exception as e:
 		logger.exception("chat_ingest_failed")
 		return JSONResponse({"detail": f"ingest failed: {e.__class__.__name__}: {e}"}, status_code=500)
 
 
 @router.post("/apps/csv/ingest", response_model=CSVIngestResponse)
-async def ingest_csv(files: Optional[List[UploadFile]] = File(default=None), folder_zip: Optional[UploadFile] = File(default=None)):
+async def ingest_csv(files: Optional[List[UploadFile]] = File(default=None), folder_zip: Optional[UploadFile] = File(default=None), wait: bool = False):
 	try:
 		session_id = str(uuid4())
 		upload_dir = Path(settings.DATA_DIR) / "uploads" / session_id
 		upload_dir.mkdir(parents=True, exist_ok=True)
 
-		chunks = []
-		csv_paths: List[Path] = []
-		if files:
-			for f in files:
-				dest = upload_dir / f.filename
-				content = await f.read()
-				dest.write_bytes(content)
-				if dest.suffix.lower() == ".csv":
-					chunks.extend(csv_to_chunks(dest))
-					csv_paths.append(dest)
-				elif dest.suffix.lower() in {".txt", ".md"}:
-					chunks.append({"text": dest.read_text(encoding="utf-8", errors="ignore"), "metadata": {"file": dest.name}})
-		if folder_zip:
-			zip_dest = upload_dir / folder_zip.filename
-			zip_dest.write_bytes(await folder_zip.read())
-			folder = unzip_to_folder(zip_dest, upload_dir / "unzipped")
-			chunks.extend(folder_to_chunks(folder))
-			for p in folder.rglob("*.csv"):
-				csv_paths.append(p)
-
-		# write to SQLite (rows + FTS)
-		if chunks:
-			store_chunks(session_id=session_id, chunks=chunks)
-		# analyze CSV schema
-		for p in csv_paths:
-			try:
-				analyze_and_store_schema(session_id=session_id, file_path=p)
-			except Exception:
-				logger.exception("csv_schema_analysis_failed")
-		# refresh session DB profile
-		try:
-			refresh_session_profile(session_id=session_id)
-		except Exception:
-			logger.exception("db_context_refresh_failed")
-		rag = LocalRAG()
-		if chunks:
-			await rag.build_index(session_id=session_id, chunks=chunks)
-		return CSVIngestResponse(session_id=session_id, doc_count=len(chunks))
+		paths, hashes = await _save_uploads(upload_dir, files, folder_zip)
+
+		# parse, store, index and profile in a background job; poll /jobs/{job_id} for progress
+		job = await _start_ingest_job(session_id=session_id, kind="csv", paths=paths, hashes=hashes, wait=wait)
+		if job["status"] == "failed":
+			return JSONResponse({"detail": f"ingest failed: {job['error']}", "job_id": job["job_id"]}, status_code=500)
+		return CSVIngestResponse(session_id=session_id, **_ingest_fields(job))
+	except UploadTooLarge as e:
+		return JSONResponse({"detail": str(e)}, status_code=413)
 	except Exception as e:
 		logger.exception("csv_ingest_failed")
 		return JSONResponse({"detail": f"ingest failed: {e.__class__.__name__}: {e}"}, status_code=500)
 
 
+@router.post("/sessions/{session_id}/ingest", response_model=SessionIngestResponse)
+async def ingest_session(session_id: str, files: Optional[List[UploadFile]] = File(default=None), folder_zip: Optional[UploadFile] = File(default=None), wait: bool = False):
+	"""
+	Append files to an existing session. A file named like one already in the
+	session adds its rows to it; other files are added alongside.
+	"""
+	try:
+		# held busy from the check on, so a delete or reaper pass cannot remove it while the upload is saved
+		with session_ingest(session_id):
+			if not has_session_data(session_id):
+				return JSONResponse({"detail": "session not found"}, status_code=HTTP_404_NOT_FOUND)
+			upload_dir = Path(settings.DATA_DIR) / "uploads" / session_id / f"append-{uuid4().hex}"
+			upload_dir.mkdir(parents=True, exist_ok=True)
+
+			paths, hashes = await _save_uploads(upload_dir, files, folder_zip)
+
+			job = await _start_ingest_job(session_id=session_id, kind="append", paths=paths, hashes=hashes, wait=wait, append=True)
+		if job["status"] == "failed":
+			return JSONResponse({"detail": f"ingest failed: {job['error']}", "job_id": job["job_id"]}, status_code=500)
+		return SessionIngestResponse(session_id=session_id, **_ingest_fields(job))
+	except SessionDeleting:
+		return JSONResponse({"detail": "the session is being deleted"}, status_code=HTTP_409_CONFLICT)
+	except UploadTooLarge as e:
+		return JSONResponse({"detail": str(e)}, status_code=413)
+	except Exception as e:
+		logger.exception("session_ingest_failed")
+		return JSONResponse({"detail": f"ingest failed: {e.__class__.__name__}: {e}"}, status_code=500)
+
+
+@router.delete("/sessions/{session_id}", response_model=SessionDeleteResponse)
+async def delete_session_api(session_id: str):
+	"""
+	Delete a session and all of its data (SQLite, Chroma, Parquet, uploads,
+	outputs) now, as the TTL reaper would.
+	"""
+	with session_deletion(session_id) as claimed:
+		if not claimed:
+			return JSONResponse({"detail": "an ingest job is running for this session"}, status_code=HTTP_409_CONFLICT)
+		result = await asyncio.to_thread(delete_session, session_id)
+	if not result["deleted"]:
+		return JSONResponse({"detail": "session not found"}, status_code=HTTP_404_NOT_FOUND)
+	return SessionDeleteResponse(**result)
+
+
 @router.post("/apps/csv/process", response_model=CSVProcessResponse)
 async def process_csv(req: CSVProcessRequest):
 	state = {
@@ -211,6 +291,7 @@ async def process_csv(req: CSVProcessRequest):
 		"k": req.k or 5,
 		"model_id": req.model_id or settings.LLM_MODEL_ID,
 	}
+	record_access(req.session_id)
 	result = await csv_app.ainvoke(state)
 	files = result.get("output_paths", [])
 	# Build file URLs relative to API base
@@ -238,6 +319,7 @@ async def process_csv(req: CSVProcessRequest):
 
 @router.get("/files/{session_id}/{filepath:path}")
 async def get_file(session_id: str, filepath: str):
+	record_access(session_id)
 	base = Path(settings.OUTPUT_DIR).resolve() / session_id
 	target = (base / filepath).resolve()
 	# prevent path traversal
@@ -250,7 +332,16 @@ async def get_file(session_id: str, filepath: str):
 
 # ----- Chat history endpoints -----
 from src.schemas.api import ChatCreateRequest, ChatCreateResponse, ChatListResponse, ChatListItem, ChatMessagesResponse, ChatMessage
-from src.schemas.api import ConfigGetResponse, ConfigUpdateRequest, ConfigUpdateResponse
+from src.schemas.api import ConfigGetResponse, ConfigUpdateRequest, ConfigUpdateResponse, JobStatusResponse
+
+
+# ----- Ingest job endpoints -----
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_api(job_id: str):
+	job = get_job(job_id)
+	if not job:
+		return JSONResponse({"detail": "Not found"}, status_code=HTTP_404_NOT_FOUND)
+	return JobStatusResponse(**job)
 
 
 @router.post("/chats", response_model=ChatCreateResponse)
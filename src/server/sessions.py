@@ -0,0 +1,241 @@
+from typing import Optional, List, Dict, Any, Set
+from datetime import datetime, timedelta
+from pathlib import Path
+import asyncio
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from src.config.settings import get_settings
+from src.agents.db_context import delete_session_profile
+from src.ingestion import columnar
+from src.ingestion.sql_store import drop_session, list_sessions, touch_session
+from src.rag import numpy_store, search_cache
+from src.rag.local import LocalRAG
+from src.server.jobs import active_sessions, session_deletion
+from src.storage.sqlite import session_db_path
+from src.storage.writer import write
+from src.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+# an access is written to the catalog at most this often per session
+_TOUCH_INTERVAL_S = 60.0
+# pause between reaper passes while expired sessions are left over from a full batch
+_BATCH_PAUSE_S = 1.0
+# free pages returned to the file system per write; chat writes can run in between
+_VACUUM_STEP_PAGES = 1000
+
+_touched: Dict[str, float] = {}
+_touch_lock = threading.Lock()
+
+_reaper: Optional[threading.Thread] = None
+_reaper_stop = threading.Event()
+
+
+def record_access(session_id: Optional[str]) -> None:
+	"""
+	Mark a session as used now, for SESSION_TTL_HOURS and the quota's least
+	recently used order. Written to the catalog without waiting, at most
+	once a minute per session.
+	"""
+	if not session_id:
+		return
+	now = time.monotonic()
+	with _touch_lock:
+		last = _touched.get(session_id)
+		if last is not None and now - last < _TOUCH_INTERVAL_S:
+			return
+		_touched[session_id] = now
+	touch_session(session_id)
+
+
+def _session_path(base: str, session_id: str) -> Optional[Path]:
+	# session ids come from URLs: only a direct child of base is ever touched
+	root = Path(base).resolve()
+	path = (root / session_id).resolve()
+	return path if path.parent == root else None
+
+
+def _session_dirs(session_id: str) -> List[Path]:
+	settings = get_settings()
+	bases = [os.path.join(settings.DATA_DIR, "uploads"), settings.OUTPUT_DIR]
+	return [p for p in (_session_path(b, session_id) for b in bases) if p is not None]
+
+
+def _tree_bytes(path: Path) -> int:
+	total = 0
+	for root, _, files in os.walk(path):
+		for name in files:
+			try:
+				total += os.path.getsize(os.path.join(root, name))
+			except OSError:
+				pass
+	return total
+
+
+def session_size(session_id: str) -> int:
+	"""
+	Bytes the session uses on disk: its SQLite file (sharded layout), NumPy
+	vector store, Parquet files, uploads and outputs. Its share of Chroma is
+	not counted.
+	"""
+	size = columnar.session_bytes(session_id) + numpy_store.store_bytes(session_id) + sum(_tree_bytes(p) for p in _session_dirs(session_id))
+	db = session_db_path(session_id)
+	if os.path.abspath(db) != os.path.abspath(get_settings().SQLITE_DB_PATH):
+		for suffix in ("", "-wal"):
+			if os.path.exists(db + suffix):
+				size += os.path.getsize(db + suffix)
+	return size
+
+
+def delete_session(session_id: str) -> Dict[str, Any]:
+	"""
+	Delete every artifact of a session: its SQLite data and catalog entries,
+	Chroma collection or NumPy store, Parquet files, uploads and outputs. Chats that used
+	the session are kept. Blocking; call it off the event loop.
+	Returns { session_id, deleted, freed_bytes, seconds }.
+	"""
+	started = time.perf_counter()
+	freed = session_size(session_id)
+	deleted = drop_session(session_id)
+	# shared layout only: with a file per session the profile went with it
+	delete_session_profile(session_id)
+	columnar.drop_session(session_id)
+	deleted = bool(asyncio.run(LocalRAG().drop_session(session_id))) or deleted
+	search_cache.drop_session(session_id)
+	for path in _session_dirs(session_id):
+		if path.exists():
+			shutil.rmtree(path, ignore_errors=True)
+			deleted = True
+	with _touch_lock:
+		_touched.pop(session_id, None)
+	seconds = round(time.perf_counter() - started, 4)
+	logger.info({"event": "session_deleted", "session_id": session_id, "deleted": deleted, "freed_bytes": freed, "seconds": seconds})
+	return {"session_id": session_id, "deleted": deleted, "freed_bytes": freed, "seconds": seconds}
+
+
+def _vacuum_step(conn: sqlite3.Connection, pages: int) -> int:
+	# databases created before auto_vacuum was set keep their free pages until a full VACUUM
+	if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+		return 0
+	count = min(pages, conn.execute("PRAGMA freelist_count").fetchone()[0])
+	# sqlite3 steps a PRAGMA without result columns once, and each step frees one page
+	for _ in range(count):
+		conn.execute("PRAGMA incremental_vacuum(1)")
+	return count
+
+
+def vacuum_free_pages(db_path: Optional[str] = None) -> int:
+	"""
+	Return the free pages of a database (default SQLITE_DB_PATH) to the file
+	system, _VACUUM_STEP_PAGES per bulk write. Returns the pages freed.
+	"""
+	total = 0
+	while True:
+		count = write(lambda conn: _vacuum_step(conn, _VACUUM_STEP_PAGES), db_path=db_path, bulk=True)
+		total += count
+		if count < _VACUUM_STEP_PAGES:
+			return total
+
+
+def _select_victims(sessions: List[Dict[str, Any]], busy: Set[str]) -> List[str]:
+	settings = get_settings()
+	victims: List[str] = []
+	if settings.SESSION_TTL_HOURS > 0:
+		cutoff = (datetime.utcnow() - timedelta(hours=settings.SESSION_TTL_HOURS)).isoformat(timespec="seconds") + "Z"
+		victims = [s["session_id"] for s in sessions if s["last_access_at"] < cutoff and s["session_id"] not in busy]
+	if settings.SESSION_QUOTA_MB > 0:
+		sizes = {s["session_id"]: session_size(s["session_id"]) for s in sessions}
+		total = sum(size for sid, size in sizes.items() if sid not in victims)
+		# sessions are listed least recently accessed first
+		for s in sessions:
+			if total <= settings.SESSION_QUOTA_MB * 1024 * 1024:
+				break
+			sid = s["session_id"]
+			if sid not in victims and sid not in busy:
+				victims.append(sid)
+				total -= sizes[sid]
+	return victims
+
+
+def reap_sessions() -> Dict[str, Any]:
+	"""
+	One reaper pass: delete up to SESSION_REAPER_BATCH sessions that were not
+	accessed for SESSION_TTL_HOURS or, least recently accessed first, that
+	push all sessions over SESSION_QUOTA_MB. Sessions with an ingest job in
+	flight are skipped. The catalog's free pages (with the deleted rows in
+	the shared layout) are then returned to the file system.
+	Returns { deleted: [session_id], freed_bytes, vacuumed_pages, remaining, seconds }.
+	"""
+	started = time.perf_counter()
+	batch = max(1, int(get_settings().SESSION_REAPER_BATCH))
+	victims = _select_victims(list_sessions(), active_sessions())
+	deleted: List[str] = []
+	freed = 0
+	for session_id in victims[:batch]:
+		if _reaper_stop.is_set():
+			break
+		# an append may have started on it since the victims were picked
+		with session_deletion(session_id) as claimed:
+			if not claimed:
+				continue
+			try:
+				result = delete_session(session_id)
+			except Exception:
+				logger.exception("session_reap_failed")
+				continue
+		deleted.append(session_id)
+		freed += result["freed_bytes"]
+	vacuumed = vacuum_free_pages() if deleted else 0
+	stats = {
+		"deleted": deleted,
+		"freed_bytes": freed,
+		"vacuumed_pages": vacuumed,
+		"remaining": max(0, len(victims) - batch),
+		"seconds": round(time.perf_counter() - started, 4),
+	}
+	if deleted:
+		logger.info({"event": "sessions_reaped", **stats})
+	return stats
+
+
+def _run_reaper() -> None:
+	wait = 0.0
+	while not _reaper_stop.wait(wait):
+		try:
+			remaining = reap_sessions()["remaining"]
+		except Exception:
+			logger.exception("session_reaper_failed")
+			remaining = 0
+		wait = _BATCH_PAUSE_S if remaining else max(1, get_settings().SESSION_REAPER_INTERVAL_S)
+
+
+def start_reaper() -> bool:
+	"""
+	Start the background reaper thread, if SESSION_TTL_HOURS or
+	SESSION_QUOTA_MB is set. Its first pass runs right away.
+	"""
+	global _reaper
+	settings = get_settings()
+	if settings.SESSION_TTL_HOURS <= 0 and settings.SESSION_QUOTA_MB <= 0:
+		return False
+	if _reaper is None or not _reaper.is_alive():
+		_reaper_stop.clear()
+		_reaper = threading.Thread(target=_run_reaper, name="session-reaper", daemon=True)
+		_reaper.start()
+	return True
+
+
+def stop_reaper(timeout: float = 10.0) -> None:
+	"""
+	Stop the reaper thread after the session it is deleting.
+	"""
+	global _reaper
+	_reaper_stop.set()
+	if _reaper is not None:
+		_reaper.join(timeout)
+		_reaper = None
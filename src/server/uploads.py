@@ -0,0 +1,51 @@
+from typing import Dict, Any
+from pathlib import Path
+import hashlib
+
+from fastapi import UploadFile
+
+
+# bytes read from the request body per await
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+
+class UploadTooLarge(ValueError):
+	pass
+
+
+def safe_filename(filename: str | None, default: str = "upload") -> str:
+	"""
+	Last path component of a client-supplied name, so uploads cannot escape
+	their session folder.
+	"""
+	name = Path(str(filename or "").replace("\\", "/")).name
+	return name if name not in ("", ".", "..") else default
+
+
+async def save_upload(upload: UploadFile, dest_dir: Path, max_bytes: int) -> Dict[str, Any]:
+	"""
+	Stream an upload to dest_dir in UPLOAD_CHUNK_BYTES pieces, hashing as it goes.
+	Never holds more than one piece in memory. A partial file is removed if the
+	upload exceeds `max_bytes`.
+	Returns: { path, file, bytes, sha256 }
+	"""
+	dest = Path(dest_dir) / safe_filename(upload.filename)
+	digest = hashlib.sha256()
+	size = 0
+	try:
+		with open(dest, "wb") as out:
+			while True:
+				piece = await upload.read(UPLOAD_CHUNK_BYTES)
+				if not piece:
+					break
+				size += len(piece)
+				if size > max_bytes:
+					raise UploadTooLarge(f"{dest.name} exceeds the {max_bytes} byte upload limit")
+				digest.update(piece)
+				out.write(piece)
+	except BaseException:
+		dest.unlink(missing_ok=True)
+		raise
+	finally:
+		await upload.close()
+	return {"path": dest, "file": dest.name, "bytes": size, "sha256": digest.hexdigest()}
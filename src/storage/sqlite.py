@@ -0,0 +1,325 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from src.config.settings import get_settings
+from src.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+SchemaInit = Callable[[sqlite3.Connection], None]
+
+# the shared database (chats, jobs, secrets, session registry), the
+# per-session databases with ingested data and the embedding cache
+CATALOG = "catalog"
+SESSION = "session"
+EMBEDDINGS = "embeddings"
+
+# (scope, initializer) in registration order, applied once per database file
+_schemas: List[Tuple[str, SchemaInit]] = []
+_applied: Dict[str, int] = {}
+_schema_lock = threading.Lock()
+# bumped by forget(): pooled connections opened before are dropped on checkout
+_generation: Dict[str, int] = {}
+
+# session ids used as file names as they are; anything else is hashed
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,99}$")
+
+# idle connections, per thread: {path: [conn, ...]}
+_local = threading.local()
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, float] = {
+	"opened": 0,
+	"open_seconds": 0.0,
+	"checkouts": 0,
+	"reused": 0,
+	"discarded": 0,
+	"schema_runs": 0,
+	"schema_seconds": 0.0,
+}
+
+
+class PooledConnection(sqlite3.Connection):
+	"""
+	sqlite3 connection owned by its thread's pool. close() rolls back what was
+	not committed and hands the connection back for reuse; discard() closes it.
+	"""
+
+	def close(self) -> None:
+		_release(self)
+
+	def discard(self) -> None:
+		_count("discarded")
+		super().close()
+
+
+def register_schema(init: SchemaInit) -> SchemaInit:
+	"""
+	Register a function that creates (and migrates) a module's tables in the
+	catalog database. It runs once per database file, on the first connection
+	handed out for it.
+	"""
+	return _register(CATALOG, init)
+
+
+def register_session_schema(init: SchemaInit) -> SchemaInit:
+	"""
+	Like register_schema, for tables of the per-session databases.
+	"""
+	return _register(SESSION, init)
+
+
+def register_embeddings_schema(init: SchemaInit) -> SchemaInit:
+	"""
+	Like register_schema, for tables of the embedding cache database.
+	"""
+	return _register(EMBEDDINGS, init)
+
+
+def _register(scope: str, init: SchemaInit) -> SchemaInit:
+	with _schema_lock:
+		if (scope, init) not in _schemas:
+			_schemas.append((scope, init))
+	return init
+
+
+def session_dir() -> str:
+	settings = get_settings()
+	return settings.SQLITE_SESSION_DIR or os.path.join(os.path.dirname(settings.SQLITE_DB_PATH), "sessions")
+
+
+def embeddings_db_path() -> str:
+	"""
+	Database file of the embedding cache, shared by all sessions:
+	EMBED_CACHE_DB_PATH, default embeddings.db next to SQLITE_DB_PATH.
+	"""
+	settings = get_settings()
+	return settings.EMBED_CACHE_DB_PATH or os.path.join(os.path.dirname(settings.SQLITE_DB_PATH), "embeddings.db")
+
+
+def session_db_path(session_id: str) -> str:
+	"""
+	Database file with the ingested data of one session: its own file under
+	session_dir() with SQLITE_SHARD_SESSIONS, else the shared SQLITE_DB_PATH.
+	"""
+	settings = get_settings()
+	if not settings.SQLITE_SHARD_SESSIONS:
+		return settings.SQLITE_DB_PATH
+	name = str(session_id)
+	if not _SAFE_NAME.match(name):
+		name = "s-" + hashlib.sha256(name.encode("utf-8")).hexdigest()[:32]
+	return os.path.join(session_dir(), f"{name}.db")
+
+
+def session_db_exists(session_id: str) -> bool:
+	"""
+	Whether the session has a database yet, so readers of unknown sessions
+	do not create empty files.
+	"""
+	return os.path.exists(session_db_path(session_id))
+
+
+def _scopes(key: str) -> Tuple[str, ...]:
+	settings = get_settings()
+	if key == os.path.abspath(embeddings_db_path()):
+		return (EMBEDDINGS,)
+	if not settings.SQLITE_SHARD_SESSIONS:
+		return (CATALOG, SESSION)
+	if os.path.dirname(key) == os.path.abspath(session_dir()):
+		return (SESSION,)
+	if key == os.path.abspath(settings.SQLITE_DB_PATH):
+		return (CATALOG,)
+	# any other file (tools, tests) gets every table but the cache's
+	return (CATALOG, SESSION)
+
+
+def _count(name: str, value: float = 1) -> None:
+	with _stats_lock:
+		_stats[name] += value
+
+
+def _idle() -> Dict[str, List[PooledConnection]]:
+	idle = getattr(_local, "idle", None)
+	if idle is None:
+		idle = _local.idle = {}
+	return idle
+
+
+def configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+	"""
+	Apply the row factory and PRAGMAs every connection of the app uses.
+	"""
+	settings = get_settings()
+	conn.row_factory = sqlite3.Row
+	# only takes effect on a new database (before WAL and its first table): lets
+	# freed pages be returned to the file system without a full VACUUM
+	conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+	conn.execute("PRAGMA journal_mode=WAL;")
+	conn.execute("PRAGMA synchronous=NORMAL;")
+	conn.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_MB) * 1024 * 1024};")
+	# negative cache_size is in KiB
+	conn.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_MB) * 1024};")
+	conn.execute(f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE.upper()};")
+	return conn
+
+
+def _open(path: str) -> PooledConnection:
+	started = time.perf_counter()
+	Path(path).parent.mkdir(parents=True, exist_ok=True)
+	conn = configure(sqlite3.connect(path, factory=PooledConnection))
+	conn._pool_checked_out = False
+	conn._pool_generation = _generation.get(path, 0)
+	_count("opened")
+	_count("open_seconds", time.perf_counter() - started)
+	return conn
+
+
+def _apply_schemas(conn: PooledConnection, key: str) -> None:
+	with _schema_lock:
+		done = _applied.get(key, 0)
+		if done >= len(_schemas):
+			return
+		started = time.perf_counter()
+		scopes = _scopes(key)
+		for scope, init in _schemas[done:]:
+			if scope in scopes:
+				init(conn)
+		conn.commit()
+		_applied[key] = len(_schemas)
+		seconds = time.perf_counter() - started
+		_count("schema_runs")
+		_count("schema_seconds", seconds)
+		logger.info({"event": "sqlite_schema_applied", "db": key, "initializers": len(_schemas) - done, "seconds": round(seconds, 4)})
+
+
+def get_conn(db_path: Optional[str] = None) -> sqlite3.Connection:
+	"""
+	Connection to `db_path` (default SQLITE_DB_PATH) from the calling thread's
+	pool, opened with the configured PRAGMAs and with every registered schema
+	applied. Use it as before and call close() when done: that returns it to
+	the pool. Nested callers in one thread get separate connections.
+	"""
+	key = os.path.abspath(db_path or get_settings().SQLITE_DB_PATH)
+	idle = _idle().get(key)
+	conn = None
+	while idle:
+		conn = idle.pop()
+		if conn._pool_generation == _generation.get(key, 0):
+			break
+		# opened before forget(): may point at a deleted or replaced file
+		conn.discard()
+		conn = None
+	_count("checkouts")
+	if conn is not None:
+		_count("reused")
+	else:
+		conn = _open(key)
+	conn._pool_key = key
+	conn._pool_checked_out = True
+	if _applied.get(key, 0) < len(_schemas):
+		try:
+			_apply_schemas(conn, key)
+		except BaseException:
+			conn._pool_checked_out = False
+			conn.discard()
+			raise
+	return conn
+
+
+def _release(conn: PooledConnection) -> None:
+	if not getattr(conn, "_pool_checked_out", False):
+		return
+	conn._pool_checked_out = False
+	try:
+		if conn.in_transaction:
+			conn.rollback()
+		conn.row_factory = sqlite3.Row
+	except sqlite3.Error:
+		conn.discard()
+		return
+	key = conn._pool_key
+	idle = _idle().setdefault(key, [])
+	if len(idle) >= max(0, int(get_settings().SQLITE_POOL_MAX_IDLE)):
+		conn.discard()
+		return
+	idle.append(conn)
+
+
+def init_schemas(db_path: Optional[str] = None) -> None:
+	"""
+	Create every registered schema now (at startup) rather than on first use.
+	"""
+	get_conn(db_path).close()
+
+
+def forget(db_path: Optional[str] = None) -> None:
+	"""
+	Drop the pooled connections to `db_path` and its schema state, for a
+	database file that is deleted or replaced. Idle connections of other
+	threads are dropped when next checked out and the writer thread reopens
+	its connection; connections checked out right now keep pointing at the
+	old file until they are closed.
+	"""
+	# imported here: the writer module builds on this one
+	from src.storage.writer import reset_writer
+
+	key = os.path.abspath(db_path or get_settings().SQLITE_DB_PATH)
+	with _schema_lock:
+		_generation[key] = _generation.get(key, 0) + 1
+		_applied.pop(key, None)
+	for conn in _idle().pop(key, []):
+		conn.discard()
+	reset_writer(key)
+
+
+def remove_db(db_path: str) -> bool:
+	"""
+	Delete a database file with its WAL and shared-memory files, after
+	forget(). Returns whether it existed.
+	"""
+	key = os.path.abspath(db_path)
+	forget(key)
+	existed = os.path.exists(key)
+	for suffix in ("", "-wal", "-shm"):
+		try:
+			os.remove(key + suffix)
+		except FileNotFoundError:
+			pass
+	return existed
+
+
+def close_idle() -> int:
+	"""
+	Close the calling thread's idle connections. Returns how many were closed.
+	"""
+	idle = _idle()
+	closed = 0
+	for conns in idle.values():
+		for conn in conns:
+			conn.discard()
+			closed += 1
+	idle.clear()
+	return closed
+
+
+def pool_stats() -> Dict[str, Any]:
+	"""
+	Connection counters since process start: connections opened (and time spent
+	opening them), checkouts served and how many reused a pooled connection,
+	connections discarded, and schema initialization runs and time.
+	"""
+	with _stats_lock:
+		stats: Dict[str, Any] = dict(_stats)
+	for name in ("opened", "checkouts", "reused", "discarded", "schema_runs"):
+		stats[name] = int(stats[name])
+	stats["open_seconds"] = round(stats["open_seconds"], 4)
+	stats["schema_seconds"] = round(stats["schema_seconds"], 4)
+	stats["avg_open_ms"] = round(stats["open_seconds"] * 1000 / stats["opened"], 3) if stats["opened"] else None
+	return stats
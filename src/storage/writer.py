@@ -0,0 +1,313 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+from concurrent.futures import Future
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from src.config.settings import get_settings
+from src.storage.sqlite import close_idle, configure, get_conn
+from src.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+WriteFn = Callable[[sqlite3.Connection], Any]
+# (priority, seq, queued_at, fn, future, databases to attach {alias: path})
+Item = Tuple[int, int, float, WriteFn, Future, Optional[Dict[str, str]]]
+
+# queue order: interactive writes first, bulk ingest batches after them
+_PRIORITY = 0
+_BULK_PRIORITY = 1
+# a writer thread with nothing to do for this long closes its connection and exits
+_IDLE_EXIT_S = 30.0
+# how long the writer waits for a lock held outside it (schema migrations, other processes)
+_BUSY_TIMEOUT_S = 60.0
+
+_writers: Dict[str, "_Writer"] = {}
+_writers_lock = threading.Lock()
+# set on writer threads: (db path, write connection), so nested writes run inline;
+# and the running bulk write's writer, for yield_writes()
+_local = threading.local()
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, float] = {"writes": 0, "bulk_writes": 0, "failed": 0, "commits": 0, "yields": 0, "queue_seconds": 0.0, "commit_seconds": 0.0}
+
+
+def _count(name: str, value: float = 1) -> None:
+	with _stats_lock:
+		_stats[name] += value
+
+
+class _Writer:
+	"""
+	Owns the only write connection to one database file. Queued writes are run
+	in priority order, each inside its own SAVEPOINT. Up to
+	SQLITE_WRITER_MAX_BATCH interactive writes are committed together (group
+	commit); each bulk write is committed on its own.
+	"""
+
+	def __init__(self, path: str):
+		self.path = path
+		self.queue: "queue.PriorityQueue[Item]" = queue.PriorityQueue()
+		self.seq = itertools.count()
+		self.lock = threading.Lock()
+		self.thread: Optional[threading.Thread] = None
+		# set by reset_writer(): reopen the connection before the next batch
+		self.reopen = False
+
+	def submit(self, fn: WriteFn, bulk: bool, attach: Optional[Dict[str, str]] = None) -> Future:
+		fut: Future = Future()
+		with self.lock:
+			self.queue.put((_BULK_PRIORITY if bulk else _PRIORITY, next(self.seq), time.perf_counter(), fn, fut, attach))
+			if self.thread is None:
+				self.thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+				self.thread.start()
+		return fut
+
+	def _connect(self) -> sqlite3.Connection:
+		# creates/migrates the schema through the pool before the first write
+		get_conn(self.path).close()
+		conn = configure(sqlite3.connect(self.path, timeout=_BUSY_TIMEOUT_S, isolation_level=None))
+		_local.writer = (self.path, conn)
+		return conn
+
+	def _run(self) -> None:
+		conn: Optional[sqlite3.Connection] = None
+		try:
+			conn = self._connect()
+			while True:
+				try:
+					first = self.queue.get(timeout=_IDLE_EXIT_S)
+				except queue.Empty:
+					with self.lock:
+						if self.queue.empty():
+							self.thread = None
+							return
+					continue
+				batch = self._take(first)
+				if self.reopen:
+					self.reopen = False
+					conn.close()
+					conn = None
+					# pooled connections of this thread may still point at the old file
+					close_idle()
+					conn = self._connect()
+				self._commit(conn, batch)
+		except BaseException as e:
+			# could not open the database: fail what is queued, the next submit starts over
+			with self.lock:
+				self.thread = None
+				while True:
+					try:
+						item = self.queue.get_nowait()
+					except queue.Empty:
+						break
+					if item[4].set_running_or_notify_cancel():
+						item[4].set_exception(e)
+			logger.exception("sqlite_writer_failed")
+		finally:
+			_local.writer = None
+			if conn is not None:
+				conn.close()
+
+	def _take(self, first: Item) -> List[Item]:
+		# bulk writes are big already and commit alone; interactive ones are
+		# grouped, never with a bulk write they would have to wait for
+		batch = [first]
+		limit = 1 if first[0] == _BULK_PRIORITY else max(1, int(get_settings().SQLITE_WRITER_MAX_BATCH))
+		while len(batch) < limit:
+			try:
+				item = self.queue.get_nowait()
+			except queue.Empty:
+				break
+			if item[0] != first[0]:
+				self.queue.put(item)
+				break
+			batch.append(item)
+		return batch
+
+	def yield_to_interactive(self, conn: sqlite3.Connection) -> None:
+		with self.queue.mutex:
+			waiting = bool(self.queue.queue) and self.queue.queue[0][0] == _PRIORITY
+		if not waiting:
+			return
+		# commit the bulk write so far, run what is waiting, then pick up again
+		conn.execute("RELEASE write")
+		conn.execute("COMMIT")
+		_count("yields")
+		_local.bulk = None
+		try:
+			self._commit(conn, self._take(self.queue.get_nowait()))
+		finally:
+			_local.bulk = self
+			conn.execute("BEGIN IMMEDIATE")
+			conn.execute("SAVEPOINT write")
+
+	def _commit(self, conn: sqlite3.Connection, batch: List[Item]) -> None:
+		started = time.perf_counter()
+		done: List[Tuple[Future, Any]] = []
+		# bulk writes run alone, so their attached databases are the batch's;
+		# ATTACH is not allowed inside a transaction
+		attach = batch[0][5] or {}
+		try:
+			for alias, path in attach.items():
+				conn.execute("ATTACH DATABASE ? AS " + alias, (path,))
+			conn.execute("BEGIN IMMEDIATE")
+			for priority, _, queued_at, fn, fut, _ in batch:
+				if not fut.set_running_or_notify_cancel():
+					continue
+				_count("queue_seconds", started - queued_at)
+				_count("bulk_writes" if priority == _BULK_PRIORITY else "writes")
+				conn.execute("SAVEPOINT write")
+				_local.bulk = self if priority == _BULK_PRIORITY else None
+				try:
+					result = fn(conn)
+				except Exception as e:
+					# only this write is undone; the rest of the batch still commits
+					conn.execute("ROLLBACK TO write")
+					conn.execute("RELEASE write")
+					_count("failed")
+					fut.set_exception(e)
+					continue
+				finally:
+					_local.bulk = None
+				conn.execute("RELEASE write")
+				done.append((fut, result))
+			conn.execute("COMMIT")
+		except BaseException as e:
+			# BEGIN/COMMIT failed (or the transaction was lost): nothing of the batch is stored
+			if conn.in_transaction:
+				conn.execute("ROLLBACK")
+			for item in batch:
+				fut = item[4]
+				if not fut.done() and (fut.running() or fut.set_running_or_notify_cancel()):
+					fut.set_exception(e)
+			if not isinstance(e, Exception):
+				raise
+			return
+		finally:
+			for alias in attach:
+				try:
+					conn.execute("DETACH DATABASE " + alias)
+				except sqlite3.Error:
+					pass
+		_count("commits")
+		_count("commit_seconds", time.perf_counter() - started)
+		for fut, result in done:
+			fut.set_result(result)
+
+
+def _writer_for(path: str) -> _Writer:
+	with _writers_lock:
+		writer = _writers.get(path)
+		if writer is None:
+			writer = _writers[path] = _Writer(path)
+		return writer
+
+
+def submit_write(
+	fn: Callable[[sqlite3.Connection], T],
+	db_path: Optional[str] = None,
+	bulk: bool = False,
+	attach: Optional[Dict[str, str]] = None,
+) -> "Future[T]":
+	"""
+	Queue `fn(conn)` for the database's writer thread and return a Future of
+	its result. fn runs inside a transaction the writer commits (together
+	with other queued writes); it must not commit or roll back itself.
+	Bulk writes (ingest batches) wait behind interactive ones, so a chat write
+	waits for at most the batch that is running. A bulk write can read other
+	database files, attached as {alias: path} for its transaction.
+	With SQLITE_SINGLE_WRITER=false, fn runs right away on a pooled
+	connection of the calling thread.
+	"""
+	if attach and not bulk:
+		raise ValueError("only bulk writes can attach databases")
+	path = os.path.abspath(db_path or get_settings().SQLITE_DB_PATH)
+	current = getattr(_local, "writer", None)
+	if current is not None and current[0] == path:
+		if attach:
+			raise ValueError("a nested write cannot attach databases")
+		# a write issued from inside another write joins its transaction
+		fut: Future = Future()
+		fut.set_result(fn(current[1]))
+		return fut
+	if get_settings().SQLITE_SINGLE_WRITER:
+		return _writer_for(path).submit(fn, bulk, attach)
+	fut = Future()
+	conn = get_conn(path)
+	try:
+		for alias, other in (attach or {}).items():
+			conn.execute("ATTACH DATABASE ? AS " + alias, (other,))
+		result = fn(conn)
+		conn.commit()
+		fut.set_result(result)
+	except BaseException as e:
+		fut.set_exception(e)
+	finally:
+		conn.rollback()
+		for alias in attach or {}:
+			try:
+				conn.execute("DETACH DATABASE " + alias)
+			except sqlite3.Error:
+				pass
+		conn.close()
+	return fut
+
+
+def write(
+	fn: Callable[[sqlite3.Connection], T],
+	db_path: Optional[str] = None,
+	bulk: bool = False,
+	attach: Optional[Dict[str, str]] = None,
+) -> T:
+	"""
+	Run `fn(conn)` as a write (see submit_write) and wait for it to be committed.
+	"""
+	return submit_write(fn, db_path=db_path, bulk=bulk, attach=attach).result()
+
+
+def yield_writes(conn: sqlite3.Connection) -> None:
+	"""
+	Called by a bulk write between its steps: if interactive writes are waiting,
+	the bulk write's work so far is committed, they run, and the bulk write
+	goes on in a new transaction. A bulk write that yields is only undone back
+	to its last yield if it fails. Does nothing anywhere else.
+	"""
+	writer = getattr(_local, "bulk", None)
+	if writer is not None:
+		writer.yield_to_interactive(conn)
+
+
+def reset_writer(db_path: Optional[str] = None) -> None:
+	"""
+	Make the writer of `db_path` reopen its connection before its next batch,
+	for a database file that was deleted or replaced (see sqlite.forget).
+	"""
+	path = os.path.abspath(db_path or get_settings().SQLITE_DB_PATH)
+	with _writers_lock:
+		writer = _writers.get(path)
+	if writer is not None:
+		writer.reopen = True
+
+
+def writer_stats() -> Dict[str, Any]:
+	"""
+	Writer counters since process start: interactive and bulk writes, failed
+	writes, group commits (writes per commit), bulk writes paused for
+	interactive ones (yields) and time spent queued and committing.
+	"""
+	with _stats_lock:
+		stats: Dict[str, Any] = dict(_stats)
+	for name in ("writes", "bulk_writes", "failed", "commits", "yields"):
+		stats[name] = int(stats[name])
+	total = stats["writes"] + stats["bulk_writes"]
+	stats["writes_per_commit"] = round(total / stats["commits"], 2) if stats["commits"] else None
+	stats["avg_queue_ms"] = round(stats["queue_seconds"] * 1000 / total, 3) if total else None
+	stats["queue_seconds"] = round(stats["queue_seconds"], 4)
+	stats["commit_seconds"] = round(stats["commit_seconds"], 4)
+	return stats
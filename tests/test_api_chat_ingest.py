@@ -33,7 +33,7 @@ def test_chat_ingest_then_process():
 	# Upload a text file for chat
 	buf = io.BytesIO(b"this is chat context")
 	files = {"files": ("note.txt", buf.getvalue(), "text/plain")}
-	resp = client.post("/api/v1/apps/chat/ingest", files=files)
+	resp = client.post("/api/v1/apps/chat/ingest", files=files, params={"wait": "true"})
 	assert resp.status_code == 200
 	data = resp.json()
 	assert data["doc_count"] >= 1
@@ -38,7 +38,7 @@ def test_csv_ingest_and_process():
 	df.to_csv(buf, index=False)
 	buf.seek(0)
 	files = {"files": ("t.csv", buf.getvalue(), "text/csv")}
-	resp = client.post("/api/v1/apps/csv/ingest", files=files)
+	resp = client.post("/api/v1/apps/csv/ingest", files=files, params={"wait": "true"})
 	assert resp.status_code == 200
 	data = resp.json()
 	assert data["doc_count"] >= 1
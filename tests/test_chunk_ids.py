@@ -0,0 +1,102 @@
+import asyncio
+from importlib import reload
+from pathlib import Path
+from uuid import uuid4
+
+import pandas as pd
+import pytest
+
+from src.ingestion import pipeline
+from src.ingestion.chunk_ids import chunk_id
+from src.ingestion.csv_ingestor import frame_to_chunks
+from src.ingestion.sql_store import _get_conn, search_fts
+from src.config import settings as settings_mod
+from src.rag import hybrid
+
+
+SAMPLE_CSV = Path(__file__).parent / "블록우선순위_v0.03.csv"
+
+
+class RecordingRAG:
+	def __init__(self):
+		self.calls = []
+
+	async def build_index(self, session_id, chunks):
+		self.calls.append(chunks)
+
+
+@pytest.fixture()
+def ids_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	pipeline.get_settings.cache_clear()
+	yield tmp_path
+	monkeypatch.undo()
+	pipeline.get_settings.cache_clear()
+
+
+def test_chunk_ids_are_stable_and_position_derived():
+	df = pd.DataFrame({"a": ["x" * 30, "y"], "b": ["1", "2"]})
+	first = frame_to_chunks(df, "f.csv", max_chars_per_chunk=20)
+	again = frame_to_chunks(df, "f.csv", max_chars_per_chunk=20)
+	ids = [ch["id"] for ch in first]
+	assert ids == [ch["id"] for ch in again]
+	assert len(set(ids)) == len(ids) == 3
+	assert ids[0] == chunk_id("f.csv", 0, 0)
+	assert chunk_id("g.csv", 0, 0) != ids[0]
+	# text chunks are content-derived; surrounding whitespace does not matter
+	assert chunk_id("n.txt", text="hello\n") == chunk_id("n.txt", text="hello") != chunk_id("n.txt", text="bye")
+
+
+def test_sqlite_rows_and_vectors_share_chunk_ids(ids_env):
+	session_id = f"sess-ids-{uuid4()}"
+	rag = RecordingRAG()
+	asyncio.run(pipeline.ingest_files(session_id, [SAMPLE_CSV], rag))
+	conn = _get_conn(session_id)
+	try:
+		stored = [r[0] for r in conn.execute("SELECT chunk_id FROM rows WHERE session_id = ? ORDER BY id", (session_id,))]
+		fts = {r[0] for r in conn.execute("SELECT chunk_id FROM fts_rows WHERE session_id = ?", (session_id,))}
+	finally:
+		conn.close()
+	assert None not in stored and len(set(stored)) == len(stored)
+	assert fts == set(stored)
+	assert [ch["id"] for ch in rag.calls[0]] == stored
+	hit = search_fts(session_id, "블록", k=1)[0]
+	assert hit["id"] in fts
+
+
+def test_dedup_copy_derives_ids_for_the_new_name(ids_env):
+	source = ids_env / "a.csv"
+	source.write_bytes(SAMPLE_CSV.read_bytes())
+	copy = ids_env / "b.csv"
+	copy.write_bytes(SAMPLE_CSV.read_bytes())
+	asyncio.run(pipeline.ingest_files(f"sess-{uuid4()}", [source], RecordingRAG()))
+	session_id = f"sess-{uuid4()}"
+	rag = RecordingRAG()
+	asyncio.run(pipeline.ingest_files(session_id, [copy], rag))
+	assert rag.calls[0][0]["id"] == chunk_id("b.csv", 0, 0)
+	conn = _get_conn(session_id)
+	try:
+		fts = {r[0] for r in conn.execute("SELECT chunk_id FROM fts_rows WHERE session_id = ?", (session_id,))}
+	finally:
+		conn.close()
+	assert fts == {ch["id"] for ch in rag.calls[0]}
+
+
+def test_hybrid_search_fuses_the_same_chunk(monkeypatch):
+	row = {"id": "c1", "text": "row one", "metadata": {"file": "f.csv", "row_index": 0}}
+	other = {"id": "c2", "text": "row two", "metadata": {"file": "f.csv", "row_index": 1}}
+
+	class Vec:
+		async def search(self, session_id, query, k=5):
+			return [dict(row, distance=0.1), dict(other, distance=0.2)]
+
+	class Sql:
+		async def search(self, session_id, query, k=5):
+			return [dict(row, score=-1.0)]
+
+	rag = hybrid.HybridRAG.__new__(hybrid.HybridRAG)
+	rag._vec, rag._sql = Vec(), Sql()
+	results = asyncio.run(rag.search("s", "row", k=2))
+	assert [r["id"] for r in results] == ["c1", "c2"]
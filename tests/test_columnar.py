@@ -0,0 +1,69 @@
+import asyncio
+from importlib import reload
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("duckdb")
+pytest.importorskip("pyarrow")
+
+from src.agents import sql_agent
+from src.agents.stats_agent import compute_stats
+from src.ingestion import columnar
+from src.ingestion.pipeline import parse_file, store_parsed
+from src.ingestion.typed_tables import get_typed_tables
+from src.config import settings as settings_mod
+
+
+SAMPLE_CSV = Path(__file__).parent / "블록우선순위_v0.03.csv"
+
+
+@pytest.fixture()
+def session_id(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	monkeypatch.setenv("COLUMNAR_ENABLED", "true")
+	monkeypatch.setenv("COLUMNAR_DIR", str(tmp_path / "columnar"))
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	columnar.get_settings.cache_clear()
+	sid = f"sess-col-{uuid4()}"
+	store_parsed(sid, [parse_file(SAMPLE_CSV)])
+	yield sid
+	monkeypatch.undo()
+	columnar.get_settings.cache_clear()
+
+
+def test_ingest_writes_parquet_and_stats_use_duckdb(session_id, tmp_path):
+	[entry] = get_typed_tables(session_id)
+	assert list((tmp_path / "columnar").rglob(f"{entry['table']}/part-00000.parquet"))
+	stats = compute_stats(session_id)
+	prio = stats["columns"][f"{entry['file_id']}:우선순위"]
+	assert prio["min"] == 1 and prio["max"] == 3
+	assert prio["median"] is not None
+	assert prio["non_null_count"] + prio["null_count"] == entry["rows"]
+
+
+def test_run_sql_routes_typed_queries_to_duckdb(session_id, monkeypatch):
+	[entry] = get_typed_tables(session_id)
+	sql = f'SELECT "우선순위", COUNT(*) AS n, quantile_cont("우선순위", 0.5) AS p50 FROM {entry["table"]} WHERE "우선순위" IS NOT NULL GROUP BY 1 ORDER BY 1'
+	assert columnar.can_serve(session_id, sql)
+	assert not columnar.can_serve(session_id, f"SELECT * FROM rows JOIN {entry['table']} USING (row_index)")
+
+	async def fake_complete_chat(messages, **kwargs):
+		return sql
+
+	monkeypatch.setattr(sql_agent, "complete_chat", fake_complete_chat)
+	result = asyncio.run(sql_agent.run_sql("우선순위별 개수", session_id))
+	assert "error" not in result
+	assert result["columns"] == ["우선순위", "n", "p50"]
+	assert [r[0] for r in result["rows"]] == [1, 2, 3]
+
+
+def test_duckdb_connection_cannot_read_other_files(session_id):
+	conn = columnar.connect(session_id)
+	try:
+		with pytest.raises(Exception):
+			conn.execute(f"SELECT * FROM read_csv('{SAMPLE_CSV}')").fetchall()
+	finally:
+		conn.close()
@@ -31,7 +31,7 @@ def test_columns_routing_and_summary(tmp_path):
 	client = TestClient(app)
 	with open("tests/블록우선순위_v0.03.csv", "rb") as f:
 		content = f.read()
-	resp = client.post("/api/v1/apps/chat/ingest", files={"files": ("블록우선순위_v0.03.csv", content, "text/csv")})
+	resp = client.post("/api/v1/apps/chat/ingest", files={"files": ("블록우선순위_v0.03.csv", content, "text/csv")}, params={"wait": "true"})
 	assert resp.status_code == 200
 	sess = resp.json()["session_id"]
 
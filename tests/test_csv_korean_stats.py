@@ -53,7 +53,7 @@ def test_ingest_and_stats_from_korean_csv():
 		content = f.read()
 
 	# Ingest via chat ingest endpoint (it will parse CSV, store SQLite row_kv, and index Chroma)
-	resp = client.post("/api/v1/apps/chat/ingest", files={"files": ("블록우선순위_v0.03.csv", content, "text/csv")})
+	resp = client.post("/api/v1/apps/chat/ingest", files={"files": ("블록우선순위_v0.03.csv", content, "text/csv")}, params={"wait": "true"})
 	assert resp.status_code == 200
 	data = resp.json()
 	assert data["doc_count"] > 0
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+from importlib import reload
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.config import settings as settings_mod
+from src.rag import embedding, embedding_cache, vector_store
+from src.rag.local import LocalRAG
+from src.server.main import app
+from src.storage.sqlite import embeddings_db_path, get_conn
+
+
+class _CountingEmbed:
+	def __init__(self):
+		self.texts = []
+
+	def __call__(self, texts):
+		self.texts.extend(texts)
+		return [[float(len(t)), float(t.count("a")) + 0.5, 1.0] for t in texts]
+
+
+@pytest.fixture()
+def cache_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("CHROMA_DB_DIR", str(tmp_path / "chroma"))
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "indices" / "app.db"))
+	# the assertions read the vectors back from Chroma
+	monkeypatch.setenv("VECTOR_BACKEND", "chroma")
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	embedding_cache.get_settings.cache_clear()
+	monkeypatch.setattr(vector_store, "_collections", OrderedDict())
+	yield tmp_path, monkeypatch
+	monkeypatch.undo()
+	embedding_cache.get_settings.cache_clear()
+
+
+def _chunks(rows, file="a.csv"):
+	return [{"text": text, "metadata": {"file": file, "row_index": i}} for i, text in enumerate(rows)]
+
+
+@pytest.mark.asyncio
+async def test_reingest_only_embeds_new_texts(cache_env):
+	embed = _CountingEmbed()
+	rag = LocalRAG(embedding_function=embed, embedding_model="fake")
+	# a repeated row is embedded once
+	await rag.build_index("sess-one", _chunks(["name: a", "name: b", "name: a"]))
+	assert sorted(embed.texts) == ["name: a", "name: b"]
+	embed.texts.clear()
+	await rag.build_index("sess-two", _chunks(["name: a", "name: b", "name: c"], file="b.csv"))
+	assert embed.texts == ["name: c"]
+	assert vector_store.get_collection("sess-two").count() == 3
+	got = vector_store.get_collection("sess-two").get(ids=None, where={"row_index": 0}, include=["embeddings"])
+	assert list(got["embeddings"][0]) == pytest.approx([7.0, 2.5, 1.0])
+
+
+@pytest.mark.asyncio
+async def test_models_do_not_share_vectors(cache_env):
+	embed = _CountingEmbed()
+	await LocalRAG(embedding_function=embed, embedding_model="model-a").build_index("sess-a", _chunks(["x"]))
+	await LocalRAG(embedding_function=embed, embedding_model="model-b").build_index("sess-b", _chunks(["x"]))
+	assert embed.texts == ["x", "x"]
+
+
+def test_least_recently_used_vectors_are_evicted(cache_env):
+	_, monkeypatch = cache_env
+	monkeypatch.setenv("EMBED_CACHE_MAX_MB", "1")
+	embedding_cache.get_settings.cache_clear()
+	cached = embedding_cache.CachedEmbedder(lambda texts: [[0.5] * 1024 for _ in texts], "big")
+	cached([f"old {i}" for i in range(100)])
+	cached.flush()
+	# 4 KiB vectors: well over 1 MB in total
+	for start in range(0, 600, 100):
+		cached([f"new {i}" for i in range(start, start + 100)])
+	cached.flush()
+	conn = get_conn(embeddings_db_path())
+	try:
+		assert conn.execute("SELECT COUNT(*) FROM embedding_cache WHERE text_hash = ?", (embedding_cache.text_hash("old 0"),)).fetchone()[0] == 0
+		assert conn.execute("SELECT COUNT(*) FROM embedding_cache WHERE text_hash = ?", (embedding_cache.text_hash("new 599"),)).fetchone()[0] == 1
+	finally:
+		conn.close()
+	stats = embedding_cache.embedding_cache_stats()
+	assert stats["bytes"] <= 1024 * 1024 and stats["evicted"] > 0
+
+
+def test_embeddings_stats_endpoint(cache_env):
+	cached = embedding_cache.CachedEmbedder(_CountingEmbed(), "fake")
+	cached(["a", "b"])
+	# stores are written behind the embedding
+	cached.flush()
+	cached(["a", "c"])
+	cached.flush()
+	assert cached.stats()["cache_hit_rate"] == 0.25
+	data = TestClient(app).get("/api/v1/stats/embeddings").json()
+	assert data["vectors"] == 3 and data["hits"] >= 1
+	assert {"misses", "hit_rate", "stored", "evicted", "bytes"} <= set(data)
+
+
+def test_cache_key_comes_from_the_adapters_own_model():
+	# Chroma's default model has a fixed key, whatever the installed chromadb calls it
+	assert LocalRAG()._model == embedding.DEFAULT_EMBEDDING_MODEL
+	assert LocalRAG(embedding_function=_CountingEmbed())._model == "_CountingEmbed"
+	assert LocalRAG(embedding_function=_CountingEmbed(), embedding_model="mine")._model == "mine"
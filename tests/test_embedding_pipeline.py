@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from importlib import reload
+import time
+
+import pytest
+
+from src.config import settings as settings_mod
+from src.rag import embedding, vector_store
+from src.rag.local import LocalRAG
+
+
+def _fake_embed(texts):
+	# deterministic, no model download: letter counts of a few letters
+	return [[float(t.count(c)) + 0.01 for c in "aeiou"] for t in texts]
+
+
+@pytest.fixture()
+def embed_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("CHROMA_DB_DIR", str(tmp_path / "chroma"))
+	# the embedding cache lives next to SQLITE_DB_PATH
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "indices" / "app.db"))
+	# the assertions read the vectors back from Chroma
+	monkeypatch.setenv("VECTOR_BACKEND", "chroma")
+	monkeypatch.setenv("EMBED_BATCH_SIZE", "3")
+	monkeypatch.setenv("EMBED_WORKERS", "2")
+	monkeypatch.setenv("EMBED_MAX_PENDING_BATCHES", "2")
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	embedding.get_settings.cache_clear()
+	monkeypatch.setattr(vector_store, "_collections", OrderedDict())
+	yield tmp_path
+	monkeypatch.undo()
+	embedding.get_settings.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_build_index_embeds_in_batches(embed_env):
+	calls = []
+
+	def _embed(texts):
+		calls.append(len(texts))
+		return _fake_embed(texts)
+
+	rag = LocalRAG(embedding_function=_embed)
+	chunks = [{"text": f"row {i} {'a' * i}", "metadata": {"file": "a.csv", "row_index": i}} for i in range(8)]
+	# a repeated chunk and an empty one are not embedded
+	chunks += [dict(chunks[0]), {"text": "  ", "metadata": {"file": "a.csv", "row_index": 99}}]
+	await rag.build_index("sess-embed", chunks)
+	assert sorted(calls) == [2, 3, 3]
+	assert vector_store.get_collection("sess-embed").count() == 8
+	results = await rag.search("sess-embed", "row aaaaaaa", k=1)
+	assert results[0]["metadata"]["row_index"] == 7
+
+
+def test_embedding_is_bounded_ahead_of_upserts(embed_env):
+	read = []
+
+	def _docs():
+		for i in range(30):
+			read.append(i)
+			yield (str(i), f"doc {i}", {"row_index": i})
+
+	class _Collection:
+		def __init__(self):
+			self.upserted = []
+
+		def upsert(self, ids, embeddings, documents, metadatas):
+			# by the time a batch is written, at most 2 more (of 3 docs) were read
+			assert len(read) - len(self.upserted) - len(ids) <= 2 * 3
+			self.upserted.extend(ids)
+
+	collection = _Collection()
+	progress = []
+	stats = embedding.embed_and_upsert(collection, _docs(), _fake_embed, progress=progress.append)
+	assert collection.upserted == [str(i) for i in range(30)]
+	assert stats["docs"] == 30 and stats["batches"] == 10 and sum(progress) == 30
+	assert stats["docs_per_sec"] > 0
+
+
+def test_upserts_overlap_embedding(embed_env, monkeypatch):
+	# one embedding thread: the next batch is embedded while the last one is written
+	monkeypatch.setenv("EMBED_WORKERS", "1")
+	embedding.get_settings.cache_clear()
+	embeds, upserts = [], []
+
+	def _slow_embed(texts):
+		started = time.perf_counter()
+		time.sleep(0.02)
+		embeds.append((started, time.perf_counter()))
+		return _fake_embed(texts)
+
+	class _Collection:
+		def upsert(self, ids, embeddings, documents, metadatas):
+			started = time.perf_counter()
+			time.sleep(0.01)
+			upserts.append((started, time.perf_counter()))
+
+	docs = ((str(i), f"doc {i}", {}) for i in range(12))
+	embedding.embed_and_upsert(_Collection(), docs, _slow_embed)
+	assert len(embeds) == len(upserts) == 4
+	assert any(e_start < u_end and u_start < e_end for u_start, u_end in upserts for e_start, e_end in embeds)
+
+
+def test_failed_batch_stops_the_index(embed_env):
+	def _broken(texts):
+		raise RuntimeError("model unavailable")
+
+	class _Collection:
+		def upsert(self, **kwargs):
+			raise AssertionError("nothing is written")
+
+	with pytest.raises(RuntimeError):
+		embedding.embed_and_upsert(_Collection(), ((str(i), "x", {}) for i in range(10)), _broken)
@@ -0,0 +1,55 @@
+from importlib import reload
+from pathlib import Path
+
+import pandas as pd
+
+from src.ingestion.encoding import sniff_encoding
+from src.ingestion.pipeline import parse_file, store_parsed
+from src.ingestion.sql_store import get_file_encoding
+from src.config import settings as settings_mod
+
+
+SAMPLE_CSV = Path(__file__).parent / "블록우선순위_v0.03.csv"
+
+
+def test_sniff_encoding_korean_sample_is_cp949():
+	enc, confidence = sniff_encoding(SAMPLE_CSV)
+	assert enc == "cp949"
+	assert confidence > 0.9
+
+
+def test_sniff_encoding_bom_utf8_and_ascii(tmp_path):
+	bom = tmp_path / "bom.csv"
+	bom.write_bytes(b"\xef\xbb\xbfa,b\n1,2\n")
+	assert sniff_encoding(bom) == ("utf-8-sig", 1.0)
+	utf8 = tmp_path / "utf8.csv"
+	utf8.write_bytes("이름,값\n김,1\n".encode("utf-8"))
+	assert sniff_encoding(utf8)[0] == "utf-8"
+	ascii_ = tmp_path / "ascii.csv"
+	ascii_.write_bytes(b"a,b\n1,2\n")
+	assert sniff_encoding(ascii_) == ("utf-8", 1.0)
+
+
+def test_sniff_encoding_sees_non_ascii_past_the_head(tmp_path):
+	p = tmp_path / "late.csv"
+	body = b"a,b\n" + b"x,1\n" * 50_000 + "김,2\n".encode("cp949")
+	p.write_bytes(body)
+	assert sniff_encoding(p, sample_bytes=4096)[0] == "cp949"
+
+
+def test_parse_cp949_once_and_record_encoding(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	calls = []
+	real_read_csv = pd.read_csv
+
+	def counting_read_csv(*args, **kwargs):
+		calls.append(kwargs.get("encoding"))
+		return real_read_csv(*args, **kwargs)
+
+	monkeypatch.setattr(pd, "read_csv", counting_read_csv)
+	item = parse_file(SAMPLE_CSV)
+	assert calls == ["cp949"]
+	assert item["encoding"] == "cp949"
+	store_parsed("sess-enc", [item])
+	assert get_file_encoding("sess-enc", SAMPLE_CSV.name) == "cp949"
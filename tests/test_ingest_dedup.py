@@ -0,0 +1,104 @@
+import asyncio
+from importlib import reload
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+from src.ingestion import pipeline
+from src.ingestion.sql_store import _get_conn, search_fts, find_ingested_file
+from src.ingestion.typed_tables import get_typed_table
+from src.ingestion.sources import content_sha256
+from src.ingestion.chunk_ids import chunk_id
+from src.config import settings as settings_mod
+
+
+SAMPLE_CSV = Path(__file__).parent / "블록우선순위_v0.03.csv"
+
+
+class RecordingRAG:
+	def __init__(self):
+		self.calls = []
+
+	async def build_index(self, session_id, chunks):
+		self.calls.append(chunks)
+
+
+@pytest.fixture()
+def dedup_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	monkeypatch.setenv("CHROMA_DB_DIR", str(tmp_path / "chroma"))
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	pipeline.get_settings.cache_clear()
+	yield tmp_path, monkeypatch
+	monkeypatch.undo()
+	pipeline.get_settings.cache_clear()
+
+
+def _count(table, session_id):
+	conn = _get_conn(session_id)
+	try:
+		return conn.execute(f"SELECT COUNT(1) FROM {table} WHERE session_id = ?", (session_id,)).fetchone()[0]
+	finally:
+		conn.close()
+
+
+def test_identical_upload_is_copied_not_reparsed(dedup_env):
+	tmp_path, _ = dedup_env
+	first = tmp_path / "monthly.csv"
+	first.write_bytes(SAMPLE_CSV.read_bytes())
+	session_a = f"sess-a-{uuid4()}"
+	result_a = asyncio.run(pipeline.ingest_files(session_a, [first], RecordingRAG()))
+	assert result_a["files"][0].get("deduplicated") is None
+
+	again = tmp_path / "again.csv"
+	again.write_bytes(SAMPLE_CSV.read_bytes())
+	session_b = f"sess-b-{uuid4()}"
+	rag = RecordingRAG()
+	result_b = asyncio.run(pipeline.ingest_files(session_b, [again], rag))
+
+	report = result_b["files"][0]
+	assert report["deduplicated"] is True
+	assert result_b["doc_count"] == result_a["doc_count"]
+	for table in ("rows", "row_kv", "schema_columns"):
+		assert _count(table, session_b) == _count(table, session_a)
+	assert get_typed_table(session_b, "again.csv")["rows"] == get_typed_table(session_a, "monthly.csv")["rows"]
+	assert search_fts(session_b, "블록", k=3)
+	# an adapter without copy_file re-indexes the copied chunks under the new name
+	assert len(rag.calls) == 1 and len(rag.calls[0]) == result_a["doc_count"]
+	assert {ch["metadata"]["file"] for ch in rag.calls[0]} == {"again.csv"}
+	# the copy is registered too, so later uploads can reuse either session
+	assert find_ingested_file(content_sha256(again), exclude_session=session_a)["session_id"] == session_b
+
+
+def test_dedup_can_be_disabled(dedup_env):
+	tmp_path, monkeypatch = dedup_env
+	path = tmp_path / "data.csv"
+	path.write_bytes(SAMPLE_CSV.read_bytes())
+	asyncio.run(pipeline.ingest_files(f"sess-{uuid4()}", [path], RecordingRAG()))
+	monkeypatch.setenv("INGEST_DEDUP_ENABLED", "false")
+	pipeline.get_settings.cache_clear()
+	result = asyncio.run(pipeline.ingest_files(f"sess-{uuid4()}", [path], RecordingRAG()))
+	assert not result["files"][0].get("deduplicated")
+	assert result["files"][0]["parse_seconds"] is not None
+
+
+def test_local_rag_copies_vectors_without_reembedding(dedup_env):
+	from src.rag.local import LocalRAG
+
+	# small sessions go to the NumPy store by default; this covers the Chroma copy
+	rag = LocalRAG(backend="chroma")
+	source = rag._client.get_or_create_collection(name="src-session")
+	source.add(
+		ids=["a", "b", "c"],
+		embeddings=[[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]],
+		documents=["one", "two", "three"],
+		metadatas=[{"file": "x.csv", "row_index": 0}, {"file": "x.csv", "row_index": 1}, {"file": "y.csv", "row_index": 0}],
+	)
+	copied = asyncio.run(rag.copy_file("src-session", "dst-session", "x.csv", "z.csv"))
+	assert copied == 2
+	got = rag._client.get_collection(name="dst-session").get(include=["embeddings", "metadatas"])
+	assert sorted(got["ids"]) == sorted([chunk_id("z.csv", 0, 0), chunk_id("z.csv", 1, 0)])
+	assert {m["file"] for m in got["metadatas"]} == {"z.csv"}
+	assert len(got["embeddings"][0]) == 2
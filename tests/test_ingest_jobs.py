@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.server import jobs
+from src.server.main import app
+
+
+SAMPLE = "tests/블록우선순위_v0.03.csv"
+
+
+class BlockingRAG:
+	"""Vector index stand-in that holds the job in its indexing stage until released."""
+
+	release = threading.Event()
+
+	async def build_index(self, session_id, chunks):
+		BlockingRAG.release.wait(timeout=30)
+
+
+@pytest.fixture(autouse=True)
+def _patch_rag(monkeypatch):
+	BlockingRAG.release.clear()
+	monkeypatch.setattr(jobs, "LocalRAG", BlockingRAG)
+	yield
+	BlockingRAG.release.set()
+
+
+def _poll(client, job_id, until, timeout=30.0):
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		job = client.get(f"/api/v1/jobs/{job_id}").json()
+		if until(job):
+			return job
+		time.sleep(0.05)
+	raise AssertionError(f"job did not reach the expected state: {job}")
+
+
+def test_ingest_returns_job_immediately_and_reports_progress():
+	client = TestClient(app)
+	with open(SAMPLE, "rb") as f:
+		content = f.read()
+	resp = client.post("/api/v1/apps/chat/ingest", files={"files": ("블록우선순위_v0.03.csv", content, "text/csv")})
+	assert resp.status_code == 200
+	data = resp.json()
+	assert data["session_id"] and data["job_id"]
+	assert data["status"] in ("queued", "running")
+	assert data["doc_count"] is None
+
+	# the job is parked in the indexing stage; other requests are still served
+	job = _poll(client, data["job_id"], lambda j: j["stage"] == "indexing")
+	assert job["status"] == "running" and job["rows_processed"] == 86
+	assert client.get("/api/v1/health").json() == {"status": "ok"}
+
+	BlockingRAG.release.set()
+	job = _poll(client, data["job_id"], lambda j: j["status"] in ("done", "failed"))
+	assert job["status"] == "done", job["error"]
+	assert job["stage"] == "done"
+	assert job["session_id"] == data["session_id"]
+	assert job["doc_count"] >= 86 and job["rows_per_sec"] > 0
+	assert [f["file"] for f in job["files"]] == ["블록우선순위_v0.03.csv"]
+
+
+def test_ingest_wait_and_unknown_job():
+	BlockingRAG.release.set()
+	client = TestClient(app)
+	resp = client.post("/api/v1/apps/csv/ingest", files={"files": ("notes.txt", b"hello", "text/plain")}, params={"wait": "true"})
+	assert resp.status_code == 200
+	data = resp.json()
+	assert data["status"] == "done" and data["doc_count"] == 1
+	assert client.get("/api/v1/jobs/does-not-exist").status_code == 404
+
+
+def test_startup_fails_jobs_of_a_previous_process():
+	queued = jobs.create_job(session_id="sess-restart", kind="csv")
+	running = jobs.create_job(session_id="sess-restart", kind="append")
+	jobs.update_job(running["job_id"], status="running", stage="indexing")
+	done = jobs.create_job(session_id="sess-restart", kind="csv")
+	jobs.update_job(done["job_id"], status="done", stage="done")
+	# run by the app's startup
+	assert jobs.fail_interrupted_jobs() >= 2
+	client = TestClient(app)
+	for job in (queued, running):
+		got = client.get(f"/api/v1/jobs/{job['job_id']}").json()
+		assert got["status"] == "failed" and got["error"] == "interrupted by server restart"
+		assert got["finished_at"]
+	assert client.get(f"/api/v1/jobs/{done['job_id']}").json()["status"] == "done"
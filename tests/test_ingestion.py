@@ -2,7 +2,9 @@ from pathlib import Path
 import pandas as pd
 
 from src.ingestion.csv_ingestor import csv_to_chunks
+from src.ingestion.csv_ingestor import iter_csv_chunks, frame_to_chunks
 from src.ingestion.fs_ingestor import folder_to_chunks
+from src.ingestion.pipeline import parse_file
 
 
 def test_csv_to_chunks(tmp_path):
@@ -29,3 +31,40 @@ def test_folder_to_chunks(tmp_path):
 	assert any(c["metadata"].get("file") == "f.csv" for c in chunks if "metadata" in c)
 
 
+def test_parse_file_reads_csv_once(tmp_path, monkeypatch):
+	df = pd.DataFrame([{"a": 1, "b": "x"}, {"a": 2, "b": "y"}])
+	p = tmp_path / "t.csv"
+	df.to_csv(p, index=False)
+	calls = []
+	real_read_csv = pd.read_csv
+
+	def counting_read_csv(*args, **kwargs):
+		calls.append(args)
+		return real_read_csv(*args, **kwargs)
+
+	monkeypatch.setattr(pd, "read_csv", counting_read_csv)
+	item = parse_file(p)
+	assert len(calls) == 1
+	assert [c["name"] for c in item["columns"]] == ["a", "b"]
+	assert len(item["chunks"]) == 2
+	assert item["chunks"][1]["structured"] == {"a": "2", "b": "y"}
+
+
+def test_iter_csv_chunks_streams_fixed_size_batches(tmp_path):
+	p = tmp_path / "big.csv"
+	lines = ["보고서,,", "이름,도시,메모"] + [f"kim{i},서울,m{i}" for i in range(25)]
+	p.write_bytes("\n".join(lines).encode("cp949"))
+	batches = list(iter_csv_chunks(p, batch_rows=10, scan_rows=5))
+	assert [len(b) for b in batches] == [8, 10, 7]
+	flat = [c for b in batches for c in b]
+	assert [c["metadata"]["row_index"] for c in flat] == list(range(25))
+	assert flat[0]["text"] == "이름: kim0, 도시: 서울, 메모: m0"
+	assert flat[-1]["structured"] == {"이름": "kim24", "도시": "서울", "메모": "m24"}
+
+
+def test_frame_to_chunks_handles_missing_values_and_duplicate_columns():
+	df = pd.DataFrame([[1, None, "a"], [2.5, "y", None]], columns=["n", "s", "n"])
+	chunks = frame_to_chunks(df, "d.csv")
+	assert [c["text"] for c in chunks] == ["n: a, s: , n: a", "n: , s: y, n: "]
+	assert chunks[0]["structured"] == {"n": "a", "s": ""}
+	assert chunks[1]["metadata"] == {"file": "d.csv", "row_index": 1, "part": 0}
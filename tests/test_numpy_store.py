@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from importlib import reload
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from src.config import settings as settings_mod
+from src.rag import numpy_store, vector_store
+from src.rag.local import LocalRAG, NumpyRAG
+from src.rag.numpy_store import NumpyCollection
+
+
+def _embed(texts):
+	# deterministic, no model download: letter counts
+	return [[float(t.count(c)) + 0.01 for c in "abcdefgh"] for t in texts]
+
+
+@pytest.fixture()
+def numpy_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("CHROMA_DB_DIR", str(tmp_path / "chroma"))
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "indices" / "app.db"))
+	monkeypatch.setenv("NUMPY_VECTOR_MAX_CHUNKS", "5")
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	numpy_store.get_settings.cache_clear()
+	monkeypatch.setattr(vector_store, "_collections", OrderedDict())
+	monkeypatch.setattr(numpy_store, "_stores", OrderedDict())
+	yield tmp_path, monkeypatch
+	monkeypatch.undo()
+	numpy_store.get_settings.cache_clear()
+
+
+def _chunks(texts, file="a.csv", start=0):
+	return [{"text": t, "metadata": {"file": file, "row_index": start + i}} for i, t in enumerate(texts)]
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_store_upserts_and_queries(numpy_env, quantize):
+	_, monkeypatch = numpy_env
+	monkeypatch.setenv("NUMPY_VECTOR_QUANTIZE", str(quantize).lower())
+	numpy_store.get_settings.cache_clear()
+	store = numpy_store.open_store("sess-np")
+	store.upsert(ids=["a", "b", "c"], embeddings=[[1, 0, 0], [0, 1, 0], [0, 0, 2]], documents=["A", "B", "C"], metadatas=[{"n": 1}, {"n": 2}, {"n": 3}])
+	# b is replaced in place, d is appended
+	store.upsert(ids=["b", "d"], embeddings=[[0, 0, -1], [1, 1, 0]], documents=["B2", "D"], metadatas=[{"n": 22}, {"n": 4}])
+	assert store.count() == 4
+	got = store.query(query_embeddings=[[0.1, 0.1, 1]], n_results=2)
+	assert got["ids"][0] == ["c", "d"] and got["documents"][0] == ["C", "D"]
+	assert got["distances"][0][0] == pytest.approx(0.0, abs=0.02)
+	# reopened from disk, through the memory maps
+	reopened = NumpyCollection(numpy_store.store_path("sess-np"))
+	got = reopened.query(query_embeddings=[[0, 0, -1]], n_results=1)
+	assert got["ids"][0] == ["b"] and got["metadatas"][0] == [{"n": 22}]
+	assert os.path.exists(os.path.join(store.path, "vectors.i8" if quantize else "vectors.f32"))
+
+
+def test_rows_of_a_failed_write_are_ignored(numpy_env):
+	store = numpy_store.open_store("sess-torn")
+	store.upsert(ids=["a"], embeddings=[[1.0, 0.0]], documents=["A"], metadatas=[{}])
+	# a write that died after appending its rows but before the manifest
+	with open(store._file("vectors.f32"), "ab") as f:
+		f.write(np.asarray([[0.0, 1.0]], dtype=np.float32).tobytes())
+	with open(store._file("ids.txt"), "a", encoding="utf-8") as f:
+		f.write("torn\n")
+	reopened = NumpyCollection(store.path)
+	reopened.upsert(ids=["b"], embeddings=[[0.0, 1.0]], documents=["B"], metadatas=[{}])
+	assert reopened.count() == 2
+	assert reopened.query(query_embeddings=[[0.0, 1.0]], n_results=1)["ids"][0] == ["b"]
+	assert NumpyCollection(store.path)._ids(2) == {"a": 0, "b": 1}
+
+
+def test_small_sessions_use_numpy_and_grow_into_chroma(numpy_env):
+	rag = LocalRAG(embedding_function=_embed, embedding_model="fake")
+	asyncio.run(rag.build_index("sess-grow", _chunks(["aaa", "bbb", "ccc"])))
+	assert numpy_store.store_exists("sess-grow")
+	assert not vector_store.collection_exists("sess-grow")
+	assert asyncio.run(rag.search("sess-grow", "bb", k=1))[0]["text"] == "bbb"
+	# past NUMPY_VECTOR_MAX_CHUNKS the session moves to Chroma, vectors included
+	asyncio.run(rag.build_index("sess-grow", _chunks(["ddd", "eee", "fff"], start=3)))
+	assert not numpy_store.store_exists("sess-grow")
+	assert vector_store.get_collection("sess-grow").count() == 6
+	assert asyncio.run(rag.search("sess-grow", "bb", k=1))[0]["text"] == "bbb"
+	# a large first ingest goes to Chroma directly
+	asyncio.run(rag.build_index("sess-big", _chunks([c * 3 for c in "abcdefgh"])))
+	assert not numpy_store.store_exists("sess-big") and vector_store.get_collection("sess-big").count() == 8
+
+
+def test_numpy_rag_copies_and_drops(numpy_env):
+	rag = NumpyRAG(embedding_function=_embed, embedding_model="fake")
+	asyncio.run(rag.build_index("sess-src", _chunks(["abc", "cde", "efg", "gha", "bdf", "ace"]) + _chunks(["hhh"], file="b.csv")))
+	assert numpy_store.open_store("sess-src").count() == 7
+	assert asyncio.run(rag.copy_file("sess-src", "sess-dst", "b.csv", "c.csv")) == 1
+	result = asyncio.run(rag.search("sess-dst", "hh", k=3))
+	assert [r["metadata"]["file"] for r in result] == ["c.csv"]
+	assert asyncio.run(rag.drop_session("sess-dst")) is True
+	assert not numpy_store.store_exists("sess-dst")
+	assert asyncio.run(rag.drop_session("sess-dst")) is False
@@ -0,0 +1,81 @@
+import asyncio
+from importlib import reload
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+from src.ingestion import pipeline
+from src.ingestion.sql_store import _get_conn
+from src.config import settings as settings_mod
+
+
+SAMPLE_CSV = Path(__file__).parent / "블록우선순위_v0.03.csv"
+
+
+class RecordingRAG:
+	def __init__(self):
+		self.calls = []
+
+	async def build_index(self, session_id, chunks):
+		self.calls.append(len(chunks))
+
+
+@pytest.fixture()
+def parallel_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	monkeypatch.setenv("INGEST_WORKERS", "2")
+	monkeypatch.setenv("INGEST_PARALLEL_MIN_MB", "0")
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	pipeline.get_settings.cache_clear()
+	yield tmp_path
+	monkeypatch.undo()
+	pipeline.get_settings.cache_clear()
+
+
+def test_ingest_files_parses_in_pool_and_reports_per_file(parallel_env):
+	paths = []
+	for i in range(3):
+		dest = parallel_env / f"part{i}.csv"
+		dest.write_bytes(SAMPLE_CSV.read_bytes())
+		paths.append(dest)
+	notes = parallel_env / "notes.txt"
+	notes.write_text("hello", encoding="utf-8")
+	paths.append(notes)
+
+	assert pipeline.ingest_workers(paths) == 2
+	session_id = f"sess-par-{uuid4()}"
+	rag = RecordingRAG()
+	result = asyncio.run(pipeline.ingest_files(session_id, paths, rag))
+
+	per_file = {r["file"]: r for r in result["files"]}
+	assert set(per_file) == {"part0.csv", "part1.csv", "part2.csv", "notes.txt"}
+	assert per_file["notes.txt"]["chunks"] == 1
+	assert all(r["parse_seconds"] is not None and r["store_seconds"] is not None for r in per_file.values())
+	assert result["doc_count"] == sum(r["chunks"] for r in per_file.values())
+	assert rag.calls == [result["doc_count"]]
+
+	conn = _get_conn(session_id)
+	try:
+		stored = conn.execute("SELECT COUNT(1) FROM rows WHERE session_id = ?", (session_id,)).fetchone()[0]
+		kv = conn.execute(
+			"SELECT k.row_index, k.col_name, k.value_text FROM row_kv k JOIN files f ON f.id = k.file_id "
+			"WHERE k.session_id = ? AND f.filename = 'part1.csv' ORDER BY k.row_index, k.col_name",
+			(session_id,),
+		).fetchall()
+	finally:
+		conn.close()
+	assert stored == result["doc_count"]
+	# workers send no row key-values; they are stored from the returned frame, as the chunks would have had them
+	expected = pipeline.parse_file(paths[1])["chunks"]
+	assert [tuple(r) for r in kv] == sorted(
+		(ch["metadata"]["row_index"], k, v) for ch in expected if ch["structured"] for k, v in ch["structured"].items()
+	)
+	assert all(ch["structured"] is None for ch in pipeline.parse_file(paths[1], structured=False)["chunks"])
+
+
+def test_small_uploads_stay_in_process(tmp_path):
+	single = tmp_path / "one.csv"
+	single.write_bytes(SAMPLE_CSV.read_bytes())
+	assert pipeline.ingest_workers([single]) == 1
@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from importlib import reload
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.config import settings as settings_mod
+from src.ingestion import sql_store
+from src.ingestion.sql_store import session_generation
+from src.rag import embedding, search_cache, vector_store
+from src.rag.hybrid import HybridRAG
+from src.rag.local import LocalRAG
+from src.server.main import app
+
+
+class _CountingEmbed:
+	def __init__(self):
+		self.calls = 0
+
+	def __call__(self, texts):
+		self.calls += 1
+		return [[float(t.count(c)) + 0.01 for c in "aeiou"] for t in texts]
+
+
+@pytest.fixture()
+def search_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("CHROMA_DB_DIR", str(tmp_path / "chroma"))
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "indices" / "app.db"))
+	monkeypatch.setenv("HYBRID_SEARCH_ENABLED", "true")
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	sql_store.get_settings.cache_clear()
+	monkeypatch.setattr(vector_store, "_collections", OrderedDict())
+	monkeypatch.setattr(search_cache, "_results", OrderedDict())
+	monkeypatch.setattr(search_cache, "_embeddings", OrderedDict())
+	yield monkeypatch
+	monkeypatch.undo()
+	sql_store.get_settings.cache_clear()
+
+
+def _rag(embed):
+	rag = HybridRAG()
+	rag._vec = LocalRAG(embedding_function=embed, embedding_model="fake")
+	return rag
+
+
+def _chunks(texts, file="a.csv"):
+	return [{"text": t, "metadata": {"file": file, "row_index": i}} for i, t in enumerate(texts)]
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_skips_retrieval(search_env, monkeypatch):
+	embed = _CountingEmbed()
+	rag = _rag(embed)
+	await rag.build_index("sess-cache", _chunks(["apple pie recipe", "banana bread"]))
+	first = await rag.search("sess-cache", "apple  pie", k=2)
+	assert any("apple" in r["text"] for r in first)
+
+	async def _no_retrieval(**kwargs):
+		raise AssertionError("served from the cache")
+
+	monkeypatch.setattr(rag, "_search", _no_retrieval)
+	# same question up to case and spacing
+	again = await rag.search("sess-cache", " Apple pie ", k=2)
+	assert again == first
+	# results handed out are copies
+	again[0]["text"] = "changed"
+	assert (await rag.search("sess-cache", "apple pie", k=2)) == first
+
+
+@pytest.mark.asyncio
+async def test_ingest_invalidates_cached_results(search_env):
+	rag = _rag(_CountingEmbed())
+	await rag.build_index("sess-gen", _chunks(["cherry tart"]))
+	before = session_generation("sess-gen")
+	assert not any("damson" in r["text"] for r in await rag.search("sess-gen", "damson", k=3))
+	await rag.build_index("sess-gen", _chunks(["damson jam"], file="b.csv"))
+	assert session_generation("sess-gen") > before
+	assert any("damson" in r["text"] for r in await rag.search("sess-gen", "damson", k=3))
+	assert search_cache.search_cache_stats()["stale"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_query_embeddings_are_reused(search_env):
+	embed = _CountingEmbed()
+	rag = LocalRAG(embedding_function=embed, embedding_model="fake")
+	await rag.build_index("sess-embed", _chunks(["grape", "lemon"]))
+	calls = embed.calls
+	await rag.search("sess-embed", "grape", k=1)
+	await rag.search("sess-embed", "GRAPE", k=2)
+	assert embed.calls == calls + 1
+
+
+@pytest.mark.asyncio
+async def test_default_model_embeds_documents_and_queries_through_one_function(search_env):
+	embed = _CountingEmbed()
+	# stands in for Chroma's default model; nothing is read back from the collection
+	search_env.setattr(embedding, "_default_ef", embed)
+	rag = LocalRAG(backend="numpy")
+	await rag.build_index("sess-default", _chunks(["grape", "lemon"]))
+	calls = embed.calls
+	assert [r["text"] for r in await rag.search("sess-default", "lemon", k=1)] == ["lemon"]
+	assert embed.calls == calls + 1
+
+
+def test_search_stats_endpoint(search_env):
+	search_cache.put_results("sess-x", "q", 5, 1, [{"text": "t"}])
+	assert search_cache.get_results("sess-x", "q", 5, 1) == [{"text": "t"}]
+	# an unregistered session (no generation) is never cached
+	assert search_cache.get_results("sess-x", "q", 5, None) is None
+	data = TestClient(app).get("/api/v1/stats/search").json()
+	assert data["results_cached"] == 1 and data["hits"] >= 1
+	assert {"misses", "stale", "hit_rate", "embed_hits", "embed_hit_rate"} <= set(data)
@@ -0,0 +1,138 @@
+import asyncio
+from importlib import reload
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.ingestion import columnar, pipeline
+from src.ingestion.csv_ingestor import read_csv_frame
+from src.ingestion.sql_store import _get_conn, file_row_offset
+from src.ingestion.typed_tables import get_typed_table
+from src.config import settings as settings_mod
+from src.server import jobs
+from src.server.main import app
+
+
+SAMPLE_CSV = Path(__file__).parent / "블록우선순위_v0.03.csv"
+
+
+class RecordingRAG:
+	def __init__(self):
+		self.calls = []
+
+	async def build_index(self, session_id, chunks):
+		self.calls.append(chunks)
+
+
+@pytest.fixture()
+def append_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	pipeline.get_settings.cache_clear()
+	frame = read_csv_frame(SAMPLE_CSV)
+	year, day = frame.iloc[:60], frame.iloc[60:].copy()
+	day["추가열"] = "new"
+	year.to_csv(tmp_path / "year.csv", index=False)
+	(tmp_path / "day").mkdir()
+	day.to_csv(tmp_path / "day" / "year.csv", index=False)
+	yield tmp_path, monkeypatch, len(frame)
+	monkeypatch.undo()
+	pipeline.get_settings.cache_clear()
+
+
+def _row_indexes(session_id):
+	conn = _get_conn(session_id)
+	try:
+		cur = conn.execute("SELECT r.row_index FROM rows r WHERE r.session_id = ? ORDER BY r.id", (session_id,))
+		return [r[0] for r in cur.fetchall()]
+	finally:
+		conn.close()
+
+
+def _schema(session_id):
+	conn = _get_conn(session_id)
+	try:
+		cur = conn.execute("SELECT col_name FROM schema_columns WHERE session_id = ? ORDER BY position", (session_id,))
+		return [r[0] for r in cur.fetchall()]
+	finally:
+		conn.close()
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_append_continues_rows_of_a_stored_file(append_env, stream):
+	tmp_path, monkeypatch, total = append_env
+	if stream:
+		monkeypatch.setenv("CSV_STREAM_THRESHOLD_MB", "0")
+		pipeline.get_settings.cache_clear()
+	session_id = f"sess-append-{uuid4()}"
+	asyncio.run(pipeline.ingest_files(session_id, [tmp_path / "year.csv"], RecordingRAG()))
+	assert file_row_offset(session_id, "year.csv") == 60
+	columns = _schema(session_id)
+
+	notes = tmp_path / "day" / "notes.txt"
+	notes.write_text("daily notes", encoding="utf-8")
+	rag = RecordingRAG()
+	result = asyncio.run(pipeline.ingest_files(session_id, [tmp_path / "day" / "year.csv", notes], rag, append=True))
+
+	report = {r["file"]: r for r in result["files"]}
+	assert report["year.csv"]["appended"] is True and report["notes.txt"]["appended"] is False
+	assert result["doc_count"] == total - 60 + 1
+	# only the new rows were embedded, numbered after the stored ones
+	embedded = [ch["metadata"].get("row_index") for call in rag.calls for ch in call]
+	assert sorted(i for i in embedded if i is not None) == list(range(60, total))
+	assert sorted(i for i in _row_indexes(session_id) if i is not None) == list(range(total))
+	assert get_typed_table(session_id, "year.csv")["rows"] == total
+	assert _schema(session_id) == columns + ["추가열"]
+	assert file_row_offset(session_id, "year.csv") == total
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_append_matches_typed_columns_by_header(append_env, stream):
+	tmp_path, monkeypatch, _ = append_env
+	if stream:
+		monkeypatch.setenv("CSV_STREAM_THRESHOLD_MB", "0")
+	monkeypatch.setenv("COLUMNAR_ENABLED", "true")
+	monkeypatch.setenv("COLUMNAR_DIR", str(tmp_path / "columnar"))
+	pipeline.get_settings.cache_clear()
+	session_id = f"sess-reorder-{uuid4()}"
+	(tmp_path / "sales.csv").write_text("city,amount\na,1\nb,2\n", encoding="utf-8")
+	(tmp_path / "day" / "sales.csv").write_text("amount,city,note\n3,c,x\n", encoding="utf-8")
+	asyncio.run(pipeline.ingest_files(session_id, [tmp_path / "sales.csv"], RecordingRAG()))
+	asyncio.run(pipeline.ingest_files(session_id, [tmp_path / "day" / "sales.csv"], RecordingRAG(), append=True))
+
+	entry = get_typed_table(session_id, "sales.csv")
+	assert [(c["name"], c["type"]) for c in entry["columns"]] == [("city", "TEXT"), ("amount", "INTEGER"), ("note", "TEXT")]
+	expected = [(0, "a", 1, None), (1, "b", 2, None), (2, "c", 3, "x")]
+	conn = _get_conn(session_id)
+	try:
+		rows = conn.execute(f'SELECT row_index, city, amount, note FROM {entry["table"]} ORDER BY row_index').fetchall()
+	finally:
+		conn.close()
+	assert [tuple(r) for r in rows] == expected
+	if columnar.is_available():
+		duck = columnar.connect(session_id)
+		try:
+			assert duck.execute(f'SELECT row_index, city, amount, note FROM {entry["table"]} ORDER BY row_index').fetchall() == expected
+		finally:
+			duck.close()
+
+
+def test_session_ingest_endpoint(monkeypatch):
+	monkeypatch.setattr(jobs, "LocalRAG", RecordingRAG)
+	client = TestClient(app)
+	assert client.post(f"/api/v1/sessions/missing-{uuid4()}/ingest", files={"files": ("a.txt", b"x", "text/plain")}).status_code == 404
+
+	created = client.post("/api/v1/apps/csv/ingest", files={"files": ("first.txt", b"first", "text/plain")}, params={"wait": "true"}).json()
+	resp = client.post(
+		f"/api/v1/sessions/{created['session_id']}/ingest",
+		files={"files": ("second.txt", b"second", "text/plain")},
+		params={"wait": "true"},
+	)
+	assert resp.status_code == 200
+	data = resp.json()
+	assert data["session_id"] == created["session_id"]
+	assert data["status"] == "done" and data["doc_count"] == 1
+	assert jobs.get_job(data["job_id"])["kind"] == "append"
@@ -0,0 +1,142 @@
+from importlib import reload
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.config import settings as settings_mod
+from src.ingestion import sql_store
+from src.ingestion.sql_store import bulk_load_chunks, has_session_data, list_sessions
+from src.rag.local import LocalRAG
+from src.server import jobs, main, sessions
+from src.server.main import app
+from src.server.uploads import UploadTooLarge
+from src.storage.writer import write
+
+
+@pytest.fixture()
+def lifecycle_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "indices" / "app.db"))
+	monkeypatch.setenv("CHROMA_DB_DIR", str(tmp_path / "chroma"))
+	monkeypatch.setenv("DATA_DIR", str(tmp_path / "data"))
+	monkeypatch.setenv("OUTPUT_DIR", str(tmp_path / "outputs"))
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	sql_store.get_settings.cache_clear()
+	yield tmp_path, monkeypatch
+	monkeypatch.undo()
+	sql_store.get_settings.cache_clear()
+
+
+def _session(tmp_path, session_id, rows=3):
+	bulk_load_chunks(session_id, [{"text": f"row {i}", "metadata": {"file": "a.csv", "row_index": i}} for i in range(rows)])
+	upload = tmp_path / "data" / "uploads" / session_id
+	upload.mkdir(parents=True)
+	(upload / "a.csv").write_bytes(b"x" * 1000)
+	output = tmp_path / "outputs" / session_id
+	output.mkdir(parents=True)
+	(output / "chart.png").write_bytes(b"y" * 10)
+	LocalRAG()._client.get_or_create_collection(name=session_id).add(ids=["a"], embeddings=[[0.1, 0.2]], documents=["row 0"])
+
+
+def _age(session_id, when):
+	write(lambda conn: conn.execute("UPDATE ingestion_sessions SET last_access_at = ? WHERE session_id = ?", (when, session_id)))
+
+
+def test_delete_endpoint_removes_every_artifact(lifecycle_env):
+	tmp_path, _ = lifecycle_env
+	_session(tmp_path, "sess-gone")
+	_session(tmp_path, "sess-kept")
+	client = TestClient(app)
+	resp = client.delete("/api/v1/sessions/sess-gone")
+	assert resp.status_code == 200
+	data = resp.json()
+	assert data["deleted"] is True and data["freed_bytes"] >= 1010
+	assert not has_session_data("sess-gone")
+	assert not (tmp_path / "data" / "uploads" / "sess-gone").exists()
+	assert not (tmp_path / "outputs" / "sess-gone").exists()
+	names = {getattr(c, "name", c) for c in LocalRAG()._client.list_collections()}
+	assert "sess-gone" not in names and "sess-kept" in names
+	assert has_session_data("sess-kept") and (tmp_path / "outputs" / "sess-kept").exists()
+	assert client.delete("/api/v1/sessions/sess-gone").status_code == 404
+	# ids that would leave the session directories are never deleted
+	assert client.delete("/api/v1/sessions/..").status_code == 404
+	assert (tmp_path / "outputs").exists()
+
+
+def test_delete_refused_while_ingesting(lifecycle_env, monkeypatch):
+	monkeypatch.setattr(jobs, "_active", {"sess-busy": 1})
+	assert TestClient(app).delete("/api/v1/sessions/sess-busy").status_code == 409
+
+
+def test_append_upload_holds_the_session(lifecycle_env, monkeypatch):
+	tmp_path, _ = lifecycle_env
+	_session(tmp_path, "sess-append")
+	_age("sess-append", "2000-01-01T00:00:00Z")
+	monkeypatch.setenv("SESSION_TTL_HOURS", "1")
+	sql_store.get_settings.cache_clear()
+	client = TestClient(app)
+	reaped = []
+
+	async def saving(upload_dir, files, folder_zip):
+		# the window between the session check and the job being queued
+		reaped.append(sessions.reap_sessions()["deleted"])
+		raise UploadTooLarge("stop here")
+
+	monkeypatch.setattr(main, "_save_uploads", saving)
+	resp = client.post("/api/v1/sessions/sess-append/ingest", files={"files": ("a.txt", b"x", "text/plain")})
+	assert resp.status_code == 413 and reaped == [[]]
+	assert has_session_data("sess-append")
+	# and a session being deleted takes no appends
+	with jobs.session_deletion("sess-append") as claimed:
+		assert claimed
+		resp = client.post("/api/v1/sessions/sess-append/ingest", files={"files": ("a.txt", b"x", "text/plain")})
+		assert resp.status_code == 409
+	assert sessions.reap_sessions()["deleted"] == ["sess-append"]
+
+
+def test_reaper_deletes_expired_sessions_in_batches(lifecycle_env):
+	tmp_path, monkeypatch = lifecycle_env
+	for sid in ("sess-old-1", "sess-old-2", "sess-old-3", "sess-new"):
+		_session(tmp_path, sid)
+	for sid in ("sess-old-1", "sess-old-2", "sess-old-3"):
+		_age(sid, "2000-01-01T00:00:00Z")
+	monkeypatch.setenv("SESSION_TTL_HOURS", "24")
+	monkeypatch.setenv("SESSION_REAPER_BATCH", "2")
+	sql_store.get_settings.cache_clear()
+	monkeypatch.setattr(jobs, "_active", {"sess-old-3": 1})
+
+	first = sessions.reap_sessions()
+	assert first["deleted"] == ["sess-old-1", "sess-old-2"] and first["remaining"] == 0
+	assert first["freed_bytes"] > 0
+	# an ingest in flight keeps a session until it is done
+	assert [s["session_id"] for s in list_sessions()] == ["sess-old-3", "sess-new"]
+	monkeypatch.setattr(jobs, "_active", {})
+	assert sessions.reap_sessions()["deleted"] == ["sess-old-3"]
+	assert sessions.reap_sessions()["deleted"] == []
+	assert has_session_data("sess-new")
+
+
+def test_quota_evicts_least_recently_used(lifecycle_env):
+	tmp_path, monkeypatch = lifecycle_env
+	for sid in ("sess-a", "sess-b", "sess-c"):
+		_session(tmp_path, sid)
+	_age("sess-a", "2030-01-01T00:00:00Z")
+	_age("sess-b", "2000-01-01T00:00:00Z")
+	_age("sess-c", "2010-01-01T00:00:00Z")
+	sizes = {sid: sessions.session_size(sid) for sid in ("sess-a", "sess-b", "sess-c")}
+	monkeypatch.setenv("SESSION_QUOTA_MB", str((sizes["sess-a"] + sizes["sess-c"]) / 1024 / 1024))
+	sql_store.get_settings.cache_clear()
+	assert sessions.reap_sessions()["deleted"] == ["sess-b"]
+	assert sessions.reap_sessions()["deleted"] == []
+
+
+def test_shared_layout_is_vacuumed_after_reaping(lifecycle_env):
+	tmp_path, monkeypatch = lifecycle_env
+	monkeypatch.setenv("SQLITE_SHARD_SESSIONS", "false")
+	monkeypatch.setenv("SESSION_TTL_HOURS", "1")
+	sql_store.get_settings.cache_clear()
+	_session(tmp_path, "sess-big", rows=3000)
+	_age("sess-big", "2000-01-01T00:00:00Z")
+	result = sessions.reap_sessions()
+	assert result["deleted"] == ["sess-big"] and result["vacuumed_pages"] > 0
+	assert write(lambda conn: conn.execute("PRAGMA freelist_count").fetchone()[0]) == 0
@@ -0,0 +1,92 @@
+from importlib import reload
+import os
+
+import pytest
+
+from src.config import settings as settings_mod
+from src.agents import sql_agent
+from src.ingestion import sql_store
+from src.ingestion.sql_store import _get_conn, bulk_load_chunks, drop_session, has_session_data, record_file_hash, find_ingested_file, search_fts
+from src.storage import sqlite as pool
+
+
+@pytest.fixture()
+def shard_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	sql_store.get_settings.cache_clear()
+	yield tmp_path, monkeypatch
+	monkeypatch.undo()
+	sql_store.get_settings.cache_clear()
+
+
+def _chunks(n, word):
+	return [{"text": f"{word} row {i}", "metadata": {"file": "a.csv", "row_index": i}, "structured": {"k": str(i)}} for i in range(n)]
+
+
+def _tables(path):
+	conn = pool.get_conn(str(path))
+	try:
+		return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+	finally:
+		conn.close()
+
+
+def test_each_session_gets_its_own_database(shard_env):
+	tmp_path, _ = shard_env
+	bulk_load_chunks("alpha", _chunks(3, "apple"))
+	bulk_load_chunks("beta", _chunks(2, "banana"))
+	assert sorted(p.name for p in (tmp_path / "sessions").glob("*.db")) == ["alpha.db", "beta.db"]
+	catalog = _tables(tmp_path / "app.db")
+	assert {"ingestion_sessions", "file_hashes"} <= catalog and "rows" not in catalog
+	assert "ingestion_sessions" not in _tables(tmp_path / "sessions" / "alpha.db")
+	assert [r["text"] for r in search_fts("beta", "banana", k=5)] == ["banana row 0", "banana row 1"]
+	assert search_fts("beta", "apple") == []
+	# ids that cannot be file names are hashed
+	assert os.path.basename(pool.session_db_path("../x")).startswith("s-")
+
+
+def test_generated_sql_only_reaches_the_session_database(shard_env):
+	bulk_load_chunks("alpha", _chunks(3, "apple"))
+	bulk_load_chunks("beta", _chunks(2, "banana"))
+	_, rows, _ = sql_agent._execute_sql("SELECT COUNT(1) FROM rows", "beta")
+	assert rows == [[2]]
+	with pytest.raises(Exception):
+		sql_agent._execute_sql("SELECT * FROM chats", "beta")
+
+
+def test_drop_session_unlinks_its_database(shard_env):
+	tmp_path, _ = shard_env
+	bulk_load_chunks("alpha", _chunks(3, "apple"))
+	bulk_load_chunks("beta", _chunks(2, "banana"))
+	record_file_hash("alpha", "a.csv", "f" * 64)
+	assert drop_session("alpha") is True
+	assert not (tmp_path / "sessions" / "alpha.db").exists()
+	assert not has_session_data("alpha") and search_fts("alpha", "apple") == []
+	assert find_ingested_file("f" * 64) is None
+	assert has_session_data("beta")
+	# the session can be used again from scratch
+	bulk_load_chunks("alpha", _chunks(1, "cherry"))
+	conn = _get_conn("alpha")
+	try:
+		assert conn.execute("SELECT COUNT(1) FROM rows").fetchone()[0] == 1
+	finally:
+		conn.close()
+	assert drop_session("missing") is False
+
+
+def test_shared_layout_when_sharding_is_off(shard_env):
+	tmp_path, monkeypatch = shard_env
+	monkeypatch.setenv("SQLITE_SHARD_SESSIONS", "false")
+	sql_store.get_settings.cache_clear()
+	bulk_load_chunks("alpha", _chunks(3, "apple"))
+	bulk_load_chunks("beta", _chunks(2, "banana"))
+	assert not (tmp_path / "sessions").exists()
+	assert drop_session("alpha") is True
+	assert search_fts("alpha", "apple") == [] and has_session_data("beta")
+	conn = _get_conn("beta")
+	try:
+		assert conn.execute("SELECT COUNT(1) FROM rows").fetchone()[0] == 2
+	finally:
+		conn.close()
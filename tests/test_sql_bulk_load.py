@@ -0,0 +1,162 @@
+from importlib import reload
+import sqlite3
+from uuid import uuid4
+
+from src.ingestion import pipeline, sql_store
+from src.ingestion.sql_store import bulk_load_chunks, store_chunks, deferred_indexes, search_fts, _get_conn
+from src.config import settings as settings_mod
+
+
+def _chunks(n, filename="a.csv"):
+	return [
+		{
+			"text": f"k: v{i}, n: {i}",
+			"metadata": {"file": filename, "row_index": i, "part": 0},
+			"structured": {"k": f"v{i}", "n": str(i)},
+		}
+		for i in range(n)
+	]
+
+
+def test_bulk_load_batches_and_reports_throughput(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+
+	session_id = f"sess-bulk-{uuid4()}"
+	stats = bulk_load_chunks(session_id, _chunks(23) + _chunks(4, "b.csv"), batch_rows=5)
+	assert stats["rows"] == 27
+	assert stats["kv_rows"] == 54
+	assert stats["rows_per_sec"] and stats["rows_per_sec"] > 0
+
+	conn = _get_conn(session_id)
+	try:
+		files = conn.execute("SELECT filename FROM files WHERE session_id = ? ORDER BY id", (session_id,)).fetchall()
+		assert [f[0] for f in files] == ["a.csv", "b.csv"]
+		assert conn.execute("SELECT COUNT(1) FROM rows WHERE session_id = ?", (session_id,)).fetchone()[0] == 27
+		assert conn.execute("SELECT COUNT(1) FROM fts_rows WHERE session_id = ?", (session_id,)).fetchone()[0] == 27
+		assert conn.execute("SELECT COUNT(1) FROM row_kv WHERE session_id = ?", (session_id,)).fetchone()[0] == 54
+	finally:
+		conn.close()
+
+
+def test_store_chunks_returns_row_count(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	assert store_chunks("sess-bulk-2", iter(_chunks(3))) == 3
+
+
+def test_deferred_indexes_drops_and_rebuilds(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	session_id = f"sess-defer-{uuid4()}"
+
+	def index_names():
+		conn = _get_conn(session_id)
+		try:
+			rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_row%'").fetchall()
+		finally:
+			conn.close()
+		return {r[0] for r in rows}
+
+	assert set(sql_store._BULK_INDEXES) <= index_names()
+	with deferred_indexes(session_id) as stats:
+		assert not (set(sql_store._BULK_INDEXES) & index_names())
+		assert bulk_load_chunks(session_id, _chunks(12), batch_rows=5)["rows"] == 12
+	assert set(sql_store._BULK_INDEXES) <= index_names()
+	assert stats["index_seconds"] >= 0 and stats["optimize_seconds"] >= 0
+	assert len(search_fts(session_id, "v7", k=5)) == 1
+
+
+def test_deferred_indexes_only_in_a_session_file(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	monkeypatch.setenv("SQL_DEFER_INDEXES_MIN_MB", "0")
+	reload(settings_mod)
+	pipeline.get_settings.cache_clear()
+	upload = tmp_path / "a.csv"
+	upload.write_text("k\nv\n", encoding="utf-8")
+	assert pipeline.should_defer_indexes("sess-own", [upload])
+	# the shared file's indexes serve every other session
+	monkeypatch.setenv("SQLITE_SHARD_SESSIONS", "false")
+	pipeline.get_settings.cache_clear()
+	assert not pipeline.should_defer_indexes("sess-shared", [upload])
+	monkeypatch.undo()
+	pipeline.get_settings.cache_clear()
+
+
+def test_fts_is_external_content_and_legacy_databases_migrate(tmp_path, monkeypatch):
+	db = tmp_path / "legacy.db"
+	# layout before rows.text: the chunk text lived in data_json and in fts_rows
+	legacy = sqlite3.connect(str(db))
+	legacy.executescript(
+		"""
+		CREATE TABLE rows (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, file_id INTEGER NOT NULL,
+			row_index INTEGER, data_json TEXT NOT NULL, chunk_id TEXT);
+		CREATE VIRTUAL TABLE fts_rows USING fts5(text, session_id UNINDEXED, file_id UNINDEXED, row_index UNINDEXED,
+			chunk_id UNINDEXED, tokenize = 'porter');
+		INSERT INTO rows(session_id, file_id, row_index, data_json, chunk_id)
+			VALUES ('old', 1, 0, '{"metadata": {"file": "a.csv"}, "text": "legacy apple row"}', NULL);
+		INSERT INTO fts_rows(text, session_id, file_id, row_index, chunk_id) VALUES ('legacy apple row', 'old', 1, 0, NULL);
+		"""
+	)
+	legacy.commit()
+	legacy.close()
+	monkeypatch.setenv("SQLITE_DB_PATH", str(db))
+	# databases of that age hold every session in the one file
+	monkeypatch.setenv("SQLITE_SHARD_SESSIONS", "false")
+	reload(settings_mod)
+	sql_store.get_settings.cache_clear()
+	try:
+		assert [r["text"] for r in search_fts("old", "apple")] == ["legacy apple row"]
+		# the trigram index is built for the existing rows too
+		assert [r["text"] for r in search_fts("old", "pple")] == ["legacy apple row"]
+		conn = _get_conn("old")
+		try:
+			assert "content_rowid" in conn.execute("SELECT sql FROM sqlite_master WHERE name = 'fts_rows'").fetchone()[0]
+			text, data_json = conn.execute("SELECT text, data_json FROM rows").fetchone()
+			assert text == "legacy apple row" and "legacy" not in data_json
+		finally:
+			conn.close()
+
+		# new rows are indexed as they are loaded, deletes are removed from the index
+		store_chunks("new", _chunks(3))
+		assert {r["text"] for r in search_fts("new", "v1")} == {"k: v1, n: 1"}
+		conn = _get_conn("new")
+		try:
+			assert "v1" not in conn.execute("SELECT data_json FROM rows WHERE session_id = 'new' AND row_index = 1").fetchone()[0]
+			conn.execute("DELETE FROM rows WHERE session_id = 'old'")
+			conn.commit()
+			for table in ("fts_rows", "fts_rows_tri"):
+				assert conn.execute(f"SELECT COUNT(1) FROM {table} WHERE {table} MATCH 'apple'").fetchone()[0] == 0
+				assert conn.execute(f"INSERT INTO {table}({table}, rank) VALUES('integrity-check', 1)").rowcount is not None
+		finally:
+			conn.close()
+	finally:
+		monkeypatch.undo()
+		sql_store.get_settings.cache_clear()
+
+
+def test_korean_and_substring_queries_use_the_trigram_index(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	sql_store.get_settings.cache_clear()
+	try:
+		texts = ["블록우선순위 입력 신호를 적분합니다", "Running reports quickly", "블록의 상태"]
+		bulk_load_chunks("s", [{"text": t, "metadata": {"file": "a.txt", "part": i}} for i, t in enumerate(texts)])
+		# another session's row inside the id range of "s"
+		bulk_load_chunks("o", [{"text": "우선순위 다른 세션", "metadata": {"file": "b.txt"}}])
+		bulk_load_chunks("s", [{"text": "우선순위 보고서", "metadata": {"file": "c.txt"}}])
+
+		assert sql_store._fts_query_plan("우선순위 입력 run")[0] == [("fts_rows", '"입력" OR "run"'), ("fts_rows_tri", '"우선순위"')]
+		# a Korean term inside a longer word, ranked within the session only
+		assert {r["text"] for r in search_fts("s", "우선순위")} == {texts[0], "우선순위 보고서"}
+		assert all(r["score"] is not None for r in search_fts("s", "우선순위"))
+		# English words are stemmed; substrings the word index misses fall back to trigrams
+		assert [r["text"] for r in search_fts("s", "report")] == [texts[1]]
+		assert [r["text"] for r in search_fts("s", "uickl")] == [texts[1]]
+		assert search_fts("s", "존재하지않는") == []
+		# two characters are below the trigram length: LIKE still finds them mid-word
+		assert [r["text"] for r in search_fts("s", "선순", k=1)] == [texts[0]]
+		assert search_fts("missing", "우선순위") == []
+	finally:
+		monkeypatch.undo()
+		sql_store.get_settings.cache_clear()
@@ -0,0 +1,106 @@
+from importlib import reload
+import sqlite3
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.config import settings as settings_mod
+from src.storage import sqlite as pool
+from src.server.main import app
+
+
+@pytest.fixture()
+def pool_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	monkeypatch.setenv("SQLITE_POOL_MAX_IDLE", "2")
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	pool.get_settings.cache_clear()
+	pool.close_idle()
+	yield tmp_path
+	pool.close_idle()
+	monkeypatch.undo()
+	pool.get_settings.cache_clear()
+
+
+def test_connections_are_reused_per_thread(pool_env):
+	before = pool.pool_stats()
+	conn = pool.get_conn()
+	inner = pool.get_conn()
+	# nested checkouts in one thread never share a connection
+	assert inner is not conn
+	inner.close()
+	conn.close()
+	conn.close()  # closing twice must not pool it twice
+	for _ in range(5):
+		again = pool.get_conn()
+		assert again in (conn, inner)
+		again.close()
+	stats = pool.pool_stats()
+	assert stats["opened"] - before["opened"] == 2
+	assert stats["checkouts"] - before["checkouts"] == 7
+	assert stats["reused"] - before["reused"] == 5
+	assert stats["avg_open_ms"] is not None
+
+	seen = []
+	worker = threading.Thread(target=lambda: seen.append(pool.get_conn()))
+	worker.start()
+	worker.join()
+	assert seen[0] not in (conn, inner)
+
+
+def test_release_rolls_back_and_resets_connection_state(pool_env):
+	conn = pool.get_conn()
+	conn.execute("CREATE TABLE t (x INTEGER)")
+	conn.commit()
+	conn.execute("INSERT INTO t VALUES (1)")
+	conn.row_factory = None
+	conn.close()
+	again = pool.get_conn()
+	try:
+		assert again is conn
+		assert again.execute("SELECT COUNT(1) AS n FROM t").fetchone()["n"] == 0
+		assert again.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+		assert again.execute("PRAGMA temp_store").fetchone()[0] == 2
+		assert again.execute("PRAGMA cache_size").fetchone()[0] == -32 * 1024
+	finally:
+		again.close()
+
+
+def test_schemas_run_once_per_database_file(pool_env):
+	calls = []
+
+	@pool.register_schema
+	def _init_probe(conn: sqlite3.Connection) -> None:
+		calls.append(1)
+		conn.execute("CREATE TABLE IF NOT EXISTS probe (x INTEGER)")
+
+	try:
+		for _ in range(3):
+			pool.get_conn().close()
+		assert len(calls) == 1
+		# after forget(), a database recreated at the same path gets its schema again
+		pool.forget()
+		(pool_env / "app.db").unlink()
+		for name in ("app.db-wal", "app.db-shm"):
+			(pool_env / name).unlink(missing_ok=True)
+		conn = pool.get_conn()
+		try:
+			assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'probe'").fetchone() is not None
+			assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'chats'").fetchone() is not None
+		finally:
+			conn.close()
+		assert len(calls) == 2
+	finally:
+		pool._schemas.remove((pool.CATALOG, _init_probe))
+
+
+def test_sqlite_stats_endpoint(pool_env):
+	client = TestClient(app)
+	client.post("/api/v1/chats", json={})
+	client.get("/api/v1/chats")
+	data = client.get("/api/v1/stats/sqlite").json()
+	assert data["checkouts"] >= 1 and data["opened"] >= 1
+	assert {"open_seconds", "reused", "schema_runs", "schema_seconds"} <= set(data)
+	assert data["writer"]["commits"] >= 1 and "writes_per_commit" in data["writer"]
@@ -0,0 +1,121 @@
+from importlib import reload
+import threading
+
+import pytest
+
+from src.config import settings as settings_mod
+from src.storage import sqlite as pool
+from src.storage import writer
+
+
+@pytest.fixture()
+def writer_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	writer.get_settings.cache_clear()
+	writer.write(lambda conn: conn.execute("CREATE TABLE probe (x INTEGER)"))
+	yield monkeypatch
+	monkeypatch.undo()
+	writer.get_settings.cache_clear()
+
+
+def _stored():
+	conn = pool.get_conn()
+	try:
+		return [r["x"] for r in conn.execute("SELECT x FROM probe ORDER BY x").fetchall()]
+	finally:
+		conn.close()
+
+
+def _insert(x):
+	return lambda conn: conn.execute("INSERT INTO probe VALUES (?)", (x,)).lastrowid
+
+
+def _blocked_writer():
+	# holds the writer thread so the writes queued next are committed as one batch
+	gate = threading.Event()
+	running = threading.Event()
+	held = writer.submit_write(lambda conn: running.set() or gate.wait(5))
+	assert running.wait(5)
+	return gate, held
+
+
+def test_queued_writes_are_group_committed(writer_env):
+	gate, held = _blocked_writer()
+	before = writer.writer_stats()
+	futures = [writer.submit_write(_insert(i)) for i in range(10)]
+	gate.set()
+	held.result(5)
+	assert [f.result(5) for f in futures] == list(range(1, 11))
+	stats = writer.writer_stats()
+	assert stats["commits"] - before["commits"] == 2  # the held write's batch, then all ten
+	assert stats["writes"] - before["writes"] == 10
+	assert _stored() == list(range(10))
+
+
+def test_failed_write_rolls_back_alone(writer_env):
+	def _fail(conn):
+		conn.execute("INSERT INTO probe VALUES (2)")
+		raise ValueError("boom")
+
+	gate, _ = _blocked_writer()
+	ok = [writer.submit_write(_insert(1)), writer.submit_write(_fail), writer.submit_write(_insert(3))]
+	gate.set()
+	ok[0].result(5)
+	ok[2].result(5)
+	with pytest.raises(ValueError):
+		ok[1].result(5)
+	assert _stored() == [1, 3]
+
+
+def test_interactive_writes_go_before_bulk_batches(writer_env):
+	order = []
+	gate, _ = _blocked_writer()
+	futures = [
+		writer.submit_write(lambda conn: order.append("bulk 1"), bulk=True),
+		writer.submit_write(lambda conn: order.append("bulk 2"), bulk=True),
+		writer.submit_write(lambda conn: order.append("chat")),
+	]
+	gate.set()
+	for f in futures:
+		f.result(5)
+	assert order == ["chat", "bulk 1", "bulk 2"]
+
+
+def test_bulk_write_yields_to_waiting_chat_writes(writer_env):
+	order = []
+	started = threading.Event()
+	proceed = threading.Event()
+
+	def _bulk(conn):
+		started.set()
+		proceed.wait(5)
+		_insert(1)(conn)
+		writer.yield_writes(conn)
+		order.append("bulk done")
+		raise ValueError("after the yield")
+
+	bulk = writer.submit_write(_bulk, bulk=True)
+	assert started.wait(5)
+	chat = writer.submit_write(lambda conn: order.append("chat"))
+	proceed.set()
+	chat.result(5)
+	with pytest.raises(ValueError):
+		bulk.result(5)
+	assert order == ["chat", "bulk done"]
+	# the step before the yield was committed with it
+	assert _stored() == [1]
+
+
+def test_nested_write_joins_the_running_transaction(writer_env):
+	assert writer.write(lambda conn: writer.write(lambda inner: inner is conn))
+
+
+def test_single_writer_can_be_disabled(writer_env):
+	writer_env.setenv("SQLITE_SINGLE_WRITER", "false")
+	writer.get_settings.cache_clear()
+	threads = []
+	writer.write(lambda conn: threads.append(threading.current_thread()) or _insert(7)(conn))
+	assert threads == [threading.current_thread()]
+	assert _stored() == [7]
@@ -0,0 +1,88 @@
+import hashlib
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.ingestion.pipeline import parse_file
+from src.ingestion.sources import list_zip_members
+from src.server import jobs, main
+from src.server.uploads import safe_filename
+
+
+SAMPLE_CSV = Path(__file__).parent / "블록우선순위_v0.03.csv"
+
+
+class NoopRAG:
+	async def build_index(self, session_id, chunks):
+		return None
+
+
+@pytest.fixture(autouse=True)
+def _patch_rag(monkeypatch):
+	monkeypatch.setattr(jobs, "LocalRAG", NoopRAG)
+	yield
+
+
+def _zip_bytes() -> bytes:
+	buf = io.BytesIO()
+	with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+		z.write(SAMPLE_CSV, f"data/{SAMPLE_CSV.name}")
+		z.writestr("notes/readme.txt", "hello\r\nworld")
+		z.writestr("__MACOSX/data/._x.csv", b"\x00\x01")
+	return buf.getvalue()
+
+
+def test_zip_members_parse_like_extracted_files(tmp_path):
+	archive = tmp_path / "upload.zip"
+	archive.write_bytes(_zip_bytes())
+	members = {m.name: m for m in list_zip_members(archive)}
+	assert set(members) == {SAMPLE_CSV.name, "readme.txt"}
+
+	from_zip = parse_file(members[SAMPLE_CSV.name])
+	from_disk = parse_file(SAMPLE_CSV)
+	assert from_zip["encoding"] == from_disk["encoding"] == "cp949"
+	assert from_zip["chunks"] == from_disk["chunks"]
+	assert parse_file(members["readme.txt"])["chunks"][0]["text"] == "hello\nworld"
+
+	with pytest.raises(ValueError):
+		list_zip_members(archive, max_total_bytes=10)
+
+
+def test_zip_upload_is_not_extracted(tmp_path):
+	client = TestClient(main.app)
+	resp = client.post(
+		"/api/v1/apps/csv/ingest",
+		files={"folder_zip": ("folder.zip", _zip_bytes(), "application/zip")},
+		params={"wait": "true"},
+	)
+	assert resp.status_code == 200, resp.text
+	data = resp.json()
+	assert sorted(f["file"] for f in data["files"]) == sorted([SAMPLE_CSV.name, "readme.txt"])
+	upload_dir = Path(main.settings.DATA_DIR) / "uploads" / data["session_id"]
+	assert [p.name for p in upload_dir.rglob("*")] == ["folder.zip"]
+
+
+def test_upload_limit_and_hashing(tmp_path, monkeypatch):
+	client = TestClient(main.app)
+	monkeypatch.setattr(main.settings, "UPLOAD_MAX_MB", 0)
+	resp = client.post("/api/v1/apps/csv/ingest", files={"files": ("big.csv", b"a,b\n1,2\n", "text/csv")})
+	assert resp.status_code == 413
+
+	monkeypatch.setattr(main.settings, "UPLOAD_MAX_MB", 1)
+	content = SAMPLE_CSV.read_bytes()
+	logged = []
+	monkeypatch.setattr(main.logger, "info", lambda msg, *a, **k: logged.append(msg))
+	resp = client.post("/api/v1/apps/csv/ingest", files={"files": ("../../escape.csv", content, "text/csv")}, params={"wait": "true"})
+	assert resp.status_code == 200, resp.text
+	saved = [m for m in logged if isinstance(m, dict) and m.get("event") == "upload_saved"]
+	assert saved == [{"event": "upload_saved", "file": "escape.csv", "bytes": len(content), "sha256": hashlib.sha256(content).hexdigest()}]
+
+
+def test_safe_filename():
+	assert safe_filename("../../etc/passwd") == "passwd"
+	assert safe_filename("..\\win\\a.csv") == "a.csv"
+	assert safe_filename("..") == "upload"
+	assert safe_filename(None) == "upload"
@@ -0,0 +1,73 @@
+import asyncio
+from importlib import reload
+from pathlib import Path
+from uuid import uuid4
+
+import pandas as pd
+
+from src.agents import sql_agent
+from src.agents.stats_agent import compute_stats
+from src.ingestion.pipeline import parse_file, store_parsed
+from src.ingestion.sql_store import _get_conn
+from src.ingestion.typed_tables import get_typed_tables, infer_sql_type, materialize_frame
+from src.config import settings as settings_mod
+
+
+SAMPLE_CSV = Path(__file__).parent / "블록우선순위_v0.03.csv"
+
+
+def test_infer_sql_type():
+	assert infer_sql_type(pd.Series(["1", "2", "", None])) == "INTEGER"
+	assert infer_sql_type(pd.Series(["1.5", "2"])) == "REAL"
+	assert infer_sql_type(pd.Series(["007", "8"])) == "TEXT"
+	assert infer_sql_type(pd.Series(["a", "1"])) == "TEXT"
+	assert infer_sql_type(pd.Series([1.0, None])) == "INTEGER"
+
+
+def test_materialize_frame_native_types_and_indexes(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	session_id = f"sess-typed-{uuid4()}"
+	df = pd.DataFrame({"region": ["north", "south"] * 10, "amount": [str(i) for i in range(20)], "amount ": ["x"] * 20})
+	table = materialize_frame(session_id, "sales.csv", df)
+
+	[entry] = get_typed_tables(session_id)
+	assert entry["table"] == table and entry["rows"] == 20
+	assert [(c["name"], c["type"], c["indexed"]) for c in entry["columns"]] == [
+		("region", "TEXT", True),
+		("amount", "INTEGER", False),
+		("amount_2", "TEXT", False),
+	]
+	conn = _get_conn(session_id)
+	try:
+		row = conn.execute(f'SELECT SUM("amount"), typeof("amount") FROM {table} WHERE "region" = ?', ("south",)).fetchone()
+	finally:
+		conn.close()
+	assert tuple(row) == (100, "integer")
+
+
+def test_ingest_feeds_stats_and_sql_prompt(tmp_path, monkeypatch):
+	monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "app.db"))
+	reload(settings_mod)
+	session_id = f"sess-typed-{uuid4()}"
+	store_parsed(session_id, [parse_file(SAMPLE_CSV)])
+
+	[entry] = get_typed_tables(session_id)
+	types = {c["name"]: c["type"] for c in entry["columns"]}
+	assert types["우선순위"] == "INTEGER"
+
+	stats = compute_stats(session_id)
+	prio = stats["columns"][f"{entry['file_id']}:우선순위"]
+	assert prio["min"] == 1 and prio["max"] == 3
+	assert prio["non_null_count"] + prio["null_count"] == entry["rows"]
+
+	seen = {}
+
+	async def fake_complete_chat(messages, **kwargs):
+		seen["system"] = messages[0]["content"]
+		return "SELECT 1"
+
+	monkeypatch.setattr(sql_agent, "complete_chat", fake_complete_chat)
+	asyncio.run(sql_agent.generate_sql("우선순위별 개수", session_id))
+	assert f'{entry["table"]}(row_index INTEGER, "번호" TEXT' in seen["system"]
+	assert '"우선순위" INTEGER' in seen["system"]
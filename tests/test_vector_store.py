@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from importlib import reload
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.config import settings as settings_mod
+from src.rag import vector_store
+from src.rag.local import LocalRAG
+from src.server.main import app
+
+
+@pytest.fixture()
+def chroma_env(tmp_path, monkeypatch):
+	monkeypatch.setenv("CHROMA_DB_DIR", str(tmp_path / "chroma"))
+	monkeypatch.setenv("CHROMA_COLLECTION_CACHE_SIZE", "2")
+	reload(settings_mod)
+	# modules imported before the reload hold the original cached get_settings
+	vector_store.get_settings.cache_clear()
+	# handles cached by earlier tests would be evicted first
+	monkeypatch.setattr(vector_store, "_collections", OrderedDict())
+	yield tmp_path
+	monkeypatch.undo()
+	vector_store.get_settings.cache_clear()
+
+
+def test_adapters_share_one_client(chroma_env):
+	before = vector_store.vector_store_stats()
+	assert LocalRAG()._client is LocalRAG()._client
+	assert vector_store.vector_store_stats()["clients"] - before["clients"] == 1
+
+
+def test_collection_handles_are_cached_lru(chroma_env):
+	before = vector_store.vector_store_stats()
+	first = vector_store.get_collection("sess-one")
+	assert vector_store.get_collection("sess-one") is first
+	vector_store.get_collection("sess-two")
+	vector_store.get_collection("sess-one")
+	# over the limit of 2: the least recently used handle (sess-two) goes
+	vector_store.get_collection("sess-three")
+	vector_store.get_collection("sess-one")
+	vector_store.get_collection("sess-two")
+	stats = vector_store.vector_store_stats()
+	assert stats["warm"] - before["warm"] == 3
+	assert stats["cold"] - before["cold"] == 4
+	assert stats["evictions"] - before["evictions"] == 2
+	assert stats["cached"] == 2
+
+
+def test_deleted_collection_is_not_served_from_cache(chroma_env):
+	vector_store.get_collection("sess-gone").add(ids=["a"], embeddings=[[0.1, 0.2]], documents=["x"])
+	assert vector_store.delete_collection("sess-gone") is True
+	assert vector_store.get_collection("sess-gone").count() == 0
+	assert vector_store.delete_collection("sess-never") is False
+
+
+def test_chroma_stats_endpoint(chroma_env):
+	vector_store.get_collection("sess-one")
+	data = TestClient(app).get("/api/v1/stats/chroma").json()
+	assert data["clients"] >= 1 and data["cold"] >= 1
+	assert {"warm", "evictions", "cached", "hit_rate", "client_seconds"} <= set(data)
@@ -64,3 +64,22 @@ def test_csv_ingest_and_process(monkeypatch):
 	assert p["answer"] == "B"
 
 
+class FakeJobClient(FakeClient):
+	polls = 0
+
+	def post(self, path, files=None, json=None):
+		return FakeResponse(payload={"session_id": "s3", "job_id": "j1", "status": "queued", "doc_count": None})
+
+	def get(self, path, params=None):
+		FakeJobClient.polls += 1
+		status = "done" if FakeJobClient.polls >= 2 else "running"
+		return FakeResponse(payload={"job_id": "j1", "status": status, "stage": status, "doc_count": 5 if status == "done" else None})
+
+
+def test_ingest_waits_for_background_job(monkeypatch):
+	monkeypatch.setattr(api, "_client", lambda: FakeJobClient())
+	monkeypatch.setattr(api.time, "sleep", lambda s: None)
+	out = api.csv_ingest(files=[("files", ("x.csv", b"a,b\n1,2\n", "text/csv"))])
+	assert out["session_id"] == "s3"
+	assert out["status"] == "done" and out["doc_count"] == 5
+	assert FakeJobClient.polls == 2
@@ -1,4 +1,5 @@
 import os
+import time
 from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
@@ -20,6 +21,37 @@ def _client() -> httpx.Client:
 	return httpx.Client(base_url=_get_api_base(), timeout=60)
 
 
+def get_job(job_id: str) -> Dict[str, Any]:
+	with _client() as c:
+		resp = c.get(f"/api/v1/jobs/{job_id}")
+		resp.raise_for_status()
+		return resp.json()
+
+
+def wait_for_job(job_id: str, timeout: float = 1800.0, interval: float = 1.0) -> Dict[str, Any]:
+	"""
+	Poll an ingest job until it is done or failed. Raises on failure or timeout.
+	"""
+	deadline = time.monotonic() + timeout
+	while True:
+		job = get_job(job_id)
+		if job.get("status") == "done":
+			return job
+		if job.get("status") == "failed":
+			raise RuntimeError(f"ingest failed: {job.get('error')}")
+		if time.monotonic() > deadline:
+			raise TimeoutError(f"ingest job {job_id} still {job.get('stage')} after {timeout}s")
+		time.sleep(interval)
+
+
+def _finish_ingest(payload: Dict[str, Any]) -> Dict[str, Any]:
+	# ingest endpoints answer with a job; wait for it so callers still get doc_count
+	if payload.get("job_id") and payload.get("doc_count") is None:
+		job = wait_for_job(payload["job_id"])
+		payload = {**payload, **{k: job.get(k) for k in ("status", "doc_count", "seconds", "files")}}
+	return payload
+
+
 def chat_ingest(files: List[Tuple[str, Tuple[str, bytes, str]]] | None = None, folder_zip: Optional[Tuple[str, bytes, str]] = None) -> Dict[str, Any]:
 	multipart: List[Tuple[str, Tuple[str, bytes, str]]] = []
 	for item in files or []:
@@ -30,7 +62,8 @@ def chat_ingest(files: List[Tuple[str, Tuple[str, bytes, str]]] | None = None, f
 	with _client() as c:
 		resp = c.post("/api/v1/apps/chat/ingest", files=multipart or None)
 		resp.raise_for_status()
-		return resp.json()
+		payload = resp.json()
+	return _finish_ingest(payload)
 
 
 def chat_process(query: str, session_id: Optional[str] = None, k: Optional[int] = 5, system_prompt: Optional[str] = None, model_id: Optional[str] = None, chat_id: Optional[str] = None) -> Dict[str, Any]:
@@ -60,7 +93,24 @@ def csv_ingest(files: List[Tuple[str, Tuple[str, bytes, str]]] | None = None, fo
 	with _client() as c:
 		resp = c.post("/api/v1/apps/csv/ingest", files=multipart or None)
 		resp.raise_for_status()
-		return resp.json()
+		payload = resp.json()
+	return _finish_ingest(payload)
+
+
+def session_ingest(session_id: str, files: List[Tuple[str, Tuple[str, bytes, str]]] | None = None, folder_zip: Optional[Tuple[str, bytes, str]] = None) -> Dict[str, Any]:
+	"""
+	Append files (or new rows of already ingested files) to an existing session.
+	"""
+	multipart: List[Tuple[str, Tuple[str, bytes, str]]] = []
+	for item in files or []:
+		multipart.append(item)
+	if folder_zip:
+		multipart.append(("folder_zip", folder_zip))
+	with _client() as c:
+		resp = c.post(f"/api/v1/sessions/{session_id}/ingest", files=multipart or None)
+		resp.raise_for_status()
+		payload = resp.json()
+	return _finish_ingest(payload)
 
 
 def csv_process(session_id: str, query: str, k: Optional[int] = 5, model_id: Optional[str] = None) -> Dict[str, Any]: